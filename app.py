@@ -1,4 +1,6 @@
 from main import app
 
 if __name__ == "__main__":
+    import maintenance
+    maintenance.run()
     app.run()
@@ -0,0 +1,423 @@
+"""Scheduled SQLite backups: full copies plus incremental WAL segments.
+
+A full snapshot is copied page batch by page batch with sqlite3's backup API
+inside one read transaction, so it is a consistent view of the database
+including pages still in its WAL file. The committed part of the WAL at that
+moment is saved next to it (<snapshot>.wal).
+
+Until the WAL is reset by a checkpoint, later snapshots are incremental: only
+the WAL frames committed since the previous snapshot are written, after their
+salts and checksums have been validated. WAL frames are whole page images, so
+replaying the chain's WAL bytes over the full copy rebuilds the database as of
+any snapshot in the chain (see restore). A new full copy is taken when the WAL
+has been reset, the source is not in WAL mode, or BACKUP_FULL_EVERY
+incrementals have been chained.
+
+A snapshot is skipped when the database and its WAL are unchanged since the
+last one. Every file is checksummed in backups/manifest.json; retention only
+ever deletes snapshots listed there and keeps whole chains.
+
+    python backup.py run                  take a snapshot now (if anything changed)
+    python backup.py schedule             take snapshots every BACKUP_INTERVAL seconds
+    python backup.py verify               re-check every snapshot against its checksum
+    python backup.py restore FILE TARGET  rebuild the database as of snapshot FILE
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import hashlib
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+BACKUP_DIR = os.environ.get('BACKUP_DIR') or os.path.join(os.getcwd(), 'backups')
+BACKUP_INTERVAL = float(os.environ.get('BACKUP_INTERVAL', 6 * 3600))
+BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 5))  # most recent snapshots always kept
+BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', 7))  # plus the newest snapshot of each of this many days
+BACKUP_FULL_EVERY = int(os.environ.get('BACKUP_FULL_EVERY', 24))  # incrementals between full copies
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+LOCK_STALE_SECONDS = 3600
+
+MANIFEST = 'manifest.json'
+
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+WAL_MAGIC = (0x377f0682, 0x377f0683)  # checksums in little- / big-endian words
+
+
+def sqlite_path(database_url):
+    """File path of a sqlite:/// URL, or None for other databases"""
+    if database_url and database_url.startswith('sqlite:///'):
+        return database_url.replace('sqlite:///', '', 1)
+    return None
+
+
+def _source_state(db_path):
+    """Cheap change detector: size and mtime of the database and its WAL"""
+    state = []
+    for path in (db_path, db_path + '-wal'):
+        try:
+            stat = os.stat(path)
+            state.append([stat.st_size, stat.st_mtime_ns])
+        except FileNotFoundError:
+            state.append(None)
+    return state
+
+
+def _wal_checksum(data, big_endian, s0=0, s1=0):
+    words = struct.unpack(('>' if big_endian else '<') + f'{len(data) // 4}I', data)
+    for i in range(0, len(words), 2):
+        s0 = (s0 + words[i] + s1) & 0xFFFFFFFF
+        s1 = (s1 + words[i + 1] + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def read_wal(wal_path):
+    """Salt and committed length of a WAL file, or None if there is no valid one.
+
+    Frames are validated the way SQLite's recovery does: they must carry the
+    header's salts and continue its checksum chain. 'end' is the offset just
+    past the last commit frame; anything after it is uncommitted or stale.
+    """
+    try:
+        f = open(wal_path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        header = f.read(WAL_HEADER_SIZE)
+        if len(header) < WAL_HEADER_SIZE:
+            return None
+        magic, _, page_size, _, salt1, salt2, c1, c2 = struct.unpack('>8I', header)
+        if magic not in WAL_MAGIC:
+            return None
+        big_endian = magic & 1
+        checksum = _wal_checksum(header[:24], big_endian)
+        if checksum != (c1, c2):
+            return None
+        end = WAL_HEADER_SIZE
+        offset = WAL_HEADER_SIZE
+        while True:
+            frame = f.read(WAL_FRAME_HEADER_SIZE + page_size)
+            if len(frame) < WAL_FRAME_HEADER_SIZE + page_size:
+                break
+            _, commit, frame_salt1, frame_salt2, c1, c2 = struct.unpack('>6I', frame[:WAL_FRAME_HEADER_SIZE])
+            if (frame_salt1, frame_salt2) != (salt1, salt2):
+                break
+            checksum = _wal_checksum(frame[:8], big_endian, *checksum)
+            checksum = _wal_checksum(frame[WAL_FRAME_HEADER_SIZE:], big_endian, *checksum)
+            if checksum != (c1, c2):
+                break
+            offset += len(frame)
+            if commit:
+                end = offset
+    return {'salt': [salt1, salt2], 'end': end}
+
+
+def _copy_range(source, target, start, end):
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        src.seek(start)
+        remaining = end - start
+        while remaining:
+            chunk = src.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                raise RuntimeError(f"{source} shrank while it was being copied")
+            dst.write(chunk)
+            remaining -= len(chunk)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(backup_dir=None):
+    path = os.path.join(backup_dir or BACKUP_DIR, MANIFEST)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'snapshots': []}
+
+
+def _save_manifest(manifest, backup_dir):
+    path = os.path.join(backup_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class _DirLock:
+    """Exclusive lock file so concurrent schedulers never snapshot at once"""
+
+    def __init__(self, backup_dir):
+        self.path = os.path.join(backup_dir, '.lock')
+        self.fd = None
+
+    def __enter__(self):
+        try:
+            if time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS:
+                os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        try:
+            self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.write(self.fd, str(os.getpid()).encode())
+        return True
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            os.close(self.fd)
+            os.remove(self.path)
+
+
+def snapshot(db_path, backup_dir=None, force=False):
+    """Back up db_path into backup_dir; returns the manifest entry, or None if skipped.
+
+    Incremental unless a new chain has to start (see the module docstring);
+    force takes a full copy even if nothing changed.
+    """
+    backup_dir = backup_dir or BACKUP_DIR
+    if not os.path.exists(db_path):
+        return None
+    os.makedirs(backup_dir, exist_ok=True)
+
+    with _DirLock(backup_dir) as locked:
+        if not locked:
+            print("Backup skipped: another backup is in progress")
+            return None
+        manifest = load_manifest(backup_dir)
+        state = _source_state(db_path)
+        last = manifest['snapshots'][-1] if manifest['snapshots'] else None
+        if not force and last and last.get('source_state') == state:
+            return None
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = f"backup_{timestamp}_{os.path.basename(db_path)}"
+        suffix = 1
+        while any(os.path.exists(os.path.join(backup_dir, name + ext)) for ext in ('', '.wal')):
+            name = f"backup_{timestamp}_{suffix}_{os.path.basename(db_path)}"
+            suffix += 1
+
+        started = time.perf_counter()
+        # The open read transaction pins the WAL: a checkpoint cannot reset it
+        # until we are done, so the frames read below are still the ones the
+        # snapshot's view was built from.
+        source = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        try:
+            source.execute("BEGIN")
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            wal = read_wal(db_path + '-wal')
+            chain = _chain(manifest['snapshots'], last)
+            if not force and wal and chain and chain[-1].get('wal_salt') == wal['salt'] \
+                    and len(chain) <= BACKUP_FULL_EVERY:
+                entry = _incremental(db_path, backup_dir, name, chain, wal)
+                if entry is None:
+                    return None
+            else:
+                entry = _full(source, db_path, backup_dir, name, wal)
+        finally:
+            source.close()
+
+        entry.update({
+            'created': datetime.now().isoformat(timespec='microseconds'),
+            'seconds': round(time.perf_counter() - started, 3),
+            'source_state': state,
+        })
+        manifest['snapshots'].append(entry)
+        manifest['snapshots'] = prune(manifest['snapshots'], backup_dir)
+        _save_manifest(manifest, backup_dir)
+        kind = 'incremental' if entry.get('base') else 'full'
+        print(f"Database backed up to {os.path.join(backup_dir, entry['file'])} "
+              f"({kind}, {entry['size']} bytes, {entry['seconds']}s)")
+        return entry
+
+
+def _chain(snapshots, entry):
+    """The full snapshot entry belongs to, followed by its incrementals up to entry"""
+    if entry is None:
+        return []
+    base = entry.get('base') or entry['file']
+    chain = [s for s in snapshots if s['file'] == base or s.get('base') == base]
+    if not chain or chain[0]['file'] != base:
+        return []
+    return chain[:chain.index(entry) + 1]
+
+
+def _full(source, db_path, backup_dir, name, wal):
+    target = os.path.join(backup_dir, name)
+    partial = target + '.part'
+    dest = sqlite3.connect(partial)
+    try:
+        source.backup(dest, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+        check = dest.execute("PRAGMA quick_check").fetchone()[0]
+        if check != 'ok':
+            raise RuntimeError(f"integrity check failed: {check}")
+    except Exception:
+        dest.close()
+        os.remove(partial)
+        raise
+    finally:
+        dest.close()
+    os.replace(partial, target)
+    entry = {'file': name, 'sha256': _sha256(target), 'size': os.path.getsize(target)}
+    if wal:
+        # Replaying the chain starts from the first frame, so keep what the copy already contains
+        # (as <name>.wal: <name>-wal would be taken for the copy's own journal when it is opened)
+        _copy_range(db_path + '-wal', target + '.wal', 0, wal['end'])
+        entry.update({'wal': name + '.wal', 'wal_sha256': _sha256(target + '.wal'),
+                      'wal_salt': wal['salt'], 'wal_end': wal['end']})
+        entry['size'] += wal['end']
+    return entry
+
+
+def _incremental(db_path, backup_dir, name, chain, wal):
+    start = chain[-1]['wal_end']
+    if wal['end'] <= start:
+        return None  # only checkpointed or uncommitted changes: nothing new to keep
+    name += '.wal'
+    target = os.path.join(backup_dir, name)
+    _copy_range(db_path + '-wal', target + '.part', start, wal['end'])
+    os.replace(target + '.part', target)
+    return {'file': name, 'base': chain[0]['file'], 'sha256': _sha256(target), 'size': wal['end'] - start,
+            'wal_salt': wal['salt'], 'wal_start': start, 'wal_end': wal['end']}
+
+
+def restore(snapshot_file, target, backup_dir=None):
+    """Rebuild the database as of snapshot_file (full or incremental) at target"""
+    backup_dir = backup_dir or BACKUP_DIR
+    snapshots = load_manifest(backup_dir)['snapshots']
+    entry = next((s for s in snapshots if s['file'] == snapshot_file), None)
+    if entry is None:
+        raise ValueError(f"{snapshot_file} is not in the backup manifest")
+    chain = _chain(snapshots, entry)
+    if not chain:
+        raise ValueError(f"the full snapshot {entry['base']} for {snapshot_file} is missing")
+    base = chain[0]
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    shutil.copyfile(os.path.join(backup_dir, base['file']), target)
+    if base.get('wal'):
+        conn = sqlite3.connect(target)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+        with open(target + '-wal', 'wb') as wal:
+            for part in [base['wal']] + [s['file'] for s in chain[1:]]:
+                with open(os.path.join(backup_dir, part), 'rb') as f:
+                    shutil.copyfileobj(f, wal)
+    conn = sqlite3.connect(target)
+    try:
+        # Opening the database replays the WAL; fold it into the file
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if check != 'ok':
+            raise RuntimeError(f"integrity check failed: {check}")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return target
+
+
+def prune(snapshots, backup_dir, keep=None, keep_daily=None):
+    """Apply retention to manifest entries, deleting their files; returns the entries kept"""
+    keep = BACKUP_KEEP if keep is None else keep
+    keep_daily = BACKUP_KEEP_DAILY if keep_daily is None else keep_daily
+    newest_first = sorted(snapshots, key=lambda s: s['created'], reverse=True)
+    kept = set(s['file'] for s in newest_first[:keep])
+    days = []
+    for s in newest_first:
+        day = s['created'][:10]
+        if day not in days:
+            days.append(day)
+            if len(days) <= keep_daily:
+                kept.add(s['file'])
+    # An incremental is only restorable with its full copy and the segments before it
+    for s in snapshots:
+        if s['file'] in kept:
+            kept.update(c['file'] for c in _chain(snapshots, s))
+    for s in snapshots:
+        if s['file'] not in kept:
+            for name in (s['file'], s.get('wal')):
+                try:
+                    if name:
+                        os.remove(os.path.join(backup_dir, name))
+                except FileNotFoundError:
+                    pass
+    return [s for s in snapshots if s['file'] in kept]
+
+
+def verify(backup_dir=None):
+    """(file, ok) for every snapshot in the manifest"""
+    backup_dir = backup_dir or BACKUP_DIR
+    results = []
+    for s in load_manifest(backup_dir)['snapshots']:
+        files = [(s['file'], s['sha256'])] + ([(s['wal'], s['wal_sha256'])] if s.get('wal') else [])
+        ok = all(os.path.exists(os.path.join(backup_dir, name)) and _sha256(os.path.join(backup_dir, name)) == digest
+                 for name, digest in files)
+        results.append((s['file'], ok))
+    return results
+
+
+def run_scheduled(db_path, interval=None, stop=None, backup_dir=None):
+    """Snapshot every interval seconds until stop is set"""
+    interval = BACKUP_INTERVAL if interval is None else interval
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            snapshot(db_path, backup_dir)
+        except Exception as e:
+            print(f"Failed to create database backup: {e}")
+        stop.wait(interval)
+
+
+def start_scheduler(db_path, interval=None, backup_dir=None):
+    """Run the schedule in a daemon thread; returns the Event that stops it"""
+    stop = threading.Event()
+    thread = threading.Thread(target=run_scheduled, args=(db_path, interval, stop, backup_dir),
+                              name='backup-scheduler', daemon=True)
+    thread.start()
+    return stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite backup service')
+    parser.add_argument('command', choices=('run', 'schedule', 'verify', 'restore'))
+    parser.add_argument('snapshot', nargs='?', help='restore: snapshot file name from the manifest')
+    parser.add_argument('target', nargs='?', help='restore: path to write the database to')
+    parser.add_argument('--force', action='store_true', help='take a full snapshot even if nothing changed')
+    parser.add_argument('--interval', type=float, default=BACKUP_INTERVAL, help='seconds between scheduled runs')
+    args = parser.parse_args()
+
+    from database import database_url
+    db_path = sqlite_path(database_url)
+    if args.command == 'verify':
+        results = verify()
+        for name, ok in results:
+            print(f"{'ok ' if ok else 'BAD'} {name}")
+        sys.exit(0 if all(ok for _, ok in results) else 1)
+    if args.command == 'restore':
+        if not args.snapshot or not args.target:
+            parser.error("restore needs a snapshot file and a target path")
+        print(f"Restored {args.snapshot} to {restore(args.snapshot, args.target)}")
+        return
+    if db_path is None:
+        print("DATABASE_URL is not SQLite; use the database host's own backups")
+        sys.exit(1)
+    if args.command == 'run':
+        if snapshot(db_path, force=args.force) is None:
+            print("No changes since the last backup")
+    else:
+        run_scheduled(db_path, args.interval)
+
+
+if __name__ == "__main__":
+    main()
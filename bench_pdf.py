@@ -0,0 +1,71 @@
+"""Benchmark quotation PDF throughput with and without the cached render assets.
+
+This does not run the code the routes used before pdf_engine existed. "before"
+approximates it with today's pdf_engine by switching the optimisations off: for
+every document it rebuilds the styles, reloads the full-resolution logo from
+disk, rebuilds the header and ASCII85-encodes the streams. "after" renders with
+the assets pdf_engine keeps between documents.
+
+    python bench_pdf.py [--seconds 3]
+"""
+import argparse
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pdf_engine
+
+ITEM_COUNTS = (1, 20, 200)
+
+
+def sample_quotation(item_count):
+    rows = [(f'ITEM-{i:04d}', f'Solar panel mounting kit, variant {i} with installation hardware',
+             2, 125.5, 251.0) for i in range(item_count)]
+    quotation = SimpleNamespace(id=42, date_created=datetime(2025, 1, 15), total_amount=251.0 * item_count,
+                                customer=SimpleNamespace(name='Bench', surname='Customer'))
+    return quotation, rows
+
+
+def cold_render(quotation, rows):
+    logo_dpi, plain_streams = pdf_engine.LOGO_DPI, pdf_engine.PLAIN_STREAMS
+    pdf_engine.LOGO_DPI, pdf_engine.PLAIN_STREAMS = None, False
+    try:
+        pdf_engine.reset_cache()
+        return pdf_engine.render_quotation(quotation, rows)
+    finally:
+        pdf_engine.LOGO_DPI, pdf_engine.PLAIN_STREAMS = logo_dpi, plain_streams
+        pdf_engine.reset_cache()
+
+
+def warm_render(quotation, rows):
+    return pdf_engine.render_quotation(quotation, rows)
+
+
+def pdfs_per_second(render, quotation, rows, seconds):
+    render(quotation, rows)  # warm-up
+    count = 0
+    started = time.perf_counter()
+    while True:
+        render(quotation, rows)
+        count += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=3.0, help='time spent on each measurement')
+    args = parser.parse_args()
+
+    print("before = today's pdf_engine with its caches and plain streams switched off (an approximation)")
+    print(f"{'items':>6} {'before pdf/s':>13} {'after pdf/s':>12} {'speedup':>8}")
+    for item_count in ITEM_COUNTS:
+        quotation, rows = sample_quotation(item_count)
+        before = pdfs_per_second(cold_render, quotation, rows, args.seconds)
+        after = pdfs_per_second(warm_render, quotation, rows, args.seconds)
+        print(f"{item_count:>6} {before:>13.1f} {after:>12.1f} {after / before:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark SQLite read/write throughput with several worker processes sharing one file.
+
+Each worker stands in for a gunicorn worker: it opens its own engine on the
+same database file and, until time runs out, mixes inventory page reads with
+stock moves (read the item, lower its quantity, append a ledger row, commit).
+"before" is a plain engine as database.py used to create it; "after" applies
+sqlite_profile (WAL and the tuned pragmas) and retries writes that hit the
+lock. Writes that still fail are counted as errors.
+
+    python bench_sqlite.py [--workers 4 8] [--seconds 5] [--write-ratio 0.2]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+import sqlalchemy as db
+from sqlalchemy.orm import sessionmaker
+
+import sqlite_profile
+from database import Base
+from models import Inventory, StockTransaction, TransactionType, StockChangeReason
+
+ITEMS = 2000
+PAGE = 50
+
+
+def make_engine(path, tuned):
+    engine = db.create_engine(f'sqlite:///{path}')
+    if tuned:
+        sqlite_profile.configure(engine)
+    return engine
+
+
+def seed(path, tuned):
+    engine = make_engine(path, tuned)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Inventory(name=f'Item {i:05d}', category='Bench', quantity=10 ** 6, unit_price=10.0,
+                               cost_price=6.0) for i in range(ITEMS)])
+    session.commit()
+    engine.dispose()
+
+
+def read_page(session, rng):
+    after = rng.randint(0, ITEMS - PAGE)
+    session.query(Inventory).filter(Inventory.id > after).order_by(Inventory.id).limit(PAGE).all()
+    session.query(db.func.count(StockTransaction.id)).scalar()
+    session.rollback()
+
+
+def move_stock(session, rng):
+    item = session.get(Inventory, rng.randint(1, ITEMS))
+    session.query(Inventory).filter(Inventory.id == item.id).update(
+        {Inventory.quantity: Inventory.quantity - 1}, synchronize_session=False)
+    session.add(StockTransaction(inventory_id=item.id, transaction_type=TransactionType.STOCK_OUT, quantity=-1,
+                                 unit_cost=item.cost_price, reason=StockChangeReason.SOLD_TO_CUSTOMER))
+    session.commit()
+
+
+def worker(path, tuned, seconds, write_ratio, seed_value, results):
+    engine = make_engine(path, tuned)
+    session = sessionmaker(bind=engine)()
+    rng = random.Random(seed_value)
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                if tuned:
+                    sqlite_profile.run_with_retry(session, lambda: move_stock(session, rng))
+                else:
+                    move_stock(session, rng)
+                writes += 1
+            else:
+                read_page(session, rng)
+                reads += 1
+        except db.exc.OperationalError:
+            session.rollback()
+            errors += 1
+    results.put((reads, writes, errors))
+
+
+def run(tuned, workers, seconds, write_ratio):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed(path, tuned)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(path, tuned, seconds, write_ratio, i, results))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    totals = [sum(column) for column in zip(*(results.get() for _ in processes))]
+    for process in processes:
+        process.join()
+    return [total / seconds for total in totals[:2]] + [totals[2]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--seconds', type=float, default=5.0, help='time each run lasts')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='share of operations that write')
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'profile':>7} {'reads/s':>9} {'writes/s':>9} {'failed writes':>14}")
+    for workers in args.workers:
+        for label, tuned in (('before', False), ('after', True)):
+            reads, writes, errors = run(tuned, workers, args.seconds, args.write_ratio)
+            print(f"{workers:>7} {label:>7} {reads:>9.0f} {writes:>9.0f} {errors:>14}")
+
+
+if __name__ == "__main__":
+    main()
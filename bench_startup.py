@@ -0,0 +1,77 @@
+"""Benchmark web worker boot time: a fresh interpreter importing main and serving its first request.
+
+Each sample runs in a new process so nothing is already imported or cached.
+"floor" imports only Flask and SQLAlchemy, which every worker pays for; the
+rest is this app's own start-up cost. The run fails if the median boot is over
+--budget milliseconds or if main pulled in a module that should load lazily.
+
+    python bench_startup.py [--runs 9] [--budget 300]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Only the routes that need these should import them
+LAZY_MODULES = ('reportlab', 'PIL', 'pandas', 'pdf_engine')
+
+BOOT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+with main.app.test_client() as client:
+    status = client.get('/_health').status_code
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'first_request_ms': (served - imported) * 1000,
+                  'status': status, 'lazy_loaded': [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+FLOOR = """
+import json, time
+started = time.perf_counter()
+import flask, sqlalchemy.orm
+print(json.dumps({'import_ms': (time.perf_counter() - started) * 1000}))
+"""
+
+
+def sample(code):
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=9, help='fresh processes per measurement')
+    parser.add_argument('--budget', type=float, default=300, help='median boot budget in milliseconds')
+    args = parser.parse_args()
+
+    floor = [sample(FLOOR)['import_ms'] for _ in range(args.runs)]
+    boots = [sample(BOOT) for _ in range(args.runs)]
+    imports = [b['import_ms'] for b in boots]
+    totals = [b['import_ms'] + b['first_request_ms'] for b in boots]
+
+    print(f"{'':<24} {'median ms':>10} {'min ms':>8}")
+    print(f"{'floor (flask+sqlalchemy)':<24} {statistics.median(floor):>10.0f} {min(floor):>8.0f}")
+    print(f"{'import main':<24} {statistics.median(imports):>10.0f} {min(imports):>8.0f}")
+    print(f"{'boot + first request':<24} {statistics.median(totals):>10.0f} {min(totals):>8.0f}")
+    print(f"{'app cost over floor':<24} {statistics.median(totals) - statistics.median(floor):>10.0f}")
+
+    problems = []
+    lazy_loaded = sorted(set(m for b in boots for m in b['lazy_loaded']))
+    if lazy_loaded:
+        problems.append(f"imported at boot: {', '.join(lazy_loaded)}")
+    if any(b['status'] != 200 for b in boots):
+        problems.append("/_health did not return 200")
+    if statistics.median(totals) > args.budget:
+        problems.append(f"median boot {statistics.median(totals):.0f} ms is over the {args.budget:.0f} ms budget")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Bulk export of invoice and payment receipt PDFs for a date range as one ZIP.
+
+Documents are read in the calling process and rendered by a pool of worker
+processes; each finished PDF is written straight into a ZIP file on disk, so
+memory use stays flat however many documents the range holds. Exports requested
+over HTTP run as 'bulk_export' jobs (see jobs.py); progress is kept in a JSON
+status file next to the archive, which any web worker can read.
+
+    python bulk_export.py --start 2025-01-01 --end 2025-02-01 [--kinds invoice,payment] [-o out.zip]
+"""
+import os
+import json
+import uuid
+import zipfile
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.orm import selectinload, joinedload
+
+import documents
+import pdf_cache
+from models import Invoice, Payment
+
+EXPORT_DIR = os.environ.get('EXPORT_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'instance', 'exports')
+EXPORT_PROCESSES = int(os.environ.get('EXPORT_PROCESSES', 0)) or None
+EXPORT_KINDS = ('invoice', 'payment')
+# Renders in flight per worker process; bounds how many PDFs wait in memory
+IN_FLIGHT_PER_PROCESS = 4
+
+
+def collect_documents(session, start, end, kinds=EXPORT_KINDS):
+    """Documents dated in [start, end), invoices first, in date order"""
+    result = []
+    if 'invoice' in kinds:
+        invoices = session.query(Invoice).options(
+            joinedload(Invoice.customer), selectinload(Invoice.items)
+        ).filter(Invoice.date_created >= start, Invoice.date_created < end).order_by(Invoice.date_created, Invoice.id)
+        result.extend(documents.invoice_document(session, invoice) for invoice in invoices)
+    if 'payment' in kinds:
+        payments = session.query(Payment).options(
+            joinedload(Payment.invoice).joinedload(Invoice.customer)
+        ).filter(Payment.payment_date >= start, Payment.payment_date < end).order_by(Payment.payment_date, Payment.id)
+        result.extend(documents.payment_document(payment) for payment in payments)
+    return result
+
+
+def _archive_name(document):
+    folder = 'invoices' if document.doc_type == 'invoice' else 'receipts'
+    return f"{folder}/{document.filename}"
+
+
+def _cached_path(document):
+    path = pdf_cache.entry_path(document.doc_type, document.doc_id, document.etag)
+    return path if os.path.exists(path) else None
+
+
+def write_zip(docs, zip_path, processes=None, progress=None):
+    """Render docs into zip_path with a process pool, calling progress(done, total) as they land"""
+    import pdf_engine
+    total = len(docs)
+    done = 0
+    tmp_path = zip_path + '.part'
+    # PDFs are already compressed, so store them as-is
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as archive:
+        pending = deque()
+        processes = processes or EXPORT_PROCESSES or os.cpu_count() or 1
+        window = processes * IN_FLIGHT_PER_PROCESS
+        # spawn, not fork: the caller may be a threaded web worker holding DB connections
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            for document in docs:
+                cached = _cached_path(document)
+                if cached is None:
+                    # Workers only need pdf_engine, not the database or Flask
+                    cached = pool.submit(pdf_engine.render, document.doc_type, document.header, document.rows)
+                pending.append((document, cached))
+                while len(pending) >= window or (pending and isinstance(pending[0][1], str)):
+                    done += _write_next(archive, pending)
+                    if progress:
+                        progress(done, total)
+            while pending:
+                done += _write_next(archive, pending)
+                if progress:
+                    progress(done, total)
+    os.replace(tmp_path, zip_path)
+    return total
+
+
+def _write_next(archive, pending):
+    document, result = pending.popleft()
+    if isinstance(result, str):
+        archive.write(result, _archive_name(document))
+    else:
+        archive.writestr(_archive_name(document), result.result())
+    return 1
+
+
+# Status files let any web worker report on an export started by another one
+
+def valid_export_id(export_id):
+    return len(export_id) == 32 and all(c in '0123456789abcdef' for c in export_id)
+
+
+def _status_path(export_id):
+    return os.path.join(EXPORT_DIR, f"{export_id}.json")
+
+
+def zip_path(export_id):
+    return os.path.join(EXPORT_DIR, f"{export_id}.zip")
+
+
+def read_status(export_id):
+    try:
+        with open(_status_path(export_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_status(export_id, **fields):
+    status = read_status(export_id) or {'id': export_id}
+    status.update(fields)
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tmp_path = _status_path(export_id) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, _status_path(export_id))
+    return status
+
+
+def new_export(start, end, kinds=EXPORT_KINDS):
+    """Record a queued export and return its id"""
+    export_id = uuid.uuid4().hex
+    write_status(export_id, state='queued', start=start.isoformat(), end=end.isoformat(), kinds=list(kinds),
+                 total=None, done=0, error=None, created=datetime.utcnow().isoformat())
+    return export_id
+
+
+def run_export(session, export_id, processes=None):
+    """Collect and render a queued export, keeping its status file up to date"""
+    status = read_status(export_id)
+    try:
+        start, end = datetime.fromisoformat(status['start']), datetime.fromisoformat(status['end'])
+        docs = collect_documents(session, start, end, status['kinds'])
+        session.rollback()  # done reading; don't hold a transaction open while rendering
+        write_status(export_id, state='running', total=len(docs), done=0)
+
+        last = {'done': 0}
+
+        def progress(done, total):
+            # Rewriting the status file for every PDF is wasteful on large exports
+            if done == total or done - last['done'] >= max(1, total // 50):
+                last['done'] = done
+                write_status(export_id, done=done)
+
+        write_zip(docs, zip_path(export_id), processes, progress)
+        return write_status(export_id, state='done', done=len(docs), finished=datetime.utcnow().isoformat())
+    except Exception as e:
+        write_status(export_id, state='failed', error=str(e), finished=datetime.utcnow().isoformat())
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export invoice and payment receipt PDFs for a date range')
+    parser.add_argument('--start', required=True, type=datetime.fromisoformat, help='first day, YYYY-MM-DD')
+    parser.add_argument('--end', required=True, type=datetime.fromisoformat, help='day after the last, YYYY-MM-DD')
+    parser.add_argument('--kinds', default=','.join(EXPORT_KINDS), help='comma separated: invoice,payment')
+    parser.add_argument('--processes', type=int, help='worker processes (default: EXPORT_PROCESSES or CPUs)')
+    parser.add_argument('-o', '--output', help='ZIP path (default: export_<start>_<end>.zip)')
+    args = parser.parse_args()
+
+    from database import db_session
+    kinds = [k.strip() for k in args.kinds.split(',') if k.strip()]
+    output = args.output or f"export_{args.start:%Y%m%d}_{args.end:%Y%m%d}.zip"
+    docs = collect_documents(db_session, args.start, args.end, kinds)
+    db_session.remove()
+    print(f"Rendering {len(docs)} documents into {output}")
+    write_zip(docs, output, args.processes,
+              lambda done, total: print(f"\r{done}/{total}", end='', flush=True))
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import pytest
+import sqlalchemy as db
+from sqlalchemy.orm import sessionmaker
+
+import models  # registers the tables on Base.metadata
+from database import Base
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    """Factory for engines on fresh SQLite files under tmp_path; the app's tables are created unless tables=False"""
+    engines = []
+
+    def make(name='test.db', tables=True):
+        bind = db.create_engine(f'sqlite:///{tmp_path / name}')
+        if tables:
+            Base.metadata.create_all(bind)
+        engines.append(bind)
+        return bind
+
+    yield make
+    for bind in engines:
+        bind.dispose()
+
+
+@pytest.fixture
+def session(make_engine):
+    """Session on a fresh database with the app's tables"""
+    session = sessionmaker(bind=make_engine())()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def app_db(make_engine, tmp_path, monkeypatch):
+    """Run the Flask app against a fresh database instead of instance/database.db; yields its engine.
+
+    db_session and the read-only sessions are rebound to it, and the
+    process-wide caches (reference data, dashboard, PDFs) start empty, so
+    nothing leaks into or out of the developer's database.
+    """
+    import database
+    import refcache
+    import pdf_cache
+    import search_index
+    import sqlite_profile
+    import dashboard_cache
+
+    # Same pragmas and lock handling as database.engine
+    bind = make_engine('app.db', tables=False)
+    sqlite_profile.configure(bind)
+    Base.metadata.create_all(bind)
+    search_index.build_index(bind)
+    database.db_session.remove()
+    database.db_session.configure(bind=bind)
+    database.ReadSession.configure(bind=bind)
+    monkeypatch.setattr(refcache, 'cache', refcache.ReferenceCache(refcache.LRUBackend()))
+    monkeypatch.setattr(pdf_cache, 'PDF_CACHE_DIR', str(tmp_path / 'pdf_cache'))
+    dashboard_cache.invalidate_dashboard()
+    try:
+        yield bind
+    finally:
+        database.db_session.remove()
+        database.db_session.configure(bind=database.engine)
+        database.ReadSession.configure(bind=database.read_engine)
+        dashboard_cache.invalidate_dashboard()
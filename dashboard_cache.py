@@ -0,0 +1,59 @@
+import os
+import time
+import threading
+import sqlalchemy as db
+
+from models import Supplier, Customer, Inventory, quotation, Activity
+from reports import top_locations
+
+# Seconds a computed set of dashboard counters stays valid if nothing invalidates it
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', 60))
+
+_lock = threading.Lock()
+_cached = {'metrics': None, 'expires': 0.0, 'generation': 0}
+
+
+def compute_dashboard_metrics(session):
+    """Dashboard counters and top locations in two queries"""
+    counts = session.execute(db.select(
+        db.select(db.func.count()).select_from(Supplier).scalar_subquery(),
+        db.select(db.func.count()).select_from(Customer).scalar_subquery(),
+        db.select(db.func.count()).select_from(Inventory).scalar_subquery(),
+        db.select(db.func.count()).select_from(quotation).scalar_subquery(),
+        db.select(db.func.count()).select_from(Activity).scalar_subquery()
+    )).one()
+    location_labels, location_data = top_locations(session, 10)
+    return {
+        'suppliers_count': counts[0],
+        'customers_count': counts[1],
+        'inventory_count': counts[2],
+        'quotations_count': counts[3],
+        'activities_count': counts[4],
+        'top_locations': location_labels,
+        'location_data': location_data
+    }
+
+
+def get_dashboard_metrics(session):
+    """Cached dashboard counters, recomputed after the TTL or an invalidation"""
+    now = time.monotonic()
+    with _lock:
+        if _cached['metrics'] is not None and now < _cached['expires']:
+            return _cached['metrics']
+        generation = _cached['generation']
+
+    metrics = compute_dashboard_metrics(session)
+
+    with _lock:
+        # Don't store a result computed while a write invalidated the cache
+        if generation == _cached['generation']:
+            _cached['metrics'] = metrics
+            _cached['expires'] = now + DASHBOARD_CACHE_TTL
+    return metrics
+
+
+def invalidate_dashboard():
+    """Drop the cached counters; call after committing a write that changes them"""
+    with _lock:
+        _cached['metrics'] = None
+        _cached['generation'] += 1
@@ -1,54 +1,98 @@
 import os
-from datetime import datetime
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
 
+import sqlite_profile
+
 # Load environment variables from .env file if it exists
 load_dotenv()
 
 # Use DATABASE_URL from environment, default to SQLite for local development
-database_url = os.environ.get('DATABASE_URL')
-if database_url and database_url.startswith("postgres://"):
-    database_url = database_url.replace("postgres://", "postgresql://", 1)
-
-database_url = database_url or 'sqlite:///instance/database.db'
-
-# Ensure the directory exists for SQLite database (only for local development)
-if database_url.startswith('sqlite:///'):
-    db_path = database_url.replace('sqlite:///', '')
-    db_dir = os.path.dirname(db_path)
-    if db_dir and not os.path.exists(db_dir):
-        os.makedirs(db_dir)
-    
-    # Create an automatic backup of the SQLite database if it exists
-    if os.path.exists(db_path):
-        import shutil
-        backup_dir = os.path.join(os.getcwd(), 'backups')
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_path = os.path.join(backup_dir, f"backup_{timestamp}_{os.path.basename(db_path)}")
-        try:
-            shutil.copy2(db_path, backup_path)
-            # Keep only last 5 backups
-            backups = sorted([os.path.join(backup_dir, f) for f in os.listdir(backup_dir) if f.startswith('backup_')], key=os.path.getmtime)
-            while len(backups) > 5:
-                os.remove(backups.pop(0))
-            print(f"Database backed up successfully to {backup_path}")
-        except Exception as e:
-            print(f"Failed to create database backup: {e}")
+def _normalise_url(url):
+    if url and url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+database_url = _normalise_url(os.environ.get('DATABASE_URL')) or 'sqlite:///instance/database.db'
 
 # Configure engine with connection pooling for production
 engine = create_engine(database_url, pool_pre_ping=True, pool_recycle=300)
+# WAL, busy timeout and cache pragmas on every SQLite connection (no-op on PostgreSQL)
+sqlite_profile.configure(engine)
 db_session = scoped_session(sessionmaker(autocommit=False,
                                          autoflush=False,
                                          bind=engine))
 Base = declarative_base()
 Base.query = db_session.query_property()
 
+
+# Reports, statement PDFs and exports read through a second engine with its own
+# pool, so they never hold write locks or take connections from invoice writes.
+# DATABASE_READ_URL can point at a PostgreSQL replica; otherwise the primary is
+# opened read-only (SQLite: mode=ro; PostgreSQL: read-only transactions).
+READ_POOL_SIZE = int(os.environ.get('DATABASE_READ_POOL_SIZE', 5))
+READ_MAX_OVERFLOW = int(os.environ.get('DATABASE_READ_MAX_OVERFLOW', 5))
+READ_STATEMENT_TIMEOUT_MS = int(os.environ.get('DATABASE_READ_STATEMENT_TIMEOUT_MS', 30000))
+
+
+def _read_url():
+    url = _normalise_url(os.environ.get('DATABASE_READ_URL'))
+    if url:
+        return url
+    path = database_url.replace('sqlite:///', '', 1) if database_url.startswith('sqlite:///') else None
+    if path and path != ':memory:' and not path.startswith('file:'):
+        return f'sqlite:///file:{path}?mode=ro&uri=true'
+    return database_url
+
+
+def _create_read_engine():
+    url = _read_url()
+    if url == database_url and url.startswith('sqlite:'):
+        return engine  # in-memory database: there is nothing to open a second time
+    if url.startswith('sqlite:'):
+        read_engine = create_engine(url, pool_size=READ_POOL_SIZE, max_overflow=READ_MAX_OVERFLOW,
+                                    pool_pre_ping=True, pool_recycle=300)
+        sqlite_profile.configure(read_engine, read_only=True, statement_timeout_ms=READ_STATEMENT_TIMEOUT_MS)
+        return read_engine
+    options = f'-c statement_timeout={READ_STATEMENT_TIMEOUT_MS} -c default_transaction_read_only=on'
+    return create_engine(url, pool_size=READ_POOL_SIZE, max_overflow=READ_MAX_OVERFLOW,
+                         pool_pre_ping=True, pool_recycle=300, connect_args={'options': options})
+
+
+read_engine = _create_read_engine()
+ReadSession = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, info={'read_only': True})
+
+
+def is_read_only(session):
+    return bool(session.info.get('read_only'))
+
+
+@contextmanager
+def read_only():
+    """Point db_session at a read-only session for the block; also usable as a view decorator, @read_only()"""
+    outer = db_session.registry() if db_session.registry.has() else None
+    session = ReadSession()
+    db_session.registry.set(session)
+    try:
+        yield session
+    finally:
+        session.close()
+        if outer is None:
+            db_session.registry.clear()
+        else:
+            db_session.registry.set(outer)
+
+
 def init_db():
     import models
+    # Importing this module does no I/O; the SQLite directory is created here instead.
+    # Backups are taken by backup.py on a schedule.
+    if database_url.startswith('sqlite:///'):
+        db_dir = os.path.dirname(database_url.replace('sqlite:///', ''))
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
     Base.metadata.create_all(bind=engine)
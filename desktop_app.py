@@ -20,6 +20,9 @@ def run_flask():
     app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
 
 if __name__ == '__main__':
+    import maintenance
+    maintenance.run()
+
     local_ip = get_local_ip()
     print(f"Server will be accessible at: http://{local_ip}:5000")
     print("You can access this from any device on the same network using the above URL.")
@@ -0,0 +1,98 @@
+"""Picklable snapshots of the quotations, invoices and payment receipts pdf_engine renders.
+
+A Document holds exactly the values its PDF shows, read out of the ORM objects
+up front. It can therefore be rendered after the session is gone or in another
+process, and its fingerprint tells pdf_cache whether a stored file is current.
+pdf_engine (and with it ReportLab) is imported on first use, not by the web app
+at boot.
+"""
+from collections import namedtuple
+from types import SimpleNamespace
+
+import pdf_cache
+from models import Inventory
+
+Document = namedtuple('Document', 'doc_type doc_id etag filename header rows')
+
+
+def render(document):
+    """PDF bytes for a Document; safe to call in a worker process"""
+    import pdf_engine
+    return pdf_engine.render(document.doc_type, document.header, document.rows)
+
+
+def _inventory_by_id(session, ids):
+    ids = {i for i in ids if i}
+    if not ids:
+        return {}
+    return {item.id: item for item in session.query(Inventory).filter(Inventory.id.in_(ids)).all()}
+
+
+def _customer(customer):
+    return SimpleNamespace(name=customer.name, surname=customer.surname)
+
+
+def _document(doc_type, doc_id, filename, header, rows=None):
+    etag = pdf_cache.fingerprint(doc_type, header, rows)
+    return Document(doc_type, doc_id, etag, filename, header, rows)
+
+
+def quotation_document(session, quotation_obj, items):
+    inventory = _inventory_by_id(session, [item.inventory_id for item in items])
+    rows = []
+    for item in items:
+        if item.inventory_id:
+            stock = inventory.get(item.inventory_id)
+            item_name = stock.name if stock else "Unknown Item"
+            item_code = (stock.specifications or stock.brand) if stock else "N/A"
+        else:
+            item_name = item.description or "Custom Item"
+            item_code = item.item_code or "Custom"
+        rows.append((item_code, item_name, item.quantity, item.unit_price, item.quantity * item.unit_price))
+
+    header = SimpleNamespace(id=quotation_obj.id, customer=_customer(quotation_obj.customer),
+                             date_created=quotation_obj.date_created, total_amount=quotation_obj.total_amount)
+    return _document('quotation', quotation_obj.id, f'quotation_{quotation_obj.id}.pdf', header, rows)
+
+
+def invoice_document(session, invoice):
+    import pdf_engine
+    items = invoice.items
+    # Only lines whose description is empty or just the code fall back to the inventory name
+    inventory = _inventory_by_id(session, [
+        item.inventory_id for item in items
+        if not item.description or item.description == (item.item_code or "N/A")
+    ])
+    rows = []
+    for item in items:
+        item_code = item.item_code or "N/A"
+        item_text = item.description
+        if not item_text or item_text == item_code:
+            stock = inventory.get(item.inventory_id)
+            if stock:
+                item_text = stock.name
+        rows.append((item_code, item_text or "N/A", item.quantity, item.unit_price, item.amount))
+
+    header = SimpleNamespace(id=invoice.id, customer=_customer(invoice.customer), date_created=invoice.date_created,
+                             status=SimpleNamespace(value=invoice.status.value), total_amount=invoice.total_amount,
+                             paid_amount=invoice.paid_amount, balance_due=invoice.balance_due)
+    label = pdf_engine.customer_label(invoice.customer)
+    return _document('invoice', invoice.id, f'Invoice_{invoice.id}_{pdf_engine.safe_filename(label)}.pdf',
+                     header, rows)
+
+
+def payment_document(payment):
+    import pdf_engine
+    invoice = payment.invoice
+    header = SimpleNamespace(
+        id=payment.id,
+        invoice=SimpleNamespace(id=invoice.id, customer=_customer(invoice.customer)),
+        amount=payment.amount,
+        transaction_id=payment.transaction_id,
+        reference_number=payment.reference_number,
+        notes=payment.notes,
+        payment_date=payment.payment_date,
+        payment_method=SimpleNamespace(value=payment.payment_method.value)
+    )
+    label = pdf_engine.customer_label(invoice.customer)
+    return _document('payment', payment.id, f'Payment_{payment.id}_{pdf_engine.safe_filename(label)}.pdf', header)
@@ -0,0 +1,179 @@
+"""Opt-in per-request SQL and latency instrumentation.
+
+Enabled by setting ENABLE_INSTRUMENTATION=1. Every request then gets a
+Server-Timing header (app, sql and render durations plus the query count) and
+per-route histograms are exposed in Prometheus text format at /_metrics.
+Metrics are kept per process, so under gunicorn each worker reports its own.
+"""
+import os
+import time
+import threading
+from flask import g, request, has_request_context, request_started, request_finished, \
+    before_render_template, template_rendered, Response
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+SLOWEST_PER_REQUEST = 3
+SLOWEST_TRACKED = 10
+SLOW_REQUEST_SQL_MS = float(os.environ.get('SLOW_REQUEST_SQL_MS', 500))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple, Prometheus style"""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts, total = self.series.get(labels, ([0] * len(self.buckets), [0, 0.0]))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        total[0] += 1
+        total[1] += value
+        self.series[labels] = (counts, total)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, (count, value_sum)) in sorted(self.series.items()):
+            label_str = ','.join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label_str},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label_str},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label_str}}} {value_sum:.6f}')
+            lines.append(f'{self.name}_count{{{label_str}}} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide store for per-route request metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        labels = ('route', 'method')
+        self.request_seconds = Histogram('http_request_duration_seconds', 'Total request handling time.',
+                                         DURATION_BUCKETS, labels)
+        self.sql_seconds = Histogram('http_request_sql_seconds', 'Time spent executing SQL per request.',
+                                     DURATION_BUCKETS, labels)
+        self.sql_queries = Histogram('http_request_sql_queries', 'SQL statements executed per request.',
+                                     QUERY_COUNT_BUCKETS, labels)
+        self.render_seconds = Histogram('http_request_render_seconds', 'Template rendering time per request.',
+                                        DURATION_BUCKETS, labels)
+        self.slowest = []  # (seconds, route, statement), longest first
+
+    def record(self, labels, stats, total_seconds):
+        with self.lock:
+            self.request_seconds.observe(labels, total_seconds)
+            self.sql_seconds.observe(labels, stats['sql_seconds'])
+            self.sql_queries.observe(labels, stats['sql_count'])
+            self.render_seconds.observe(labels, stats['render_seconds'])
+            for seconds, statement in stats['slowest']:
+                self.slowest.append((seconds, labels[0], statement))
+            self.slowest = sorted(self.slowest, reverse=True)[:SLOWEST_TRACKED]
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for histogram in (self.request_seconds, self.sql_seconds, self.sql_queries, self.render_seconds):
+                lines.extend(histogram.render())
+            lines.append('# Slowest SQL statements observed by this process')
+            for seconds, route, statement in self.slowest:
+                lines.append(f"# {seconds * 1000:.1f}ms {route}: {' '.join(statement.split())[:200]}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _request_stats():
+    if not has_request_context():
+        return None
+    return g.get('_instrumentation')
+
+
+def _on_request_started(sender, **extra):
+    g._instrumentation = {
+        'started': time.perf_counter(),
+        'sql_count': 0,
+        'sql_seconds': 0.0,
+        'render_seconds': 0.0,
+        'render_started': None,
+        'slowest': [],
+    }
+
+
+def _on_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_instrumentation_started', []).append(time.perf_counter())
+
+
+def _on_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_instrumentation_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _request_stats()
+    if stats is None:
+        return
+    stats['sql_count'] += 1
+    stats['sql_seconds'] += elapsed
+    stats['slowest'] = sorted(stats['slowest'] + [(elapsed, statement)], reverse=True)[:SLOWEST_PER_REQUEST]
+
+
+def _on_before_render_template(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None:
+        stats['render_started'] = time.perf_counter()
+
+
+def _on_template_rendered(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None and stats['render_started'] is not None:
+        stats['render_seconds'] += time.perf_counter() - stats['render_started']
+        stats['render_started'] = None
+
+
+def _on_request_finished(sender, response, **extra):
+    stats = _request_stats()
+    if stats is None:
+        return
+    total_seconds = time.perf_counter() - stats['started']
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    registry.record((route, request.method), stats, total_seconds)
+
+    response.headers['Server-Timing'] = ', '.join([
+        f"app;dur={total_seconds * 1000:.1f}",
+        f"sql;dur={stats['sql_seconds'] * 1000:.1f};desc=\"{stats['sql_count']} queries\"",
+        f"render;dur={stats['render_seconds'] * 1000:.1f}",
+    ])
+
+    if stats['sql_seconds'] * 1000 >= SLOW_REQUEST_SQL_MS:
+        sender.logger.warning("Slow request %s %s: %d queries, %.1fms SQL%s", request.method, route,
+                              stats['sql_count'], stats['sql_seconds'] * 1000,
+                              ''.join(f"\n  - {seconds * 1000:.1f}ms {' '.join(statement.split())[:200]}"
+                                      for seconds, statement in stats['slowest']))
+
+
+def metrics():
+    """Prometheus text exposition of the per-route histograms"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def is_enabled():
+    return os.environ.get('ENABLE_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+
+
+def init_app(app, *engines):
+    """Attach the SQL listeners to each engine (the primary and the read-only one) and the request signals to app"""
+    for engine in dict.fromkeys(engines):
+        event.listen(engine, 'before_cursor_execute', _on_before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _on_after_cursor_execute)
+    request_started.connect(_on_request_started, app)
+    request_finished.connect(_on_request_finished, app)
+    before_render_template.connect(_on_before_render_template, app)
+    template_rendered.connect(_on_template_rendered, app)
+    app.add_url_rule('/_metrics', 'metrics', metrics)
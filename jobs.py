@@ -0,0 +1,284 @@
+"""Database-backed background job queue.
+
+Slow work (bulk exports, rollup rebuilds, backups, schema/enum maintenance, stock
+snapshots, sync runs) is stored as a row in the jobs table and executed by a
+separate worker process, so web requests only enqueue it and poll GET /jobs/<id>.
+
+    python jobs.py worker [--once] [--poll 2]
+    python jobs.py submit <kind> ['{"json": "payload"}']
+    python jobs.py status <id>
+
+Jobs are claimed with a conditional UPDATE, so any number of workers can share
+the queue. A failed job is retried with exponential backoff until it has used
+max_attempts; a job whose worker died is requeued once its lock expires.
+Workers also take scheduled SQLite backups (see backup.py).
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from models import Job, JobStatus
+
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', 30))  # seconds, doubled per attempt
+JOB_LOCK_TIMEOUT = float(os.environ.get('JOB_LOCK_TIMEOUT', 3600))  # seconds before a RUNNING job is presumed dead
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register fn(session, payload) -> JSON-serialisable result as the handler for kind"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def submit(session, kind, payload=None, max_attempts=3, run_after=None):
+    """Queue a job and commit; returns the Job"""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job(kind=kind, payload=json.dumps(payload or {}), status=JobStatus.QUEUED,
+              max_attempts=max_attempts, run_after=run_after or datetime.utcnow())
+    session.add(job)
+    session.commit()
+    return job
+
+
+def job_status(job):
+    """JSON view of a job for the status API"""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status.value,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'created': job.date_created.isoformat() if job.date_created else None,
+        'finished': job.date_finished.isoformat() if job.date_finished else None,
+    }
+
+
+def requeue_stale(session):
+    """Put RUNNING jobs whose lock has expired back on the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    count = session.query(Job).filter(Job.status == JobStatus.RUNNING, Job.locked_at < cutoff).update(
+        {Job.status: JobStatus.QUEUED, Job.locked_by: None, Job.locked_at: None}, synchronize_session=False)
+    session.commit()
+    return count
+
+
+def claim(session, worker_id):
+    """Atomically take the oldest runnable job, or return None"""
+    now = datetime.utcnow()
+    candidates = session.query(Job.id).filter(Job.status == JobStatus.QUEUED, Job.run_after <= now) \
+        .order_by(Job.run_after, Job.id).limit(5).all()
+    for (job_id,) in candidates:
+        # Only one worker's UPDATE can match while the row is still QUEUED
+        claimed = session.query(Job).filter(Job.id == job_id, Job.status == JobStatus.QUEUED).update(
+            {Job.status: JobStatus.RUNNING, Job.locked_by: worker_id, Job.locked_at: now,
+             Job.attempts: Job.attempts + 1}, synchronize_session=False)
+        session.commit()
+        if claimed:
+            return session.get(Job, job_id)
+    return None
+
+
+def run_job(session, job):
+    """Execute a claimed job and record its outcome"""
+    fn = HANDLERS.get(job.kind)
+    try:
+        if fn is None:
+            raise ValueError(f"No handler registered for job kind {job.kind}")
+        result = fn(session, json.loads(job.payload or '{}'))
+        session.commit()
+        job.status = JobStatus.DONE
+        job.result = json.dumps(result, default=str)
+        job.error = None
+        job.date_finished = datetime.utcnow()
+    except Exception as e:
+        session.rollback()
+        job = session.get(Job, job.id)
+        job.error = f"{type(e).__name__}: {e}"
+        if job.attempts >= job.max_attempts:
+            job.status = JobStatus.FAILED
+            job.date_finished = datetime.utcnow()
+        else:
+            job.status = JobStatus.QUEUED
+            job.run_after = datetime.utcnow() + timedelta(seconds=JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        print(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {e}")
+    job.locked_by = None
+    job.locked_at = None
+    session.commit()
+    return job
+
+
+def run_pending(session, worker_id=None, limit=None):
+    """Run runnable jobs until the queue is empty (or limit is reached); returns how many ran"""
+    worker_id = worker_id or default_worker_id()
+    count = 0
+    while limit is None or count < limit:
+        job = claim(session, worker_id)
+        if job is None:
+            break
+        run_job(session, job)
+        count += 1
+    return count
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def work(session_factory, poll_interval=JOB_POLL_INTERVAL, stop=None):
+    """Worker loop: run jobs as they become due, sleeping poll_interval when idle"""
+    worker_id = default_worker_id()
+    print(f"Job worker {worker_id} started")
+    _start_backup_scheduler()
+    session = session_factory()
+    try:
+        requeue_stale(session)
+        while stop is None or not stop.is_set():
+            if not run_pending(session, worker_id):
+                requeue_stale(session)
+                if stop is not None:
+                    stop.wait(poll_interval)
+                else:
+                    time.sleep(poll_interval)
+    finally:
+        session.close()
+
+
+def start_worker_thread(session_factory, poll_interval=JOB_POLL_INTERVAL):
+    """Run a worker loop in a daemon thread, for single-process deployments"""
+    stop = threading.Event()
+    thread = threading.Thread(target=work, args=(session_factory, poll_interval, stop), name='job-worker',
+                              daemon=True)
+    thread.start()
+    return thread, stop
+
+
+def _start_backup_scheduler():
+    import backup
+    from database import database_url
+    db_path = backup.sqlite_path(database_url)
+    if db_path and backup.BACKUP_INTERVAL > 0:
+        backup.start_scheduler(db_path)
+
+
+# Handlers
+
+@handler('backup_database')
+def _backup_database(session, payload):
+    import backup
+    from database import database_url
+    db_path = backup.sqlite_path(database_url)
+    if db_path is None:
+        raise ValueError("DATABASE_URL is not SQLite")
+    entry = backup.snapshot(db_path, force=payload.get('force', False))
+    return entry or {'skipped': 'unchanged since the last backup'}
+
+
+@handler('bulk_export')
+def _bulk_export(session, payload):
+    import bulk_export
+    from database import ReadSession
+    # Documents are read through the reporting pool; session only records the job
+    read_session = ReadSession()
+    try:
+        status = bulk_export.run_export(read_session, payload['export_id'])
+    finally:
+        read_session.close()
+    return {'export_id': payload['export_id'], 'documents': status.get('total')}
+
+
+@handler('rebuild_financial_summary')
+def _rebuild_financial_summary(session, payload):
+    from reports import rebuild_financial_summary
+    drifted = rebuild_financial_summary(session, payload.get('year'), payload.get('month'))
+    return {'rebuilt': True, 'drifted_months': [f"{y}-{m:02d}" for (y, m), _ in drifted]}
+
+
+@handler('normalize_enums')
+def _normalize_enums(session, payload):
+    import maintenance
+    return maintenance.run(['normalize-enums'])
+
+
+@handler('check_db_schema')
+def _check_db_schema(session, payload):
+    import maintenance
+    return maintenance.run(['create-tables', 'migrate', 'create-indexes'])
+
+
+@handler('rebuild_search_index')
+def _rebuild_search_index(session, payload):
+    import maintenance
+    return maintenance.run(['search-index'])
+
+
+@handler('stock_snapshot')
+def _stock_snapshot(session, payload):
+    # {"repeat": true} keeps a monthly chain going: each run queues the next month's
+    import stock
+    as_of = datetime.fromisoformat(payload['as_of']) if payload.get('as_of') else stock.month_start()
+    result = {'as_of': as_of.isoformat(), 'snapshots': stock.take_snapshots(session, as_of)}
+    if payload.get('repeat'):
+        next_month = stock.month_start(as_of + timedelta(days=32))
+        result['next_job'] = submit(session, 'stock_snapshot', {'repeat': True}, run_after=next_month).id
+    return result
+
+
+@handler('sync_to_render')
+def _sync_to_render(session, payload):
+    # The target URL holds credentials, so only the name of the env var is queued
+    env_var = payload.get('target_url_env', 'RENDER_DATABASE_URL')
+    target_url = os.environ.get(env_var)
+    if not target_url:
+        raise ValueError(f"{env_var} is not set")
+    if target_url.startswith("postgres://"):
+        target_url = target_url.replace("postgres://", "postgresql://", 1)
+    from sync_to_render import sync_data
+    sync_data(target_url)
+    return {'target_url_env': env_var}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Background job queue')
+    commands = parser.add_subparsers(dest='command', required=True)
+    worker = commands.add_parser('worker', help='process queued jobs')
+    worker.add_argument('--once', action='store_true', help='drain the queue once and exit')
+    worker.add_argument('--poll', type=float, default=JOB_POLL_INTERVAL, help='seconds between polls when idle')
+    submit_cmd = commands.add_parser('submit', help='queue a job')
+    submit_cmd.add_argument('kind', choices=sorted(HANDLERS))
+    submit_cmd.add_argument('payload', nargs='?', default='{}', help='JSON payload')
+    status_cmd = commands.add_parser('status', help='show a job')
+    status_cmd.add_argument('id', type=int)
+    args = parser.parse_args()
+
+    from database import db_session, init_db
+    init_db()
+    if args.command == 'worker':
+        if args.once:
+            print(f"Ran {run_pending(db_session)} jobs")
+        else:
+            work(db_session.session_factory, args.poll)
+    elif args.command == 'submit':
+        job = submit(db_session, args.kind, json.loads(args.payload))
+        print(f"Queued job {job.id} ({job.kind})")
+    else:
+        job = db_session.get(Job, args.id)
+        if job is None:
+            print(f"Job {args.id} not found")
+            sys.exit(1)
+        print(json.dumps(job_status(job), indent=2))
+
+
+if __name__ == "__main__":
+    main()
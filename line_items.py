@@ -0,0 +1,134 @@
+"""Item rows posted by the invoice and quotation forms.
+
+The forms post parallel arrays: item_id[] (an inventory id or 'custom'),
+quantity[], unit_price[] and custom_item_name[]. load() turns them into
+LineItem objects, fetching every referenced Inventory row with a single
+IN (...) query and checking stock for all lines in one pass, so a 50-line
+quote costs one lookup rather than fifty.
+"""
+from collections import OrderedDict
+
+from models import Inventory
+
+
+class LineItemError(ValueError):
+    """A submitted line is invalid; the message is shown to the user"""
+
+
+class LineItem:
+    """One validated form line; inventory_item is None for custom lines"""
+
+    def __init__(self, position, inventory_item, custom_name, quantity, unit_price):
+        self.position = position
+        self.inventory_item = inventory_item
+        self.custom_name = custom_name
+        self.quantity = quantity
+        self.unit_price = unit_price
+
+    @property
+    def is_custom(self):
+        return self.inventory_item is None
+
+    @property
+    def inventory_id(self):
+        return None if self.is_custom else self.inventory_item.id
+
+    @property
+    def total(self):
+        return self.quantity * self.unit_price
+
+    @property
+    def description(self):
+        return self.custom_name if self.is_custom else self.inventory_item.name
+
+    def item_code(self, custom_code):
+        """custom_code for custom lines, otherwise the stock item's code"""
+        if self.is_custom:
+            return custom_code
+        return self.inventory_item.specifications or "INV-ITM"
+
+
+class LineItems:
+    """Result of load(): the lines in form order plus the Inventory rows fetched for them"""
+
+    def __init__(self, lines, inventory):
+        self.lines = lines
+        self.inventory = inventory
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def total(self):
+        return sum(line.total for line in self.lines)
+
+
+def parse_form(form):
+    """(position, item_id, quantity, unit_price, custom_name) for every posted row with an item"""
+    item_ids = form.getlist('item_id[]')
+    quantities = form.getlist('quantity[]')
+    unit_prices = form.getlist('unit_price[]')
+    custom_item_names = form.getlist('custom_item_name[]')
+
+    rows = []
+    for i, item_id in enumerate(item_ids):
+        if not item_id:
+            continue
+        try:
+            quantity = int(quantities[i])
+            unit_price = float(unit_prices[i])
+        except (IndexError, ValueError):
+            raise LineItemError(f'Line {i + 1}: quantity and unit price must be numbers')
+        if quantity <= 0:
+            raise LineItemError(f'Line {i + 1}: quantity must be at least 1')
+        custom_name = (custom_item_names[i] if i < len(custom_item_names) else '').strip()
+        if item_id == 'custom':
+            if not custom_name:
+                raise LineItemError('Custom item name is required')
+        else:
+            try:
+                item_id = int(item_id)
+            except ValueError:
+                raise LineItemError('Item not found')
+        rows.append((i, item_id, quantity, unit_price, custom_name))
+    return rows
+
+
+def load(session, form, check_stock=False, released=None):
+    """Validated LineItems for a posted form.
+
+    check_stock rejects lines asking for more than is on hand, summing lines
+    that repeat an item. released maps inventory id -> quantity that the
+    caller is about to put back (the lines of an invoice being edited); those
+    count as available and their Inventory rows are fetched in the same query.
+    """
+    released = released or {}
+    rows = parse_form(form)
+    wanted_ids = {item_id for _, item_id, _, _, _ in rows if item_id != 'custom'} | set(released)
+    inventory = {}
+    if wanted_ids:
+        inventory = {item.id: item for item in
+                     session.query(Inventory).filter(Inventory.id.in_(wanted_ids)).all()}
+
+    lines = []
+    requested = OrderedDict()
+    for position, item_id, quantity, unit_price, custom_name in rows:
+        if item_id == 'custom':
+            lines.append(LineItem(position, None, custom_name, quantity, unit_price))
+            continue
+        item = inventory.get(item_id)
+        if item is None:
+            raise LineItemError('Item not found')
+        lines.append(LineItem(position, item, None, quantity, unit_price))
+        requested[item_id] = requested.get(item_id, 0) + quantity
+
+    if check_stock:
+        for item_id, quantity in requested.items():
+            item = inventory[item_id]
+            available = (item.quantity or 0) + released.get(item_id, 0)
+            if available < quantity:
+                raise LineItemError(f'Insufficient stock for {item.name}. Available: {available}')
+    return LineItems(lines, inventory)
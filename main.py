@@ -2,12 +2,6 @@ import os
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file
 from datetime import datetime
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, HRFlowable
-from reportlab.lib import colors
-from reportlab.lib.units import inch
 import sqlalchemy as db
 
 # Import Excel storage and models
@@ -15,18 +9,54 @@ from models import (Supplier, Customer, Inventory, Activity, ActivityType, quota
                         StockTransaction, FinancialRecord, CustomField, FinancialCategory,
                         FuelRecord, MileageRecord, JourneyRecord, Location, Pricing,
                         StockChangeReason, FinancialType, TransactionType, PaymentType, Currency,
-                        Invoice, InvoiceItem, Payment, InvoiceStatus)
+                        Invoice, InvoiceItem, Payment, InvoiceStatus, list_loader_options)
 from currency_converter import get_exchange_rates
-from database import db_session, init_db
+from database import db_session, engine, read_engine, read_only
+import instrumentation
+import sqlite_profile
+from pagination import keyset_paginate, seek_page, page_size
+from dashboard_cache import get_dashboard_metrics, invalidate_dashboard
+import refcache
+import search_index
+import line_items
+import stock
+import pdf_cache
+import documents
+import bulk_export
+import jobs
+from reports import financial_summary, load_summary, cumulative_expenses, refresh_financial_summary
 
 from whitenoise import WhiteNoise
 
-# create the app
-app = Flask(__name__)
-app.wsgi_app = WhiteNoise(app.wsgi_app, root='static/', prefix='static/')
 
-# setup a secret key, required by sessions
-app.secret_key = os.environ.get("FLASK_SECRET_KEY") or "solar_company_secret_key"
+class _Routes:
+    """Collects the views and hooks defined below; create_app() registers them on every app it builds"""
+
+    def __init__(self):
+        self._setup = []
+
+    def route(self, rule, **options):
+        def decorator(view):
+            self._setup.append(lambda app: app.route(rule, **options)(view))
+            return view
+        return decorator
+
+    def context_processor(self, fn):
+        self._setup.append(lambda app: app.context_processor(fn))
+        return fn
+
+    def teardown_appcontext(self, fn):
+        self._setup.append(lambda app: app.teardown_appcontext(fn))
+        return fn
+
+    def register(self, app):
+        for setup in self._setup:
+            setup(app)
+
+
+# Importing this module does no database work: schema and enum maintenance is run
+# once per deploy by `python maintenance.py`, not by every worker.
+routes = _Routes()
 
 def generate_document_number(customer, model_class):
     """Generate ID: [Prefix][IdentificationNumber][Suffix if count > 0]"""
@@ -40,47 +70,7 @@ def generate_document_number(customer, model_class):
         return base_code
     return f"{base_code}{count}"
 
-def normalize_enums():
-    """Normalize enum strings in DB to match SQLAlchemy Enum definitions"""
-    # Normalize quotation.status to uppercase values
-    try:
-        quotations = db_session.query(quotation).all()
-        changed = 0
-        for inv in quotations:
-            if isinstance(inv.status, str):
-                val = inv.status.strip()
-                upper = val.upper()
-                if upper in ("PENDING", "PAID", "OVERDUE", "CANCELLED") and val != upper:
-                    inv.status = upper
-                    changed += 1
-            # Normalize payment_method
-            if inv.payment_method and isinstance(inv.payment_method, str):
-                val = inv.payment_method.strip().upper()
-                if val in ("CASH", "ECOCASH", "SWIPE", "TRANSFER", "CREDIT"):
-                    inv.payment_method = val
-                    changed += 1
-        if changed:
-            db_session.commit()
-    except Exception:
-        db_session.rollback()
-
-
-    # Normalize Inventory.payment_type
-    try:
-        inventories = db_session.query(Inventory).all()
-        changed = 0
-        for inv in inventories:
-            if inv.payment_type and isinstance(inv.payment_type, str):
-                val = inv.payment_type.strip().upper()
-                if val in ("CASH", "ECOCASH", "SWIPE", "TRANSFER", "CREDIT"):
-                    inv.payment_type = val
-                    changed += 1
-        if changed:
-            db_session.commit()
-    except Exception:
-        db_session.rollback()
-
-@app.context_processor
+@routes.context_processor
 def inject_db_type():
     from database import engine
     try:
@@ -93,42 +83,10 @@ def inject_db_type():
         pass
     return dict(db_type='Unknown Database')
 
-    # Normalize FinancialRecord.payment_method
-    try:
-        financial_records = db_session.query(FinancialRecord).all()
-        changed = 0
-        for fr in financial_records:
-            if fr.payment_method and isinstance(fr.payment_method, str):
-                val = fr.payment_method.strip().upper()
-                if val in ("CASH", "ECOCASH", "SWIPE", "TRANSFER", "CREDIT"):
-                    fr.payment_method = val
-                    changed += 1
-        if changed:
-            db_session.commit()
-    except Exception:
-        db_session.rollback()
-
 def to_usd(value, currency, rates):
     return value * rates.get(currency, 1.0)
 
-with app.app_context():
-    try:
-        print("Attempting to initialize database...")
-        init_db()
-        print("Database initialized successfully.")
-    except Exception as e:
-        print(f"Error initializing database: {e}")
-        # We might want to re-raise if DB init is critical, but for now let's just log
-        # In a real scenario, failure here is bad, but maybe the app can still serve static pages or 500s cleanly.
-
-    try:
-        print("Attempting to normalize enums...")
-        normalize_enums()
-        print("Enums normalized successfully.")
-    except Exception as e:
-        print(f"Error normalizing enums: {e}")
-
-@app.route('/_health')
+@routes.route('/_health')
 def health_check():
     """Health check endpoint for deployment monitoring"""
     try:
@@ -139,74 +97,45 @@ def health_check():
         return jsonify({"status": "unhealthy", "database": str(e)}), 500
 
 
-@app.teardown_appcontext
+@routes.teardown_appcontext
 def shutdown_session(exception=None):
     db_session.remove()
 
 # Routes
-@app.route('/')
+@routes.route('/')
 def index():
     """Dashboard showing overview of activities and key metrics"""
-    # Get counts for dashboard
-    suppliers_count = db_session.query(Supplier).count()
-    customers_count = db_session.query(Customer).count()
-    inventory_count = db_session.query(Inventory).count()
-    quotations_count = db_session.query(quotation).count()
-    activities_count = db_session.query(Activity).count()
-
-    # Location frequency for pie chart
-    journey_records = db_session.query(JourneyRecord).all()
-    location_counts = {}
-    for jr in journey_records:
-        location = jr.end_location or jr.start_location
-        if location:
-            location_counts[location] = location_counts.get(location, 0) + 1
-    top_locations = sorted(location_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    location_labels = [loc[0] for loc in top_locations]
-    location_data = [loc[1] for loc in top_locations]
-
-    return render_template('dashboard.html',
-                         suppliers_count=suppliers_count,
-                         customers_count=customers_count,
-                         inventory_count=inventory_count,
-                         quotations_count=quotations_count,
-                         activities_count=activities_count,
-                         top_locations=location_labels,
-                         location_data=location_data)
-
-@app.route('/suppliers')
+    metrics = get_dashboard_metrics(db_session)
+    return render_template('dashboard.html', **metrics)
+
+@routes.route('/suppliers')
 def suppliers():
     """List all suppliers"""
-    suppliers = db_session.query(Supplier).all()
-    return render_template('suppliers.html', suppliers=suppliers)
+    page = keyset_paginate(db_session.query(Supplier), Supplier.date_created, Supplier.id)
+    return render_template('suppliers.html', suppliers=page.items, page=page)
 
-@app.route('/customers')
+@routes.route('/customers')
 def customers():
     """List all customers"""
-    customers = db_session.query(Customer).all()
-    return render_template('customers.html', customers=customers)
+    page = keyset_paginate(db_session.query(Customer), Customer.date_created, Customer.identification_number)
+    return render_template('customers.html', customers=page.items, page=page)
 
-@app.route('/inventory')
+@routes.route('/inventory')
 def inventory():
     """View inventory with search and filter"""
     search = request.args.get('search', '')
     category = request.args.get('category', '')
 
-    query = db_session.query(Inventory)
-
-    if search:
-        query = query.filter(
-            db.or_(
-                Inventory.name.contains(search),
-                Inventory.brand.contains(search),
-                Inventory.specifications.contains(search)
-            )
-        )
+    query = db_session.query(Inventory).options(*list_loader_options('inventory'))
 
     if category:
         query = query.filter(Inventory.category == category)
 
-    items = query.all()
+    if search:
+        # The category filter runs inside the search, and every match is listed
+        items = search_index.search(db_session, 'inventory', search, None, query)
+    else:
+        items = query.all()
     categories = db_session.query(Inventory.category).distinct().all()
     categories = [cat[0] for cat in categories if cat[0]]
     suppliers = db_session.query(Supplier).all()
@@ -214,247 +143,133 @@ def inventory():
     return render_template('inventory.html', items=items, categories=categories, 
                            search=search, selected_category=category, suppliers=suppliers)
 
-@app.route('/quotations')
+@routes.route('/search/<kind>')
+def search_typeahead(kind):
+    """Typeahead JSON for customers, inventory or suppliers: ?q=<words>&limit=<n>"""
+    if kind not in search_index.KINDS:
+        return jsonify({"error": f"unknown search kind: {kind}"}), 404
+    query = request.args.get('q', '')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+    except ValueError:
+        limit = 10
+    rows = search_index.search(db_session, kind, query, limit)
+    return jsonify({"kind": kind, "query": query,
+                    "results": [search_index.typeahead_result(kind, row) for row in rows]})
+
+# Kind -> (sort column, key column) for browsing the form lookups without a search term
+LOOKUP_ORDER = {
+    'customers': (Customer.name, Customer.identification_number),
+    'inventory': (Inventory.name, Inventory.id),
+}
+
+@routes.route('/lookup/<kind>')
+def lookup(kind):
+    """Paginated JSON for the invoice and quotation form pickers.
+
+    ?q=<words> returns ranked search hits, otherwise rows in name order;
+    ?in_stock=1 limits inventory to items with stock; ``next`` is the URL of
+    the following page, or null.
+    """
+    if kind not in LOOKUP_ORDER:
+        return jsonify({"error": f"unknown lookup kind: {kind}"}), 404
+    limit = page_size(request.args)
+    model = search_index.KINDS[kind].model
+    query = db_session.query(model)
+    if kind == 'inventory' and request.args.get('in_stock'):
+        query = query.filter(Inventory.quantity > 0)
+
+    text = request.args.get('q', '').strip()
+    base_args = {k: v for k, v in request.args.items() if k not in ('after', 'offset')}
+    next_url = None
+    if text:
+        try:
+            offset = max(0, int(request.args.get('offset', 0)))
+        except ValueError:
+            offset = 0
+        # One extra row tells whether there is a next page; in_stock is applied inside the search
+        rows = search_index.search(db_session, kind, text, limit + 1, query, offset=offset)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_url = url_for('lookup', kind=kind, **base_args, offset=offset + limit)
+    else:
+        sort_column, key_column = LOOKUP_ORDER[kind]
+        rows, next_cursor = seek_page(query, sort_column, key_column, request.args, limit)
+        if next_cursor:
+            next_url = url_for('lookup', kind=kind, **base_args, after=next_cursor)
+    return jsonify({"kind": kind, "results": [search_index.typeahead_result(kind, row) for row in rows],
+                    "next": next_url})
+
+@routes.route('/quotations')
 def quotations():
     """List all quotations"""
-    quotations = db_session.query(quotation).order_by(quotation.date_created.desc()).all()
-    return render_template('quotations.html', quotations=quotations)
+    page = keyset_paginate(db_session.query(quotation).options(*list_loader_options('quotations')),
+                           quotation.date_created, quotation.id)
+    return render_template('quotations.html', quotations=page.items, page=page)
 
-@app.route('/activities')
+@routes.route('/activities')
 def activities():
     """List company activities"""
     from models import ActivityType
-    activities = db_session.query(Activity).order_by(Activity.date.desc()).all()
+    page = keyset_paginate(db_session.query(Activity).options(*list_loader_options('activities')),
+                           Activity.date, Activity.id)
     # Also need activity_types for some filtering or modal UI if present
     activity_types = db_session.query(ActivityType).all()
-    return render_template('activities.html', activities=activities, types=activity_types)
+    return render_template('activities.html', activities=page.items, types=activity_types, page=page)
 
-@app.route('/financial')
+@routes.route('/financial')
+@read_only()
 def financial():
     """Financial dashboard with Accrual-based Profit Calculation"""
     # Get month and year from query parameters
     selected_month = int(request.args.get('month', datetime.now().month))
     selected_year = int(request.args.get('year', datetime.now().year))
 
-    # Calculate date range
-    start_date = datetime(selected_year, selected_month, 1)
-    if selected_month == 12:
-        end_date = datetime(selected_year + 1, 1, 1)
-    else:
-        end_date = datetime(selected_year, selected_month + 1, 1)
-
-    from models import FinancialType, InvoiceStatus
-    
-    # --- 1. KEY METRICS (ACCRUAL BASIS) ---
-    # Revenue: Total value of Invoices created in this period (regardless of payment status)
-    revenue = db_session.query(db.func.sum(Invoice.total_amount)).filter(
-        Invoice.date_created >= start_date,
-        Invoice.date_created < end_date,
-        Invoice.status != InvoiceStatus.CANCELLED
-    ).scalar() or 0
-
-    # Other Income: Non-sales income (e.g., grants, interest)
-    other_income = db_session.query(db.func.sum(FinancialRecord.amount)).filter(
-        FinancialRecord.type == FinancialType.INCOME,
-        FinancialRecord.category != 'Sales', 
-        FinancialRecord.date >= start_date,
-        FinancialRecord.date < end_date
-    ).scalar() or 0
-
-    # Expenses: Operating expenses
-    expenses = db_session.query(db.func.sum(FinancialRecord.amount)).filter(
-        FinancialRecord.type == FinancialType.EXPENSE,
-        FinancialRecord.date >= start_date,
-        FinancialRecord.date < end_date
-    ).scalar() or 0
-
-    # Total Income = Revenue + Other Income
-    total_income = revenue + other_income
-    
-    # Financial Breakdown Dictionary
-    financial_breakdown = {
-        'Sales Revenue': revenue,
-        'Other Income': other_income,
-        'Operating Expenses': -expenses,
-        'Total Income': total_income
-    }
-    
-    # --- 2. BREAKDOWNS ---
-
-    # A. Income by Source (Stock vs Services)
-    stock_revenue = db_session.query(db.func.sum(InvoiceItem.amount)).join(Invoice).filter(
-        Invoice.date_created >= start_date,
-        Invoice.date_created < end_date,
-        Invoice.status != InvoiceStatus.CANCELLED,
-        InvoiceItem.inventory_id.isnot(None)
-    ).scalar() or 0
-    
-    service_revenue = db_session.query(db.func.sum(InvoiceItem.amount)).join(Invoice).filter(
-        Invoice.date_created >= start_date,
-        Invoice.date_created < end_date,
-        Invoice.status != InvoiceStatus.CANCELLED,
-        InvoiceItem.inventory_id.is_(None)
-    ).scalar() or 0
-    
-    income_by_source = {
-        'Stock Sales': stock_revenue,
-        'Services/Labor': service_revenue
-    }
-
-    # B. Income by Activity Type
-    from models import ActivityType
-    income_by_activity = {}
-    activity_types = db_session.query(ActivityType).all()
-    
-    for at in activity_types:
-        # Get income for this activity type
-        act_rev = db_session.query(db.func.sum(Invoice.total_amount)).filter(
-            Invoice.activity_type_id == at.id, 
-            Invoice.date_created >= start_date, 
-            Invoice.date_created < end_date,
-            Invoice.status != InvoiceStatus.CANCELLED
-        ).scalar() or 0
-        if act_rev > 0:
-            income_by_activity[at.name] = act_rev
-            
-    # General Sales (Uncategorized)
-    uncat_rev = db_session.query(db.func.sum(Invoice.total_amount)).filter(
-        Invoice.activity_type_id == None, 
-        Invoice.date_created >= start_date, 
-        Invoice.date_created < end_date,
-        Invoice.status != InvoiceStatus.CANCELLED
-    ).scalar() or 0
-    if uncat_rev > 0:
-        income_by_activity['General Sales'] = uncat_rev
-
-
-    # C. Expense Breakdown
-    expense_breakdown = {}
-    expense_cats = db_session.query(FinancialRecord.category, db.func.sum(FinancialRecord.amount)).filter(
-        FinancialRecord.type == FinancialType.EXPENSE,
-        FinancialRecord.date >= start_date,
-        FinancialRecord.date < end_date
-    ).group_by(FinancialRecord.category).all()
-    
-    for cat, amount in expense_cats:
-        expense_breakdown[cat or 'Uncategorized'] = amount
+    summary = financial_summary(db_session, selected_year, selected_month)
+    return render_template('financial.html', **summary)
 
-    # --- 3. TRENDS & LISTS ---
-    
-    # Recent Transactions
-    recent_transactions = db_session.query(FinancialRecord).order_by(FinancialRecord.date.desc()).limit(10).all()
-
-    # Monthly Trend (Revenue vs Expenses)
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    monthly_revenue_data = []
-    monthly_expenses_data = []
-
-    for m in range(1, 13):
-        m_start = datetime(selected_year, m, 1)
-        if m == 12:
-            m_end = datetime(selected_year + 1, 1, 1)
-        else:
-            m_end = datetime(selected_year, m + 1, 1)
-            
-        # Monthly Revenue (Invoiced)
-        m_rev = db_session.query(db.func.sum(Invoice.total_amount)).filter(
-            Invoice.date_created >= m_start, Invoice.date_created < m_end,
-            Invoice.status != InvoiceStatus.CANCELLED
-        ).scalar() or 0
-        monthly_revenue_data.append(m_rev)
-        
-        # Monthly Expenses
-        m_exp = db_session.query(db.func.sum(FinancialRecord.amount)).filter(
-            FinancialRecord.type == FinancialType.EXPENSE,
-            FinancialRecord.date >= m_start,
-            FinancialRecord.date < m_end
-        ).scalar() or 0
-        monthly_expenses_data.append(m_exp)
-    
-    # Top Selling Items (Revenue)
-    top_items = db_session.query(InvoiceItem.description, db.func.sum(InvoiceItem.amount)).join(Invoice).filter(
-        Invoice.date_created >= start_date, Invoice.date_created < end_date
-    ).group_by(InvoiceItem.description).order_by(db.func.sum(InvoiceItem.amount).desc()).limit(8).all()
-    
-    item_labels = [i[0] for i in top_items]
-    item_data = [i[1] for i in top_items]
-
-    # Location Analytics (unchanged)
-    location_counts = {}
-    journey_records = db_session.query(JourneyRecord).all() 
-    for jr in journey_records:
-        loc = jr.end_location or jr.start_location
-        if loc:
-            location_counts[loc] = location_counts.get(loc, 0) + 1
-    top_locs = sorted(location_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    location_labels = [l[0] for l in top_locs]
-    location_data = [l[1] for l in top_locs]
-
-    return render_template('financial.html',
-                         selected_month=selected_month,
-                         selected_year=selected_year,
-                         months=months,
-                         
-                         # KPIs
-                         total_sales=revenue,        
-                         total_expenses=expenses,
-                         total_income=total_income,
-                         other_income=other_income,
-                         
-                         # Breakdowns
-                         financial_breakdown=financial_breakdown,
-                         income_by_activity=income_by_activity,
-                         income_by_source=income_by_source,
-                         expense_breakdown=expense_breakdown,
-                         
-                         # Charts
-                         monthly_revenue_data=monthly_revenue_data,
-                         monthly_expenses_data=monthly_expenses_data,
-                         item_labels=item_labels,
-                         item_data=item_data,
-                         top_locations=location_labels,
-                         location_data=location_data,
-                         
-                         # Extras
-                         recent_transactions=recent_transactions)
-
-@app.route('/fuel_tracking')
+@routes.route('/fuel_tracking')
 def fuel_tracking():
     """Fuel tracking dashboard"""
-    fuel_records = db_session.query(FuelRecord).order_by(FuelRecord.date.desc()).all()
+    page = keyset_paginate(db_session.query(FuelRecord), FuelRecord.date, FuelRecord.id)
 
-    # Calculate totals
-    total_fuel_cost = sum(record.total_cost for record in fuel_records) if fuel_records else 0
-    total_liters = sum(record.quantity_liters for record in fuel_records) if fuel_records else 0
+    # Calculate totals across all records, not just this page
+    total_fuel_cost, total_liters = db_session.query(
+        db.func.sum(FuelRecord.total_cost), db.func.sum(FuelRecord.quantity_liters)
+    ).one()
 
-    return render_template('fuel_tracking.html', fuel_records=fuel_records, total_fuel_cost=total_fuel_cost, total_liters=total_liters)
+    return render_template('fuel_tracking.html', fuel_records=page.items, page=page,
+                           total_fuel_cost=total_fuel_cost or 0, total_liters=total_liters or 0)
 
-@app.route('/mileage_tracking')
+@routes.route('/mileage_tracking')
 def mileage_tracking():
     """Mileage tracking dashboard"""
-    mileage_records = db_session.query(MileageRecord).order_by(MileageRecord.date.desc()).all()
-    total_distance = sum(record.distance_km for record in mileage_records) if mileage_records else 0
-    return render_template('mileage_tracking.html', mileage_records=mileage_records, total_distance=total_distance)
-
-@app.route('/journey_tracking')
+    page = keyset_paginate(db_session.query(MileageRecord), MileageRecord.date, MileageRecord.id)
+    total_distance, total_records = db_session.query(
+        db.func.sum(MileageRecord.distance_km), db.func.count(MileageRecord.id)
+    ).one()
+    return render_template('mileage_tracking.html', mileage_records=page.items, page=page,
+                           total_distance=total_distance or 0, total_records=total_records)
+
+@routes.route('/journey_tracking')
 def journey_tracking():
     """Journey tracking dashboard"""
-    journey_records = db_session.query(JourneyRecord).order_by(JourneyRecord.start_time.desc()).all()
-    return render_template('journey_tracking.html', journey_records=journey_records)
+    page = keyset_paginate(db_session.query(JourneyRecord), JourneyRecord.start_time, JourneyRecord.id)
+    return render_template('journey_tracking.html', journey_records=page.items, page=page)
 
-@app.route('/locations')
+@routes.route('/locations')
 def locations():
     """List all locations"""
     locations = db_session.query(Location).all()
     return render_template('locations.html', locations=locations)
 
-@app.route('/pricing')
+@routes.route('/pricing')
 def pricing():
     """Pricing dashboard"""
     pricing_records = db_session.query(Pricing).all()
     return render_template('pricing.html', pricing_records=pricing_records)
 
-@app.route('/suppliers/add', methods=['GET', 'POST'])
+@routes.route('/suppliers/add', methods=['GET', 'POST'])
 def add_supplier():
     """Add new supplier"""
     if request.method == 'POST':
@@ -469,12 +284,15 @@ def add_supplier():
             currency=Currency(request.form['currency']) if request.form['currency'] else Currency.USD
         )
         db_session.add(supplier)
+        search_index.index(db_session, 'suppliers', supplier)
         db_session.commit()
+        invalidate_dashboard()
+        refcache.invalidate('suppliers')
         flash('Supplier added successfully!', 'success')
         return redirect(url_for('suppliers'))
     return render_template('add_supplier.html')
 
-@app.route('/customers/add', methods=['GET', 'POST'])
+@routes.route('/customers/add', methods=['GET', 'POST'])
 def add_customer():
     """Add new customer"""
     if request.method == 'POST':
@@ -516,7 +334,10 @@ def add_customer():
                 email=request.form.get('email')
             )
             db_session.add(customer)
+            search_index.index(db_session, 'customers', customer)
             db_session.commit()
+            invalidate_dashboard()
+            refcache.invalidate('customers')
             flash('Customer added successfully!', 'success')
             return redirect(url_for('customers'))
             
@@ -527,7 +348,7 @@ def add_customer():
 
     return render_template('add_customer.html')
 
-@app.route('/inventory/add', methods=['GET', 'POST'])
+@routes.route('/inventory/add', methods=['GET', 'POST'])
 def add_inventory():
     """Add new inventory item"""
     if request.method == 'POST':
@@ -545,37 +366,31 @@ def add_inventory():
             supplier_id=int(request.form['supplier_id']) if request.form['supplier_id'] else None
         )
         db_session.add(item)
-        db_session.commit()
+        search_index.index(db_session, 'inventory', item)
 
         # Record stock transaction
         from models import TransactionType
-        stock_transaction = StockTransaction(
-            inventory_id=item.id,
-            transaction_type=TransactionType.STOCK_IN,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            total_value=item.quantity * item.unit_price,
-            notes=f'Initial stock for {item.name}'
-        )
-        db_session.add(stock_transaction)
+        stock.record(db_session, item, TransactionType.STOCK_IN, item.quantity, unit_price=item.unit_price,
+                     notes=f'Initial stock for {item.name}')
         db_session.commit()
+        invalidate_dashboard()
 
+        refcache.invalidate('inventory')
         flash('Inventory item added successfully!', 'success')
         return redirect(url_for('inventory'))
     
     # Get distinct categories from existing items
-    existing_categories = db_session.query(Inventory.category).distinct().all()
-    categories = {c[0] for c in existing_categories if c[0]}
+    categories = set(refcache.inventory_categories(db_session))
     # Add default categories if they don't exist
     defaults = ["Solar Panel", "Battery", "Inverter", "CCTV", "Geyser", "Alarm System", "Borehole Equipment", "Electrical Appliances"]
     for d in defaults:
         categories.add(d)
     categories = sorted(list(categories))
     
-    suppliers = db_session.query(Supplier).all()
+    suppliers = refcache.suppliers(db_session)
     return render_template('add_inventory.html', suppliers=suppliers, categories=categories)
 
-@app.route('/inventory/edit/<int:inventory_id>', methods=['GET', 'POST'])
+@routes.route('/inventory/edit/<int:inventory_id>', methods=['GET', 'POST'])
 def edit_inventory(inventory_id):
     """Edit inventory item"""
     item = db_session.query(Inventory).get(inventory_id)
@@ -592,27 +407,34 @@ def edit_inventory(inventory_id):
         item.brand = request.form['brand']
         item.category = category
         item.specifications = request.form['specifications']
-        item.quantity = int(request.form['quantity'])
+        # A changed count is posted to the ledger as an adjustment rather than overwritten
+        from models import TransactionType, StockChangeReason
+        difference = int(request.form['quantity']) - (item.quantity or 0)
+        if difference:
+            stock.give(db_session, {item.id: difference})
+            stock.record(db_session, item, TransactionType.ADJUSTMENT, difference,
+                         reason=StockChangeReason.ADJUSTMENT, notes='Quantity corrected on the item form')
         item.unit_price = float(request.form['unit_price'])
         item.supplier_id = int(request.form['supplier_id']) if request.form['supplier_id'] else None
+        search_index.index(db_session, 'inventory', item)
         
         db_session.commit()
+        refcache.invalidate('inventory')
         flash('Inventory item updated successfully!', 'success')
         return redirect(url_for('inventory'))
     
     # Get distinct categories from existing items
-    existing_categories = db_session.query(Inventory.category).distinct().all()
-    categories = {c[0] for c in existing_categories if c[0]}
+    categories = set(refcache.inventory_categories(db_session))
     # Add default categories if they don't exist
     defaults = ["Solar Panel", "Battery", "Inverter", "CCTV", "Geyser", "Alarm System", "Borehole Equipment", "Electrical Appliances"]
     for d in defaults:
         categories.add(d)
     categories = sorted(list(categories))
     
-    suppliers = db_session.query(Supplier).all()
+    suppliers = refcache.suppliers(db_session)
     return render_template('edit_inventory.html', item=item, suppliers=suppliers, categories=categories)
 
-@app.route('/quotations/add', methods=['GET', 'POST'])
+@routes.route('/quotations/add', methods=['GET', 'POST'])
 def add_quotation():
     """Create new quotation"""
     if request.method == 'POST':
@@ -621,59 +443,7 @@ def add_quotation():
         # Begin transaction
         try:
             # Process and validate quotation items first
-            item_ids = request.form.getlist('item_id[]')
-            quantities = request.form.getlist('quantity[]')
-            unit_prices = request.form.getlist('unit_price[]')
-            custom_item_names = request.form.getlist('custom_item_name[]')
-
-            calculated_total = 0
-            quotation_items_data = []
-
-            # Validate all items and calculate total
-            for i, item_id in enumerate(item_ids):
-                if item_id:
-                    if item_id == 'custom':
-                        # Handle custom item
-                        custom_name = custom_item_names[i] if i < len(custom_item_names) else ''
-                        if not custom_name:
-                            flash('Custom item name is required', 'error')
-                            return redirect(url_for('add_quotation'))
-
-                        qty = int(quantities[i])
-                        unit_price = float(unit_prices[i])
-                        item_total = qty * unit_price
-                        calculated_total += item_total
-
-                        quotation_items_data.append({
-                            'inventory_id': None,  # No inventory item for custom
-                            'custom_name': custom_name,
-                            'quantity': qty,
-                            'unit_price': unit_price,
-                            'item_total': item_total
-                        })
-                    elif item_id:
-                        # Handle regular inventory item
-                        inventory_item = db_session.query(Inventory).get(int(item_id))
-                        if not inventory_item:
-                            flash(f'Item not found', 'error')
-                            return redirect(url_for('add_quotation'))
-
-                        qty = int(quantities[i])
-                        if inventory_item.quantity < qty:
-                            flash(f'Insufficient stock for {inventory_item.name}. Available: {inventory_item.quantity}', 'error')
-                            return redirect(url_for('add_quotation'))
-
-                        unit_price = float(unit_prices[i])
-                        item_total = qty * unit_price
-                        calculated_total += item_total
-
-                        quotation_items_data.append({
-                            'inventory_id': int(item_id),
-                            'inventory_item': inventory_item,
-                            'quantity': qty,
-                            'unit_price': unit_price,
-                            'item_total': item_total
-                        })
+            lines = line_items.load(db_session, request.form, check_stock=True)
 
             # Find customer by identification number
             customer_identification = request.form['customer_identification']
@@ -686,7 +456,7 @@ def add_quotation():
             # Create quotation with calculated total
             new_quotation = quotation(
                 customer_id=customer.identification_number,
-                total_amount=calculated_total,
+                total_amount=lines.total,
                 status='PENDING'
             )
             db_session.add(new_quotation)
@@ -696,51 +466,39 @@ def add_quotation():
             new_quotation.quotation_number = generate_document_number(customer, quotation)
 
             # Create quotation items (Stock deduction MOVED to Invoice creation)
-            for item_data in quotation_items_data:
-                if item_data['inventory_id'] is None:
-                    # Custom item
-                    # Generate Custom Item Code
-                    timestamp_code = datetime.now().strftime('%Y%m%d%H%M%S')
-                    custom_code = f"CUST-{timestamp_code}"
-
-                    quotation_item = quotationItem(
-                        quotation_id=new_quotation.id,
-                        inventory_id=None,
-                        quantity=item_data['quantity'],
-                        unit_price=item_data['unit_price'],
-                        description=item_data['custom_name'],
-                        item_code=custom_code
-                    )
-                    db_session.add(quotation_item)
-                else:
-                    # Regular inventory item
-                    quotation_item = quotationItem(
-                        quotation_id=new_quotation.id,
-                        inventory_id=item_data['inventory_id'],
-                        quantity=item_data['quantity'],
-                        unit_price=item_data['unit_price'],
-                        item_code=item_data['inventory_item'].specifications or "INV-ITM" # Use specs or fallback
-                    )
-                    db_session.add(quotation_item)
-
-                    # NOTE: Stock is NOT deducted here anymore. It will be deducted when converting to Invoice.
+            timestamp_code = datetime.now().strftime('%Y%m%d%H%M%S')
+            for line in lines:
+                quotation_item = quotationItem(
+                    quotation_id=new_quotation.id,
+                    inventory_id=line.inventory_id,
+                    quantity=line.quantity,
+                    unit_price=line.unit_price,
+                    description=line.custom_name,
+                    item_code=line.item_code(f"CUST-{timestamp_code}")
+                )
+                db_session.add(quotation_item)
 
+                # NOTE: Stock is NOT deducted here anymore. It will be deducted when converting to Invoice.
 
             # Commit all changes
             db_session.commit()
+            invalidate_dashboard()
             flash('quotation created successfully!', 'success')
             return redirect(url_for('quotations'))
 
+        except line_items.LineItemError as e:
+            db_session.rollback()
+            flash(str(e), 'error')
+            return redirect(url_for('add_quotation'))
         except Exception as e:
             db_session.rollback()
             flash(f'Error creating quotation: {str(e)}', 'error')
             return redirect(url_for('add_quotation'))
 
-    customers = db_session.query(Customer).all()
-    inventory_items = db_session.query(Inventory).filter(Inventory.quantity > 0).all()
-    return render_template('add_quotation.html', customers=customers, inventory_items=inventory_items)
+    # Customers and stock are fetched from /lookup as the user types
+    return render_template('add_quotation.html')
 
-@app.route('/quotations/edit/<int:quotation_id>', methods=['GET', 'POST'])
+@routes.route('/quotations/edit/<int:quotation_id>', methods=['GET', 'POST'])
 def edit_quotation(quotation_id):
     """Edit existing quotation"""
     quotation_obj = db_session.query(quotation).get(quotation_id)
@@ -756,39 +514,7 @@ def edit_quotation(quotation_id):
     if request.method == 'POST':
         try:
             # Process and validate quotation items
-            item_ids = request.form.getlist('item_id[]')
-            quantities = request.form.getlist('quantity[]')
-            unit_prices = request.form.getlist('unit_price[]')
-            custom_item_names = request.form.getlist('custom_item_name[]')
-
-            calculated_total = 0
-            quotation_items_data = []
-
-            for i, item_id in enumerate(item_ids):
-                if item_id:
-                    qty = int(quantities[i])
-                    unit_price = float(unit_prices[i])
-                    item_total = qty * unit_price
-                    calculated_total += item_total
-
-                    if item_id == 'custom':
-                        custom_name = custom_item_names[i] if i < len(custom_item_names) else ''
-                        quotation_items_data.append({
-                            'inventory_id': None,
-                            'custom_name': custom_name,
-                            'quantity': qty,
-                            'unit_price': unit_price,
-                            'item_total': item_total
-                        })
-                    else:
-                        inventory_item = db_session.query(Inventory).get(int(item_id))
-                        quotation_items_data.append({
-                            'inventory_id': int(item_id),
-                            'inventory_item': inventory_item,
-                            'quantity': qty,
-                            'unit_price': unit_price,
-                            'item_total': item_total
-                        })
+            lines = line_items.load(db_session, request.form)
 
             # Update customer if changed
             customer_identification = request.form['customer_identification']
@@ -800,7 +526,7 @@ def edit_quotation(quotation_id):
                 quotation_obj.customer_id = customer_identification
 
             # Update quotation details
-            quotation_obj.total_amount = calculated_total
+            quotation_obj.total_amount = lines.total
             quotation_obj.notes = request.form.get('notes')
             
             # Recreate items (cleaner than updating)
@@ -808,42 +534,35 @@ def edit_quotation(quotation_id):
             db_session.query(quotationItem).filter_by(quotation_id=quotation_id).delete()
             
             # 2. Add new items
-            for item_data in quotation_items_data:
-                if item_data['inventory_id'] is None:
-                    timestamp_code = datetime.now().strftime('%Y%m%d%H%M%S')
-                    custom_code = f"CUST-EDT-{timestamp_code}"
-                    qi = quotationItem(
-                        quotation_id=quotation_obj.id,
-                        inventory_id=None,
-                        quantity=item_data['quantity'],
-                        unit_price=item_data['unit_price'],
-                        description=item_data['custom_name'],
-                        item_code=custom_code
-                    )
-                else:
-                    qi = quotationItem(
-                        quotation_id=quotation_obj.id,
-                        inventory_id=item_data['inventory_id'],
-                        quantity=item_data['quantity'],
-                        unit_price=item_data['unit_price'],
-                        item_code=item_data['inventory_item'].specifications or "INV-ITM"
-                    )
+            timestamp_code = datetime.now().strftime('%Y%m%d%H%M%S')
+            for line in lines:
+                qi = quotationItem(
+                    quotation_id=quotation_obj.id,
+                    inventory_id=line.inventory_id,
+                    quantity=line.quantity,
+                    unit_price=line.unit_price,
+                    description=line.custom_name,
+                    item_code=line.item_code(f"CUST-EDT-{timestamp_code}")
+                )
                 db_session.add(qi)
 
             db_session.commit()
+            pdf_cache.invalidate('quotation', quotation_id)
             flash('Quotation updated successfully!', 'success')
             return redirect(url_for('quotations'))
 
+        except line_items.LineItemError as e:
+            db_session.rollback()
+            flash(str(e), 'error')
+            return redirect(url_for('edit_quotation', quotation_id=quotation_id))
         except Exception as e:
             db_session.rollback()
             flash(f'Error updating quotation: {str(e)}', 'error')
             return redirect(url_for('edit_quotation', quotation_id=quotation_id))
 
-    customers = db_session.query(Customer).all()
-    inventory_items = db_session.query(Inventory).filter(Inventory.quantity > 0).all()
-    return render_template('edit_quotation.html', quotation=quotation_obj, customers=customers, inventory_items=inventory_items)
+    return render_template('edit_quotation.html', quotation=quotation_obj)
 
-@app.route('/activities/add', methods=['GET', 'POST'])
+@routes.route('/activities/add', methods=['GET', 'POST'])
 def add_activity():
     """Add new activity"""
     if request.method == 'POST':
@@ -859,6 +578,7 @@ def add_activity():
             )
             db_session.add(activity)
             db_session.commit()
+            invalidate_dashboard()
             flash('Activity added successfully!', 'success')
             return redirect(url_for('activities'))
         except Exception as e:
@@ -866,17 +586,17 @@ def add_activity():
             flash(f'Error adding activity: {str(e)}', 'error')
             return redirect(url_for('add_activity'))
 
-    customers = db_session.query(Customer).all()
-    activity_types = db_session.query(ActivityType).filter_by(is_active=True).all()
+    customers = refcache.customers(db_session)
+    activity_types = refcache.active_activity_types(db_session)
     return render_template('add_activity.html', customers=customers, activity_types=activity_types)
 
-@app.route('/activity_types')
+@routes.route('/activity_types')
 def activity_types():
     """List all activity types"""
     activity_types = db_session.query(ActivityType).all()
     return render_template('activity_types.html', types=activity_types)
 
-@app.route('/activity_types/add', methods=['GET', 'POST'])
+@routes.route('/activity_types/add', methods=['GET', 'POST'])
 def add_activity_type():
     """Add new activity type"""
     if request.method == 'POST':
@@ -887,11 +607,12 @@ def add_activity_type():
         )
         db_session.add(activity_type)
         db_session.commit()
+        refcache.invalidate('activity_types')
         flash('Activity type added successfully!', 'success')
         return redirect(url_for('activity_types'))
     return render_template('add_activity_type.html')
 
-@app.route('/activities/edit/<int:activity_id>', methods=['GET', 'POST'])
+@routes.route('/activities/edit/<int:activity_id>', methods=['GET', 'POST'])
 def edit_activity(activity_id):
     """Edit activity"""
     activity = db_session.query(Activity).get(activity_id)
@@ -924,11 +645,11 @@ def edit_activity(activity_id):
             flash(f'Error updating activity: {str(e)}', 'error')
             return redirect(url_for('edit_activity', activity_id=activity_id))
 
-    customers = db_session.query(Customer).all()
-    activity_types = db_session.query(ActivityType).filter_by(is_active=True).all()
+    customers = refcache.customers(db_session)
+    activity_types = refcache.active_activity_types(db_session)
     return render_template('edit_activity.html', activity=activity, customers=customers, activity_types=activity_types)
 
-@app.route('/financial/add', methods=['GET', 'POST'])
+@routes.route('/financial/add', methods=['GET', 'POST'])
 def add_financial_record():
     """Add financial record"""
     if request.method == 'POST':
@@ -941,18 +662,19 @@ def add_financial_record():
             date=datetime.strptime(request.form['date'], '%Y-%m-%d').date()
         )
         db_session.add(record)
+        refresh_financial_summary(db_session, record.date)
         db_session.commit()
         flash('Financial record added successfully!', 'success')
         return redirect(url_for('financial'))
     return render_template('add_financial_record.html')
 
-@app.route('/financial/categories')
+@routes.route('/financial/categories')
 def financial_categories():
     """Financial categories management"""
-    categories = db_session.query(FinancialCategory).all()
+    categories = refcache.financial_categories(db_session)
     return render_template('financial_categories.html', categories=categories)
 
-@app.route('/financial/categories/add', methods=['GET', 'POST'])
+@routes.route('/financial/categories/add', methods=['GET', 'POST'])
 def add_financial_category():
     """Add financial category"""
     if request.method == 'POST':
@@ -963,14 +685,21 @@ def add_financial_category():
         )
         db_session.add(category)
         db_session.commit()
+        refcache.invalidate('financial_categories')
         flash('Financial category added successfully!', 'success')
         return redirect(url_for('financial_categories'))
     return render_template('add_financial_category.html')
 
-@app.route('/financial/generate_income_statement/<int:month>/<int:year>')
+@routes.route('/financial/generate_income_statement/<int:month>/<int:year>')
+@read_only()
 def generate_income_statement(month, year):
     """Generate income statement PDF"""
     from models import FinancialType
+    # ReportLab is only imported by the routes that draw PDFs, keeping worker boot fast
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib import colors
 
     # Calculate date range
     start_date = datetime(year, month, 1)
@@ -979,29 +708,13 @@ def generate_income_statement(month, year):
     else:
         end_date = datetime(year, month + 1, 1)
 
-    # Get financial data
-    total_sales = db_session.query(db.func.sum(Payment.amount)).filter(
-        Payment.payment_date >= start_date,
-        Payment.payment_date < end_date
-    ).scalar() or 0
-
-    total_expenses = db_session.query(db.func.sum(FinancialRecord.amount)).filter(
-        FinancialRecord.type == FinancialType.EXPENSE,
-        FinancialRecord.date >= start_date,
-        FinancialRecord.date < end_date
-    ).scalar() or 0
-
-    total_income = db_session.query(db.func.sum(FinancialRecord.amount)).filter(
-        FinancialRecord.type == FinancialType.INCOME,
-        FinancialRecord.date >= start_date,
-        FinancialRecord.date < end_date
-    ).scalar() or 0
-
-    cogs = db_session.query(db.func.sum(StockTransaction.total_value)).filter(
-        StockTransaction.transaction_type == 'STOCK_OUT',
-        StockTransaction.date_created >= start_date,
-        StockTransaction.date_created < end_date
-    ).scalar() or 0
+    # Get financial data from the monthly rollup
+    summary = load_summary(db_session, year, month).get(month)
+    total_sales = summary.payments_received if summary else 0
+    total_expenses = summary.expenses if summary else 0
+    total_income = summary.income_records if summary else 0
+    # Net FIFO cost of sales; negative in a month where returns exceed what was sold
+    cogs = summary.cogs if summary else 0
 
     # Create PDF
     buffer = io.BytesIO()
@@ -1032,11 +745,11 @@ def generate_income_statement(month, year):
         ['Other Income', f"${total_income:,.2f}", ''],
         ['Total Revenue', f"${total_sales + total_income:,.2f}", ''],
         ['', '', ''],
-        ['Cost of Goods Sold', f"${abs(cogs):,.2f}", ''],
-        ['Gross Profit', f"${total_sales + total_income - abs(cogs):,.2f}", ''],
+        ['Cost of Goods Sold', f"${cogs:,.2f}", ''],
+        ['Gross Profit', f"${total_sales + total_income - cogs:,.2f}", ''],
         ['', '', ''],
         ['Operating Expenses', f"${total_expenses:,.2f}", ''],
-        ['Net Profit', f"${total_sales + total_income - abs(cogs) - total_expenses:,.2f}", '']
+        ['Net Profit', f"${total_sales + total_income - cogs - total_expenses:,.2f}", '']
     ]
 
     table = Table(data, colWidths=[200, 100, 100])
@@ -1064,10 +777,15 @@ def generate_income_statement(month, year):
         mimetype='application/pdf'
     )
 
-@app.route('/financial/generate_balance_sheet/<int:month>/<int:year>')
+@routes.route('/financial/generate_balance_sheet/<int:month>/<int:year>')
+@read_only()
 def generate_balance_sheet(month, year):
     """Generate balance sheet PDF"""
     from models import FinancialType
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib import colors
 
     # Calculate date range
     start_date = datetime(year, month, 1)
@@ -1076,14 +794,11 @@ def generate_balance_sheet(month, year):
     else:
         end_date = datetime(year, month + 1, 1)
 
-    # Get financial data
-    total_assets = db_session.query(db.func.sum(Inventory.unit_price * Inventory.quantity)).scalar() or 0
+    # Stock held at the end of the month, at FIFO cost
+    import valuation
+    total_assets = valuation.closing_value(db_session, year, month)
 
-    total_liabilities = db_session.query(db.func.sum(FinancialRecord.amount)).filter(
-        FinancialRecord.type == FinancialType.EXPENSE,
-        FinancialRecord.category.in_(['Loan', 'Credit', 'Liability']),
-        FinancialRecord.date <= end_date
-    ).scalar() or 0
+    total_liabilities = cumulative_expenses(db_session, ['Loan', 'Credit', 'Liability'], year, month)
 
     total_equity = total_assets - total_liabilities
 
@@ -1147,19 +862,20 @@ def generate_balance_sheet(month, year):
         mimetype='application/pdf'
     )
 
-@app.route('/financial/delete/<int:record_id>', methods=['POST'])
+@routes.route('/financial/delete/<int:record_id>', methods=['POST'])
 def delete_financial_record(record_id):
     """Delete financial record"""
     record = db_session.query(FinancialRecord).get(record_id)
     if record:
         db_session.delete(record)
+        refresh_financial_summary(db_session, record.date)
         db_session.commit()
         flash('Financial record deleted successfully!', 'success')
     else:
         flash('Record not found!', 'error')
     return redirect(url_for('financial'))
 
-@app.route('/inventory/stock_in', methods=['POST'])
+@routes.route('/inventory/stock_in', methods=['POST'])
 def stock_in():
     """Add stock to inventory item"""
     item_id = int(request.form['item_id'])
@@ -1174,23 +890,17 @@ def stock_in():
         notes = request.form.get('notes', '')
 
         # Update inventory quantity
-        item.quantity += quantity
+        stock.give(db_session, {item.id: quantity})
         item.cost_price = unit_price  # Update cost price (buying price) from input
         # item.unit_price = unit_price # Do not overwrite selling price with cost
 
         # Record stock transaction
         from models import TransactionType
-        stock_transaction = StockTransaction(
-            inventory_id=item.id,
-            transaction_type=TransactionType.STOCK_IN,
-            quantity=quantity,
-            unit_price=unit_price,
-            total_value=quantity * unit_price,
-            notes=notes
-        )
-        db_session.add(stock_transaction)
+        stock.record(db_session, item, TransactionType.STOCK_IN, quantity, unit_price=unit_price,
+                     unit_cost=unit_price, notes=notes)
         db_session.commit()
 
+        refcache.invalidate('inventory')
         flash(f'Stock added successfully! New quantity: {item.quantity}', 'success')
     except Exception as e:
         db_session.rollback()
@@ -1198,7 +908,7 @@ def stock_in():
 
     return redirect(url_for('inventory'))
 
-@app.route('/inventory/stock_out', methods=['POST'])
+@routes.route('/inventory/stock_out', methods=['POST'])
 def stock_out():
     """Remove stock from inventory item"""
     item_id = int(request.form['item_id'])
@@ -1213,36 +923,28 @@ def stock_out():
         customer_name = request.form.get('customer_name', '')
         notes = request.form.get('notes', '')
 
-        if item.quantity < quantity:
-            flash(f'Insufficient stock! Available: {item.quantity}', 'error')
-            return redirect(url_for('inventory'))
-
-        # Update inventory quantity
-        item.quantity -= quantity
+        # Update inventory quantity, unless another request has taken the stock meanwhile
+        stock.take(db_session, {item.id: quantity})
 
         # Record stock transaction
         from models import TransactionType, StockChangeReason
-        stock_transaction = StockTransaction(
-            inventory_id=item.id,
-            transaction_type=TransactionType.STOCK_OUT,
-            quantity=-quantity,
-            unit_price=item.unit_price,
-            total_value=-quantity * item.unit_price,
-            reason=StockChangeReason(reason),
-            customer_name=customer_name,
-            notes=notes
-        )
-        db_session.add(stock_transaction)
+        stock.record(db_session, item, TransactionType.STOCK_OUT, -quantity, unit_price=item.unit_price,
+                     reason=StockChangeReason(reason), customer_name=customer_name, notes=notes)
+        refresh_financial_summary(db_session, datetime.utcnow())
         db_session.commit()
 
+        refcache.invalidate('inventory')
         flash(f'Stock removed successfully! New quantity: {item.quantity}', 'success')
+    except stock.InsufficientStock as e:
+        db_session.rollback()
+        flash(f'Insufficient stock! Available: {e.failures[0][2]}', 'error')
     except Exception as e:
         db_session.rollback()
         flash(f'Error removing stock: {str(e)}', 'error')
 
     return redirect(url_for('inventory'))
 
-@app.route('/fuel_tracking/add', methods=['GET', 'POST'])
+@routes.route('/fuel_tracking/add', methods=['GET', 'POST'])
 def add_fuel_record():
     """Add new fuel record"""
     if request.method == 'POST':
@@ -1271,12 +973,13 @@ def add_fuel_record():
         )
         db_session.add(expense)
 
+        refresh_financial_summary(db_session, expense.date)
         db_session.commit()
         flash('Fuel record added successfully!', 'success')
         return redirect(url_for('fuel_tracking'))
     return render_template('add_fuel_record.html')
 
-@app.route('/fuel_tracking/delete/<int:fuel_record_id>', methods=['POST'])
+@routes.route('/fuel_tracking/delete/<int:fuel_record_id>', methods=['POST'])
 def delete_fuel_record(fuel_record_id):
     """Delete fuel record"""
     record = db_session.query(FuelRecord).get(fuel_record_id)
@@ -1288,7 +991,7 @@ def delete_fuel_record(fuel_record_id):
         flash('Fuel record not found!', 'error')
     return redirect(url_for('fuel_tracking'))
 
-@app.route('/mileage_tracking/add', methods=['GET', 'POST'])
+@routes.route('/mileage_tracking/add', methods=['GET', 'POST'])
 def add_mileage_record():
     """Add new mileage record"""
     if request.method == 'POST':
@@ -1306,7 +1009,7 @@ def add_mileage_record():
         return redirect(url_for('mileage_tracking'))
     return render_template('add_mileage_record.html')
 
-@app.route('/mileage_tracking/delete/<int:mileage_record_id>', methods=['POST'])
+@routes.route('/mileage_tracking/delete/<int:mileage_record_id>', methods=['POST'])
 def delete_mileage_record(mileage_record_id):
     """Delete mileage record"""
     record = db_session.query(MileageRecord).get(mileage_record_id)
@@ -1318,7 +1021,7 @@ def delete_mileage_record(mileage_record_id):
         flash('Mileage record not found!', 'error')
     return redirect(url_for('mileage_tracking'))
 
-@app.route('/journey_tracking/add', methods=['GET', 'POST'])
+@routes.route('/journey_tracking/add', methods=['GET', 'POST'])
 def add_journey_record():
     """Add new journey record"""
     if request.method == 'POST':
@@ -1335,11 +1038,12 @@ def add_journey_record():
         )
         db_session.add(journey_record)
         db_session.commit()
+        invalidate_dashboard()
         flash('Journey record added successfully!', 'success')
         return redirect(url_for('journey_tracking'))
     return render_template('add_journey_record.html')
 
-@app.route('/journey_tracking/delete/<int:journey_record_id>', methods=['POST'])
+@routes.route('/journey_tracking/delete/<int:journey_record_id>', methods=['POST'])
 def delete_journey_record(journey_record_id):
     """Delete journey record and handle dependencies"""
     record = db_session.query(JourneyRecord).get(journey_record_id)
@@ -1354,6 +1058,7 @@ def delete_journey_record(journey_record_id):
         
         db_session.delete(record)
         db_session.commit()
+        invalidate_dashboard()
         flash('Journey record deleted successfully!', 'success')
     except Exception as e:
         db_session.rollback()
@@ -1361,7 +1066,7 @@ def delete_journey_record(journey_record_id):
         
     return redirect(url_for('journey_tracking'))
 
-@app.route('/locations/add', methods=['GET', 'POST'])
+@routes.route('/locations/add', methods=['GET', 'POST'])
 def add_location():
     """Add new location"""
     if request.method == 'POST':
@@ -1378,7 +1083,7 @@ def add_location():
         return redirect(url_for('locations'))
     return render_template('add_location.html')
 
-@app.route('/locations/delete/<int:location_id>', methods=['POST'])
+@routes.route('/locations/delete/<int:location_id>', methods=['POST'])
 def delete_location(location_id):
     """Delete location"""
     location = db_session.query(Location).get(location_id)
@@ -1390,7 +1095,7 @@ def delete_location(location_id):
         flash('Location not found!', 'error')
     return redirect(url_for('locations'))
 
-@app.route('/pricing/add', methods=['GET', 'POST'])
+@routes.route('/pricing/add', methods=['GET', 'POST'])
 def add_pricing():
     """Add new pricing record"""
     if request.method == 'POST':
@@ -1411,7 +1116,7 @@ def add_pricing():
         return redirect(url_for('pricing'))
     return render_template('add_pricing.html')
 
-@app.route('/pricing/edit/<int:pricing_id>', methods=['GET', 'POST'])
+@routes.route('/pricing/edit/<int:pricing_id>', methods=['GET', 'POST'])
 def edit_pricing(pricing_id):
     """Edit existing pricing record"""
     pricing = db_session.query(Pricing).get(pricing_id)
@@ -1436,7 +1141,7 @@ def edit_pricing(pricing_id):
         
     return render_template('edit_pricing.html', record=pricing)
 
-@app.route('/pricing/delete/<int:pricing_id>', methods=['POST'])
+@routes.route('/pricing/delete/<int:pricing_id>', methods=['POST'])
 def delete_pricing(pricing_id):
     """Delete pricing record"""
     pricing = db_session.query(Pricing).get(pricing_id)
@@ -1448,7 +1153,7 @@ def delete_pricing(pricing_id):
         flash('Pricing record not found!', 'error')
     return redirect(url_for('pricing'))
 
-@app.route('/customers/edit/<string:customer_id>', methods=['GET', 'POST'])
+@routes.route('/customers/edit/<string:customer_id>', methods=['GET', 'POST'])
 def edit_customer(customer_id):
     """Edit customer details"""
     customer = db_session.query(Customer).get(customer_id)
@@ -1463,14 +1168,16 @@ def edit_customer(customer_id):
         customer.address = request.form['address']
         customer.phone = request.form['phone']
         customer.email = request.form['email']
+        search_index.index(db_session, 'customers', customer)
         
         db_session.commit()
+        refcache.invalidate('customers')
         flash('Customer updated successfully!', 'success')
         return redirect(url_for('customers'))
     
     return render_template('edit_customer.html', customer=customer)
 
-@app.route('/customers/delete/<string:customer_id>', methods=['POST'])
+@routes.route('/customers/delete/<string:customer_id>', methods=['POST'])
 def delete_customer(customer_id):
     """Delete customer and handle dependencies"""
     customer = db_session.query(Customer).get(customer_id)
@@ -1485,7 +1192,10 @@ def delete_customer(customer_id):
         db_session.query(Invoice).filter_by(customer_id=customer_id).update({Invoice.customer_id: None})
         
         db_session.delete(customer)
+        search_index.remove(db_session, 'customers', customer_id)
         db_session.commit()
+        invalidate_dashboard()
+        refcache.invalidate('customers')
         flash('Customer deleted successfully!', 'success')
     except Exception as e:
         db_session.rollback()
@@ -1493,7 +1203,7 @@ def delete_customer(customer_id):
         
     return redirect(url_for('customers'))
 
-@app.route('/suppliers/edit/<int:supplier_id>', methods=['GET', 'POST'])
+@routes.route('/suppliers/edit/<int:supplier_id>', methods=['GET', 'POST'])
 def edit_supplier(supplier_id):
     """Edit supplier details"""
     supplier = db_session.query(Supplier).get(supplier_id)
@@ -1510,14 +1220,16 @@ def edit_supplier(supplier_id):
         supplier.address = request.form['address']
         supplier.payment_terms = request.form['payment_terms']
         supplier.currency = Currency(request.form['currency']) if request.form['currency'] else Currency.USD
+        search_index.index(db_session, 'suppliers', supplier)
         
         db_session.commit()
+        refcache.invalidate('suppliers')
         flash('Supplier updated successfully!', 'success')
         return redirect(url_for('suppliers'))
     
     return render_template('edit_supplier.html', supplier=supplier)
 
-@app.route('/suppliers/delete/<int:supplier_id>', methods=['POST'])
+@routes.route('/suppliers/delete/<int:supplier_id>', methods=['POST'])
 def delete_supplier(supplier_id):
     """Delete supplier and handle dependencies"""
     supplier = db_session.query(Supplier).get(supplier_id)
@@ -1530,7 +1242,10 @@ def delete_supplier(supplier_id):
         db_session.query(Inventory).filter_by(supplier_id=supplier_id).update({Inventory.supplier_id: None})
         
         db_session.delete(supplier)
+        search_index.remove(db_session, 'suppliers', supplier_id)
         db_session.commit()
+        invalidate_dashboard()
+        refcache.invalidate('suppliers')
         flash('Supplier deleted successfully!', 'success')
     except Exception as e:
         db_session.rollback()
@@ -1538,7 +1253,7 @@ def delete_supplier(supplier_id):
         
     return redirect(url_for('suppliers'))
 
-@app.route('/inventory/delete/<int:inventory_id>', methods=['POST'])
+@routes.route('/inventory/delete/<int:inventory_id>', methods=['POST'])
 def delete_inventory(inventory_id):
     """Delete inventory item and handle dependencies"""
     item = db_session.query(Inventory).get(inventory_id)
@@ -1547,8 +1262,16 @@ def delete_inventory(inventory_id):
         return redirect(url_for('inventory'))
 
     try:
-        # 1. Delete associated stock transactions
+        # 1. Delete associated stock transactions; their sales, and the sales put back
+        # into stock, leave the COGS rollup
+        from valuation import SALE_REVERSALS
+        costed_dates = [d for (d,) in db_session.query(StockTransaction.date_created).filter(
+            StockTransaction.inventory_id == inventory_id,
+            db.or_(StockTransaction.transaction_type == TransactionType.STOCK_OUT,
+                   StockTransaction.reference_type.in_(SALE_REVERSALS)))]
         db_session.query(StockTransaction).filter_by(inventory_id=inventory_id).delete()
+        from models import StockSnapshot
+        db_session.query(StockSnapshot).filter_by(inventory_id=inventory_id).delete()
         
         # 2. Nullify references in quotation items (they keep their description/quantity)
         quotation_items = db_session.query(quotationItem).filter_by(inventory_id=inventory_id).all()
@@ -1562,7 +1285,11 @@ def delete_inventory(inventory_id):
 
         # 4. Delete the item itself
         db_session.delete(item)
+        search_index.remove(db_session, 'inventory', inventory_id)
+        refresh_financial_summary(db_session, *costed_dates)
         db_session.commit()
+        invalidate_dashboard()
+        refcache.invalidate('inventory')
         flash('Inventory item and related transactions deleted successfully!', 'success')
     except Exception as e:
         db_session.rollback()
@@ -1570,7 +1297,7 @@ def delete_inventory(inventory_id):
         
     return redirect(url_for('inventory'))
 
-@app.route('/quotations/delete/<int:quotation_id>', methods=['POST'])
+@routes.route('/quotations/delete/<int:quotation_id>', methods=['POST'])
 def delete_quotation(quotation_id):
     """Delete quotation and handle dependencies"""
     quotation_obj = db_session.query(quotation).get(quotation_id)
@@ -1588,6 +1315,8 @@ def delete_quotation(quotation_id):
         # 3. Delete the quotation itself
         db_session.delete(quotation_obj)
         db_session.commit()
+        invalidate_dashboard()
+        pdf_cache.invalidate('quotation', quotation_id)
         flash('Quotation deleted successfully!', 'success')
     except Exception as e:
         db_session.rollback()
@@ -1595,7 +1324,7 @@ def delete_quotation(quotation_id):
         
     return redirect(url_for('quotations'))
 
-@app.route('/invoices/delete/<int:invoice_id>', methods=['POST'])
+@routes.route('/invoices/delete/<int:invoice_id>', methods=['POST'])
 def delete_invoice(invoice_id):
     """Delete invoice and restore stock"""
     invoice = db_session.query(Invoice).get(invoice_id)
@@ -1608,22 +1337,21 @@ def delete_invoice(invoice_id):
         for item in invoice.items:
             if item.inventory_id and item.inventory:
                 # Add stock back
-                item.inventory.quantity += item.quantity
+                stock.give(db_session, {item.inventory_id: item.quantity})
                 
                 # Record stock transaction for return
                 from models import StockChangeReason, TransactionType
-                stock_transaction = StockTransaction(
-                    inventory_id=item.inventory_id,
-                    transaction_type=TransactionType.STOCK_IN,
-                    quantity=item.quantity,
-                    unit_price=item.unit_price,
-                    total_value=item.quantity * item.unit_price,
-                    reason=StockChangeReason.RETURNED, 
-                    reference_id=invoice.id,
-                    reference_type='invoice_deletion',
-                    notes=f'Restored from deleted Invoice #{invoice.id}'
-                )
-                db_session.add(stock_transaction)
+                stock.record(db_session, item.inventory, TransactionType.STOCK_IN, item.quantity,
+                             unit_price=item.unit_price, unit_cost=item.cost_price,
+                             reason=StockChangeReason.RETURNED, reference_id=invoice.id,
+                             reference_type='invoice_deletion',
+                             notes=f'Restored from deleted Invoice #{invoice.id}')
+
+        # Months whose rollup changes once the invoice and its payments are gone, plus
+        # this month, whose cost of sales the stock returned above reverses
+        affected_dates = [invoice.date_created, datetime.utcnow()] + \
+            [payment.payment_date for payment in invoice.payments]
+        payment_ids = [payment.id for payment in invoice.payments]
 
         # Delete associated payments (cascade manually if needed, but relationship cascade might handle rows, logic should handle stats)
         # SQLAlchemy relationship cascade options could handle this, but explicit is safe.
@@ -1635,7 +1363,12 @@ def delete_invoice(invoice_id):
              db_session.delete(item)
 
         db_session.delete(invoice)
+        refresh_financial_summary(db_session, *affected_dates)
         db_session.commit()
+        invalidate_dashboard()
+        refcache.invalidate('inventory')
+        pdf_cache.invalidate('invoice', invoice_id)
+        pdf_cache.invalidate('payment', *payment_ids)
         flash('Invoice deleted successfully and stock restored!', 'success')
 
     except Exception as e:
@@ -1644,7 +1377,7 @@ def delete_invoice(invoice_id):
 
     return redirect(url_for('invoices'))
 
-@app.route('/payments/delete/<int:payment_id>', methods=['POST'])
+@routes.route('/payments/delete/<int:payment_id>', methods=['POST'])
 def delete_payment(payment_id):
     """Delete payment and update invoice balance"""
     payment = db_session.query(Payment).get(payment_id)
@@ -1653,6 +1386,7 @@ def delete_payment(payment_id):
         return redirect(url_for('payments'))
 
     try:
+        invoice_id = payment.invoice_id
         invoice = payment.invoice
         if invoice:
             # Revert invoice stats
@@ -1668,7 +1402,11 @@ def delete_payment(payment_id):
                 invoice.status = InvoiceStatus.PAID # Should not happen if we are adding balance
 
         db_session.delete(payment)
+        refresh_financial_summary(db_session, payment.payment_date)
         db_session.commit()
+        invalidate_dashboard()
+        pdf_cache.invalidate('payment', payment_id)
+        pdf_cache.invalidate('invoice', invoice_id)
         flash('Payment deleted successfully!', 'success')
     
     except Exception as e:
@@ -1677,7 +1415,7 @@ def delete_payment(payment_id):
 
     return redirect(url_for('payments'))
 
-@app.route('/activities/delete/<int:activity_id>', methods=['POST'])
+@routes.route('/activities/delete/<int:activity_id>', methods=['POST'])
 def delete_activity(activity_id):
     """Delete activity and handle dependencies"""
     activity = db_session.query(Activity).get(activity_id)
@@ -1691,6 +1429,7 @@ def delete_activity(activity_id):
         
         db_session.delete(activity)
         db_session.commit()
+        invalidate_dashboard()
         flash('Activity deleted successfully!', 'success')
     except Exception as e:
         db_session.rollback()
@@ -1698,7 +1437,7 @@ def delete_activity(activity_id):
         
     return redirect(url_for('activities'))
 
-@app.route('/activity_types/delete/<int:type_id>', methods=['POST'])
+@routes.route('/activity_types/delete/<int:type_id>', methods=['POST'])
 def delete_activity_type(type_id):
     """Delete activity type and handle dependencies"""
     activity_type = db_session.query(ActivityType).get(type_id)
@@ -1713,6 +1452,7 @@ def delete_activity_type(type_id):
         
         db_session.delete(activity_type)
         db_session.commit()
+        refcache.invalidate('activity_types')
         flash('Activity type deleted successfully!', 'success')
     except Exception as e:
         db_session.rollback()
@@ -1720,19 +1460,20 @@ def delete_activity_type(type_id):
         
     return redirect(url_for('activity_types'))
 
-@app.route('/financial/categories/delete/<int:category_id>', methods=['POST'])
+@routes.route('/financial/categories/delete/<int:category_id>', methods=['POST'])
 def delete_financial_category(category_id):
     """Delete financial category"""
     category = db_session.query(FinancialCategory).get(category_id)
     if category:
         db_session.delete(category)
         db_session.commit()
+        refcache.invalidate('financial_categories')
         flash('Financial category deleted successfully!', 'success')
     else:
         flash('Financial category not found!', 'error')
     return redirect(url_for('financial_categories'))
 
-@app.route('/quotation/<int:quotation_id>')
+@routes.route('/quotation/<int:quotation_id>')
 def view_quotation(quotation_id):
     """View an quotation as an HTML page"""
     quotation_obj = db_session.query(quotation).get(quotation_id)
@@ -1747,7 +1488,8 @@ def view_quotation(quotation_id):
 
     return render_template('view_quotation.html', quotation=quotation_obj, quotation_items=quotation_items, total_quantity=total_quantity)
 
-@app.route('/quotation/<int:quotation_id>/pdf')
+@routes.route('/quotation/<int:quotation_id>/pdf')
+@read_only()
 def generate_quotation_pdf(quotation_id):
     """Generate PDF quotation"""
     quotation_obj = db_session.query(quotation).get(quotation_id)
@@ -1755,173 +1497,10 @@ def generate_quotation_pdf(quotation_id):
         from flask import abort
         abort(404)
     quotation_items = db_session.query(quotationItem).filter_by(quotation_id=quotation_id).all()
+    return pdf_cache.send_cached(documents.quotation_document(db_session, quotation_obj, quotation_items),
+                                 documents.render)
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Logo and Header
-    logo_path = os.path.join(app.root_path, 'static', 'images', 'logo.png')
-    logo = Image(logo_path, width=1.2*inch, height=1.2*inch, kind='proportional')
-
-    company_name_style = ParagraphStyle(
-        'company_name_style',
-        parent=styles['h1'],
-        fontSize=22,
-        textColor=colors.red,
-        alignment=0,
-        leading=26
-    )
-
-    contact_info_style = ParagraphStyle(
-        'contact_info_style',
-        parent=styles['Normal'],
-        fontSize=9,
-        leading=11
-    )
-
-    address_style = ParagraphStyle(
-        'address_style',
-        parent=styles['Normal'],
-        fontSize=9,
-        leading=11,
-        alignment=2
-    )
-
-    header_text = """
-    <b>+263 774 040 059</b><br/>
-    <b>+263 717 039 984</b><br/>
-    <b>giebeeengineering@gmail.com</b>
-    """
-    address_text = """
-    <b>108 Central Avenue</b><br/>
-    <b>Room 8, 1st Floor</b><br/>
-    <b>Harare, Zimbabwe</b>
-    """
-
-    header_table_data = [
-        [logo, Paragraph('<b>GieBee Engineering (Pvt) Ltd</b>', company_name_style), ''],
-        ['', Paragraph(header_text, contact_info_style), Paragraph(address_text, address_style)]
-    ]
-
-    header_table = Table(header_table_data, colWidths=[1.3*inch, 3.5*inch, 2.7*inch])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('SPAN', (0, 0), (0, 1)), # Span logo over two rows
-        ('SPAN', (1, 0), (2, 0)), # Span company name over two columns
-        ('ALIGN', (2, 1), (2, 1), 'RIGHT'),
-    ]))
-
-    story.append(header_table)
-    story.append(Spacer(1, 0.1*inch))
-    story.append(HRFlowable(width="100%", thickness=1.5, color=colors.red))
-    story.append(Spacer(1, 0.2*inch))
-
-    # Quotation Title
-    quotation_style = ParagraphStyle(
-        'quotation_style',
-        parent=styles['h2'],
-        fontSize=16,
-        alignment=0,
-        spaceAfter=8
-    )
-    story.append(Paragraph('Quotation', quotation_style))
-    story.append(Paragraph(f'SAL-QTN-2025-{quotation_obj.id:05d}', styles['Normal']))
-    story.append(Spacer(1, 0.2*inch))
- 
-    # Customer Name and Date aligned
-    customer_date_style = ParagraphStyle(
-        'customer_date_style',
-        parent=styles['Normal'],
-        fontSize=12,
-        alignment=0,  # Left alignment
-        spaceAfter=10
-    )
-    story.append(Paragraph(f"<b>Customer:</b> {quotation_obj.customer.name} {quotation_obj.customer.surname or ''}", customer_date_style))
-    story.append(Paragraph(f"<b>Date:</b> {quotation_obj.date_created.strftime('%d-%m-%Y')}", customer_date_style))
-    story.append(Spacer(1, 0.2*inch))
- 
-    # Items Table
-    items_data = [['Sr', 'Item Code', 'Description', 'Quantity', 'Price', 'Total Amount']]
-    total_quantity = 0
-    for i, item in enumerate(quotation_items):
-        if item.inventory_id:
-            inventory = db_session.query(Inventory).get(item.inventory_id)
-            item_name = inventory.name if inventory else "Unknown Item"
-            item_code = inventory.specifications or (inventory.brand if inventory else "N/A")
-        else:
-            item_name = item.description or "Custom Item"
-            item_code = item.item_code or "Custom"
-        
-        quantity = item.quantity
-        total_quantity += quantity
-        price = item.unit_price
-        amount = quantity * price
-        
-        # Wrap text in Paragraph objects for wrapping
-        items_data.append([
-            str(i + 1),
-            Paragraph(item_code, styles['Normal']),
-            Paragraph(item_name, styles['Normal']),
-            str(quantity),
-            f"${price:,.2f}",
-            f"${amount:,.2f}"
-        ])
-
-    items_table = Table(items_data, colWidths=[0.4*inch, 1*inch, 3.1*inch, 0.7*inch, 1*inch, 1.3*inch])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story.append(items_table)
-    story.append(Spacer(1, 0.2*inch))
-    # Total
-    total_data = [
-        ['', '', '', '', '', f"Net Price ${quotation_obj.total_amount:,.2f}"]
-    ]
-    total_table = Table(total_data, colWidths=[0.4*inch, 1*inch, 3.1*inch, 0.7*inch, 1*inch, 1.3*inch])
-    total_table.setStyle(TableStyle([
-        ('ALIGN', (5, 0), (5, 0), 'RIGHT'),
-        ('FONTNAME', (5, 0), (5, 0), 'Helvetica-Bold'),
-    ]))
-    story.append(total_table)
-    story.append(Spacer(1, 0.4*inch))
- 
-    # Banking Details
-    banking_details_style = ParagraphStyle(
-        'banking_details_style',
-        parent=styles['Normal'],
-        spaceBefore=20,
-        fontSize=10
-    )
-    story.append(Paragraph('<b>Banking Details</b>', banking_details_style))
-    banking_info = """
-    Giebee Engineering Pvt Ltd<br/>
-    Bank Transfer: ZB Bank<br/>
-    FCA: 411800483226405<br/>
-    Branch: Chisipite<br/>
-    """
-    story.append(Paragraph(banking_info, styles['Normal']))
- 
-    doc.build(story)
-    buffer.seek(0)
- 
-    return send_file(buffer, as_attachment=True, download_name=f'quotation_{quotation_obj.id}.pdf', mimetype='application/pdf')
-
-@app.route('/payments/edit/<int:payment_id>', methods=['GET', 'POST'])
+@routes.route('/payments/edit/<int:payment_id>', methods=['GET', 'POST'])
 def edit_payment(payment_id):
     """Edit existing payment and adjust invoice balance"""
     payment_obj = db_session.query(Payment).get(payment_id)
@@ -1955,7 +1534,11 @@ def edit_payment(payment_id):
                 else:
                     invoice.status = InvoiceStatus.SENT # Or whatever default
 
+            refresh_financial_summary(db_session, payment_obj.payment_date)
             db_session.commit()
+            invalidate_dashboard()
+            pdf_cache.invalidate('payment', payment_id)
+            pdf_cache.invalidate('invoice', payment_obj.invoice_id)
             flash('Payment updated successfully!', 'success')
             return redirect(url_for('payments'))
 
@@ -1966,13 +1549,14 @@ def edit_payment(payment_id):
 
     return render_template('edit_payment.html', payment=payment_obj)
 
-@app.route('/invoices')
+@routes.route('/invoices')
 def invoices():
     """List all invoices"""
-    invoices = db_session.query(Invoice).order_by(Invoice.date_created.desc()).all()
-    return render_template('invoices.html', invoices=invoices)
+    page = keyset_paginate(db_session.query(Invoice).options(*list_loader_options('invoices')),
+                           Invoice.date_created, Invoice.id)
+    return render_template('invoices.html', invoices=page.items, page=page)
 
-@app.route('/invoices/add', methods=['GET', 'POST'])
+@routes.route('/invoices/add', methods=['GET', 'POST'])
 def add_invoice():
     """Create new invoice"""
     if request.method == 'POST':
@@ -1980,63 +1564,7 @@ def add_invoice():
 
         try:
             # Process and validate invoice items
-            item_ids = request.form.getlist('item_id[]')
-            quantities = request.form.getlist('quantity[]')
-            unit_prices = request.form.getlist('unit_price[]')
-            custom_item_names = request.form.getlist('custom_item_name[]')
-
-            calculated_total = 0
-            invoice_items_data = []
-
-            for i, item_id in enumerate(item_ids):
-                if item_id:
-                    if item_id == 'custom':
-                        custom_name = custom_item_names[i] if i < len(custom_item_names) else ''
-                        if not custom_name:
-                            flash('Custom item name is required', 'error')
-                            return redirect(url_for('add_invoice'))
-
-                        qty = int(quantities[i])
-                        unit_price = float(unit_prices[i])
-                        item_total = qty * unit_price
-                        calculated_total += item_total
-
-                        # Generate Custom Code
-                        timestamp_code = datetime.now().strftime('%Y%m%d%H%M%S')
-                        custom_code = f"CUST-{timestamp_code}-{i}"
-
-                        invoice_items_data.append({
-                            'inventory_id': None,
-                            'custom_name': custom_name,
-                            'item_code': custom_code,
-                            'quantity': qty,
-                            'unit_price': unit_price,
-                            'item_total': item_total
-                        })
-                    else:
-                        inventory_item = db_session.query(Inventory).get(int(item_id))
-                        if not inventory_item:
-                            flash(f'Item not found', 'error')
-                            return redirect(url_for('add_invoice'))
-
-                        qty = int(quantities[i])
-                        if inventory_item.quantity < qty:
-                            flash(f'Insufficient stock for {inventory_item.name}. Available: {inventory_item.quantity}', 'error')
-                            return redirect(url_for('add_invoice'))
-
-                        unit_price = float(unit_prices[i])
-                        item_total = qty * unit_price
-                        calculated_total += item_total
-
-                        invoice_items_data.append({
-                            'inventory_id': int(item_id),
-                            'inventory_item': inventory_item,
-                            'item_code': inventory_item.specifications or "INV-ITM",
-                            'quantity': qty,
-                            'unit_price': unit_price,
-                            'cost_price': inventory_item.cost_price,
-                            'item_total': item_total
-                        })
+            lines = line_items.load(db_session, request.form, check_stock=True)
 
             customer_identification = request.form['customer_identification']
             customer = db_session.query(Customer).filter_by(identification_number=customer_identification).first()
@@ -2053,8 +1581,8 @@ def add_invoice():
             invoice = Invoice(
                 customer_id=customer.identification_number,
                 activity_type_id=activity_type_id,
-                total_amount=calculated_total,
-                balance_due=calculated_total,
+                total_amount=lines.total,
+                balance_due=lines.total,
                 status=InvoiceStatus.DRAFT,
                 due_date=datetime.now() # Default immediate
             )
@@ -2064,54 +1592,49 @@ def add_invoice():
             # Set custom sequence-aware invoice number
             invoice.invoice_number = generate_document_number(customer, Invoice)
 
-            for item_data in invoice_items_data:
+            timestamp_code = datetime.now().strftime('%Y%m%d%H%M%S')
+            for line in lines:
                 inv_item = InvoiceItem(
                     invoice_id=invoice.id,
-                    inventory_id=item_data['inventory_id'],
-                    item_code=item_data['item_code'],
-                    description=item_data.get('custom_name') or item_data['inventory_item'].name,
-                    quantity=item_data['quantity'],
-                    unit_price=item_data['unit_price'],
-                    cost_price=item_data.get('cost_price', 0.0),
-                    amount=item_data['item_total']
+                    inventory_id=line.inventory_id,
+                    item_code=line.item_code(f"CUST-{timestamp_code}-{line.position}"),
+                    description=line.description,
+                    quantity=line.quantity,
+                    unit_price=line.unit_price,
+                    cost_price=0.0 if line.is_custom else line.inventory_item.cost_price,
+                    amount=line.total
                 )
                 db_session.add(inv_item)
 
-                if item_data['inventory_id']:
-                    # Deduct Stock
-                    item_data['inventory_item'].quantity -= item_data['quantity']
-                    
-                    stock_transaction = StockTransaction(
-                        inventory_id=item_data['inventory_id'],
-                        transaction_type=TransactionType.STOCK_OUT,
-                        quantity=-item_data['quantity'],
-                        unit_price=item_data['unit_price'],
-                        total_value=-item_data['item_total'],
-                        reference_id=invoice.id,
-                        reference_type='invoice',
-                        customer_name=f"{customer.name} {customer.surname or ''}",
-                        notes=f'Sold via Invoice #{invoice.id}'
-                    )
-                    db_session.add(stock_transaction)
+                if not line.is_custom:
+                    stock.record(db_session, line.inventory_item, TransactionType.STOCK_OUT, -line.quantity,
+                                 unit_price=line.unit_price, reference_id=invoice.id, reference_type='invoice',
+                                 customer_name=f"{customer.name} {customer.surname or ''}",
+                                 notes=f'Sold via Invoice #{invoice.id}')
+
+            # Deduct Stock
+            stock.take(db_session, [(line.inventory_id, line.quantity) for line in lines])
 
+            refresh_financial_summary(db_session, invoice.date_created, datetime.utcnow())
             db_session.commit()
+            invalidate_dashboard()
+            refcache.invalidate('inventory')
             flash('Invoice created successfully!', 'success')
             return redirect(url_for('invoices'))
 
+        except (line_items.LineItemError, stock.InsufficientStock) as e:
+            db_session.rollback()
+            flash(str(e), 'error')
+            return redirect(url_for('add_invoice'))
         except Exception as e:
             db_session.rollback()
             flash(f'Error creating invoice: {str(e)}', 'error')
             return redirect(url_for('add_invoice'))
 
-    customers = db_session.query(Customer).all()
-    inventory_items = db_session.query(Inventory).filter(Inventory.quantity > 0).all()
-    activity_types = db_session.query(ActivityType).filter_by(is_active=True).all()
-    return render_template('add_invoice.html', 
-                         customers=customers, 
-                         inventory_items=inventory_items, 
-                         activity_types=activity_types)
+    activity_types = refcache.active_activity_types(db_session)
+    return render_template('add_invoice.html', activity_types=activity_types)
 
-@app.route('/invoices/edit/<int:invoice_id>', methods=['GET', 'POST'])
+@routes.route('/invoices/edit/<int:invoice_id>', methods=['GET', 'POST'])
 def edit_invoice(invoice_id):
     """Edit existing invoice and manage stock"""
     invoice_obj = db_session.query(Invoice).get(invoice_id)
@@ -2122,80 +1645,37 @@ def edit_invoice(invoice_id):
     if request.method == 'POST':
         from models import TransactionType, StockChangeReason, StockTransaction
         try:
-            # 1. Process items
-            item_ids = request.form.getlist('item_id[]')
-            quantities = request.form.getlist('quantity[]')
-            unit_prices = request.form.getlist('unit_price[]')
-            custom_item_names = request.form.getlist('custom_item_name[]')
-
-            calculated_total = 0
-            invoice_items_data = []
+            # 1. Load the invoice's current lines and the submitted ones; the
+            # stock they hold is released below, so it counts as available
+            db_items = db_session.query(InvoiceItem).filter_by(invoice_id=invoice_id).all()
+            released = {}
+            for db_item in db_items:
+                if db_item.inventory_id:
+                    released[db_item.inventory_id] = released.get(db_item.inventory_id, 0) + db_item.quantity
+            lines = line_items.load(db_session, request.form, check_stock=True, released=released)
 
             # 2. Revert OLD stock
-            db_items = db_session.query(InvoiceItem).filter_by(invoice_id=invoice_id).all()
+            stock.give(db_session, released)
             for db_item in db_items:
                 if db_item.inventory_id:
-                    inv_item = db_session.query(Inventory).get(db_item.inventory_id)
+                    inv_item = lines.inventory.get(db_item.inventory_id)
                     if inv_item:
-                        inv_item.quantity += db_item.quantity
                         # Add a compensation transaction
-                        transaction = StockTransaction(
-                            inventory_id=inv_item.id,
-                            transaction_type=TransactionType.STOCK_IN,
-                            quantity=db_item.quantity,
-                            reason=StockChangeReason.RESTOCK,
-                            notes=f"Reverting for invoice #{invoice_id} edit",
-                            reference_id=invoice_id,
-                            reference_type="INVOICE_EDIT_REVERT"
-                        )
-                        db_session.add(transaction)
-
-            # 3. Process NEW items
-            for i, item_id in enumerate(item_ids):
-                if item_id:
-                    qty = int(quantities[i])
-                    unit_price = float(unit_prices[i])
-                    item_total = qty * unit_price
-                    calculated_total += item_total
-
-                    if item_id == 'custom':
-                        custom_name = custom_item_names[i] if i < len(custom_item_names) else ''
-                        timestamp_code = datetime.now().strftime('%Y%m%d%H%M%S')
-                        custom_code = f"CUST-INV-EDT-{timestamp_code}-{i}"
-                        invoice_items_data.append({
-                            'inventory_id': None,
-                            'custom_name': custom_name,
-                            'item_code': custom_code,
-                            'quantity': qty,
-                            'unit_price': unit_price,
-                            'item_total': item_total
-                        })
-                    else:
-                        inv_id = int(item_id)
-                        inv_item = db_session.query(Inventory).get(inv_id)
-                        if inv_item:
-                            inv_item.quantity -= qty
-                            transaction = StockTransaction(
-                                inventory_id=inv_item.id,
-                                transaction_type=TransactionType.STOCK_OUT,
-                                quantity=-qty,
-                                unit_price=unit_price,
-                                total_value=-item_total,
-                                reference_id=invoice_id,
-                                reference_type="INVOICE_EDIT_DEDUCT",
-                                customer_name=f"{invoice_obj.customer.name} {invoice_obj.customer.surname or ''}",
-                                notes=f"Updating invoice #{invoice_id}"
-                            )
-                            db_session.add(transaction)
-
-                            invoice_items_data.append({
-                                'inventory_id': inv_id,
-                                'inventory_item': inv_item,
-                                'item_code': inv_item.specifications or "INV-ITM",
-                                'quantity': qty,
-                                'unit_price': unit_price,
-                                'item_total': item_total
-                            })
+                        stock.record(db_session, inv_item, TransactionType.STOCK_IN, db_item.quantity,
+                                     unit_price=db_item.unit_price, unit_cost=db_item.cost_price,
+                                     reason=StockChangeReason.RETURNED,
+                                     notes=f"Reverting for invoice #{invoice_id} edit",
+                                     reference_id=invoice_id, reference_type="INVOICE_EDIT_REVERT")
+
+            # 3. Deduct stock for the NEW items
+            stock.take(db_session, [(line.inventory_id, line.quantity) for line in lines])
+            for line in lines:
+                if not line.is_custom:
+                    stock.record(db_session, line.inventory_item, TransactionType.STOCK_OUT, -line.quantity,
+                                 unit_price=line.unit_price, reference_id=invoice_id,
+                                 reference_type="INVOICE_EDIT_DEDUCT",
+                                 customer_name=f"{invoice_obj.customer.name} {invoice_obj.customer.surname or ''}",
+                                 notes=f"Updating invoice #{invoice_id}")
 
             # 4. Update Invoice
             activity_type_id = request.form.get('activity_type_id')
@@ -2206,7 +1686,7 @@ def edit_invoice(invoice_id):
             
             invoice_obj.customer_id = request.form['customer_identification']
             old_total = invoice_obj.total_amount
-            new_total = calculated_total
+            new_total = lines.total
             paid_amount = old_total - invoice_obj.balance_due
             invoice_obj.total_amount = new_total
             invoice_obj.balance_due = max(0.0, new_total - paid_amount)
@@ -2221,33 +1701,41 @@ def edit_invoice(invoice_id):
 
             # 5. Recreate Items
             db_session.query(InvoiceItem).filter_by(invoice_id=invoice_id).delete()
-            for item in invoice_items_data:
+            timestamp_code = datetime.now().strftime('%Y%m%d%H%M%S')
+            for line in lines:
                 new_item = InvoiceItem(
                     invoice_id=invoice_id,
-                    inventory_id=item['inventory_id'],
-                    item_code=item['item_code'],
-                    description=item.get('custom_name') or item['inventory_item'].name,
-                    quantity=item['quantity'],
-                    unit_price=item['unit_price'],
-                    amount=item['item_total']
+                    inventory_id=line.inventory_id,
+                    item_code=line.item_code(f"CUST-INV-EDT-{timestamp_code}-{line.position}"),
+                    description=line.description,
+                    quantity=line.quantity,
+                    unit_price=line.unit_price,
+                    cost_price=0.0 if line.is_custom else line.inventory_item.cost_price,
+                    amount=line.total
                 )
                 db_session.add(new_item)
 
+            refresh_financial_summary(db_session, invoice_obj.date_created, datetime.utcnow())
             db_session.commit()
+            invalidate_dashboard()
+            refcache.invalidate('inventory')
+            pdf_cache.invalidate('invoice', invoice_id)
             flash('Invoice updated successfully!', 'success')
             return redirect(url_for('invoices'))
 
+        except (line_items.LineItemError, stock.InsufficientStock) as e:
+            db_session.rollback()
+            flash(str(e), 'error')
+            return redirect(url_for('edit_invoice', invoice_id=invoice_id))
         except Exception as e:
             db_session.rollback()
             flash(f'Error updating invoice: {str(e)}', 'error')
             return redirect(url_for('edit_invoice', invoice_id=invoice_id))
 
-    customers = db_session.query(Customer).all()
-    inventory_items = db_session.query(Inventory).all()
-    activity_types = db_session.query(ActivityType).filter_by(is_active=True).all()
-    return render_template('edit_invoice.html', invoice=invoice_obj, customers=customers, inventory_items=inventory_items, activity_types=activity_types)
+    activity_types = refcache.active_activity_types(db_session)
+    return render_template('edit_invoice.html', invoice=invoice_obj, activity_types=activity_types)
 
-@app.route('/quotations/<int:quotation_id>/convert', methods=['POST'])
+@routes.route('/quotations/<int:quotation_id>/convert', methods=['POST'])
 def convert_to_invoice(quotation_id):
     """Convert quotation to invoice"""
     try:
@@ -2307,33 +1795,32 @@ def convert_to_invoice(quotation_id):
             db_session.add(inv_item)
 
             if q_item.inventory_id:
-                # Deduct Stock
-                q_item.inventory.quantity -= q_item.quantity
-                
-                stock_transaction = StockTransaction(
-                    inventory_id=q_item.inventory_id,
-                    transaction_type=TransactionType.STOCK_OUT,
-                    quantity=-q_item.quantity,
-                    unit_price=q_item.unit_price,
-                    total_value=-(q_item.quantity * q_item.unit_price),
-                    reference_id=invoice.id,
-                    reference_type='invoice',
-                    customer_name=f"{quotation_obj.customer.name} {quotation_obj.customer.surname or ''}",
-                    notes=f'Converted from Quotation #{quotation_obj.id} to Invoice #{invoice.id}'
-                )
-                db_session.add(stock_transaction)
+                stock.record(db_session, q_item.inventory, TransactionType.STOCK_OUT, -q_item.quantity,
+                             unit_price=q_item.unit_price, reference_id=invoice.id, reference_type='invoice',
+                             customer_name=f"{quotation_obj.customer.name} {quotation_obj.customer.surname or ''}",
+                             notes=f'Converted from Quotation #{quotation_obj.id} to Invoice #{invoice.id}')
+
+        # Deduct Stock; the check above can be overtaken by a concurrent invoice
+        stock.take(db_session, [(q_item.inventory_id, q_item.quantity) for q_item in quotation_obj.items])
 
         quotation_obj.status = 'PROCESSED' # Or some status indicating it's done
+        refresh_financial_summary(db_session, invoice.date_created, datetime.utcnow())
         db_session.commit()
+        invalidate_dashboard()
+        refcache.invalidate('inventory')
         flash(f'Successfully converted Quotation #{quotation_id} to Invoice #{invoice.id}', 'success')
         return redirect(url_for('view_invoice', invoice_id=invoice.id))
 
+    except stock.InsufficientStock as e:
+        db_session.rollback()
+        flash(f'{e} - cannot convert quotation', 'error')
+        return redirect(url_for('quotations'))
     except Exception as e:
         db_session.rollback()
         flash(f'Error converting quotation: {str(e)}', 'error')
         return redirect(url_for('quotations'))
 
-@app.route('/invoice/<int:invoice_id>')
+@routes.route('/invoice/<int:invoice_id>')
 def view_invoice(invoice_id):
     """View an invoice as an HTML page"""
     invoice = db_session.query(Invoice).get(invoice_id)
@@ -2347,194 +1834,26 @@ def view_invoice(invoice_id):
 
     return render_template('view_invoice.html', invoice=invoice, invoice_items=invoice_items, total_quantity=total_quantity)
 
-@app.route('/invoice/<int:invoice_id>/pdf')
+@routes.route('/invoice/<int:invoice_id>/pdf')
+@read_only()
 def generate_invoice_pdf(invoice_id):
     """Generate PDF invoice"""
     invoice = db_session.query(Invoice).get(invoice_id)
     if not invoice:
         from flask import abort
         abort(404)
-    
-    invoice_items = invoice.items
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Logo and Header (Same as Quotation)
-    logo_path = os.path.join(app.root_path, 'static', 'images', 'logo.png')
-    logo = Image(logo_path, width=1.2*inch, height=1.2*inch, kind='proportional')
-
-    company_name_style = ParagraphStyle(
-        'company_name_style',
-        parent=styles['h1'],
-        fontSize=22,
-        textColor=colors.red,
-        alignment=0,
-        leading=26
-    )
-
-    contact_info_style = ParagraphStyle(
-        'contact_info_style',
-        parent=styles['Normal'],
-        fontSize=9,
-        leading=11
-    )
-
-    address_style = ParagraphStyle(
-        'address_style',
-        parent=styles['Normal'],
-        fontSize=9,
-        leading=11,
-        alignment=2
-    )
-
-    header_text = """
-    <b>+263 774 040 059</b><br/>
-    <b>+263 717 039 984</b><br/>
-    <b>giebeeengineering@gmail.com</b>
-    """
-    address_text = """
-    <b>108 Central Avenue</b><br/>
-    <b>Room 8, 1st Floor</b><br/>
-    <b>Harare, Zimbabwe</b>
-    """
-
-    header_table_data = [
-        [logo, Paragraph('<b>GieBee Engineering (Pvt) Ltd</b>', company_name_style), ''],
-        ['', Paragraph(header_text, contact_info_style), Paragraph(address_text, address_style)]
-    ]
-
-    header_table = Table(header_table_data, colWidths=[1.3*inch, 3.5*inch, 2.7*inch])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('SPAN', (0, 0), (0, 1)),
-        ('SPAN', (1, 0), (2, 0)),
-        ('ALIGN', (2, 1), (2, 1), 'RIGHT'),
-    ]))
-
-    story.append(header_table)
-    story.append(Spacer(1, 0.1*inch))
-    story.append(HRFlowable(width="100%", thickness=1.5, color=colors.red))
-    story.append(Spacer(1, 0.2*inch))
-
-    # Invoice Title
-    title_style = ParagraphStyle(
-        'invoice_style',
-        parent=styles['h2'],
-        fontSize=16,
-        alignment=0,
-        spaceAfter=8
-    )
-    story.append(Paragraph('Tax Invoice', title_style))
-    story.append(Paragraph(f'INV-{invoice.id:05d}', styles['Normal']))
-    story.append(Spacer(1, 0.2*inch))
-
-    # Customer Name and Date
-    customer_date_style = ParagraphStyle(
-        'customer_date_style',
-        parent=styles['Normal'],
-        fontSize=12,
-        alignment=0,
-        spaceAfter=10
-    )
-    story.append(Paragraph(f"<b>Customer:</b> {invoice.customer.name} {invoice.customer.surname or ''}", customer_date_style))
-    story.append(Paragraph(f"<b>Date:</b> {invoice.date_created.strftime('%d-%m-%Y')}", customer_date_style))
-    story.append(Paragraph(f"<b>Status:</b> {invoice.status.value}", customer_date_style))
-    story.append(Spacer(1, 0.2*inch))
-
-    # Items Table
-    items_data = [['Sr', 'Item Code', 'Description', 'Quantity', 'Price', 'Total Amount']]
-    
-    for i, item in enumerate(invoice_items):
-        item_code = item.item_code or "N/A"
-        item_text = item.description 
-        
-        # If description is just the code or empty, try to get inventory name
-        if not item_text or item_text == item_code:
-            if item.inventory_id:
-                inventory = db_session.query(Inventory).get(item.inventory_id)
-                if inventory:
-                    item_text = inventory.name
-        
-        items_data.append([
-            str(i + 1),
-            Paragraph(item_code, styles['Normal']),
-            Paragraph(item_text or "N/A", styles['Normal']),
-            str(item.quantity),
-            f"${item.unit_price:,.2f}",
-            f"${item.amount:,.2f}"
-        ])
-
-    items_table = Table(items_data, colWidths=[0.4*inch, 1.2*inch, 2.9*inch, 0.7*inch, 1*inch, 1.3*inch])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    story.append(items_table)
-    story.append(Spacer(1, 0.2*inch))
-
-    # Total
-    total_data = [
-        ['', '', '', '', 'Total:', f"${invoice.total_amount:,.2f}"],
-        ['', '', '', '', 'Paid:', f"${invoice.paid_amount:,.2f}"],
-        ['', '', '', '', 'Balance:', f"${invoice.balance_due:,.2f}"]
-    ]
-    total_table = Table(total_data, colWidths=[0.4*inch, 1.2*inch, 2.9*inch, 0.7*inch, 1*inch, 1.3*inch])
-    total_table.setStyle(TableStyle([
-        ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (4, 0), (-1, -1), 'Helvetica-Bold'),
-        ('LINEABOVE', (4, 2), (-1, 2), 1, colors.black), # Line above Balance
-    ]))
-    story.append(total_table)
-    story.append(Spacer(1, 0.4*inch))
-
-    # Banking Details
-    banking_details_style = ParagraphStyle(
-        'banking_details_style',
-        parent=styles['Normal'],
-        spaceBefore=20,
-        fontSize=10
-    )
-    story.append(Paragraph('<b>Banking Details</b>', banking_details_style))
-    banking_info = """
-    Giebee Engineering Pvt Ltd<br/>
-    Bank Transfer: ZB Bank<br/>
-    FCA: 411800483226405<br/>
-    Branch: Chisipite<br/>
-    """
-    story.append(Paragraph(banking_info, styles['Normal']))
-
-    doc.build(story)
-    buffer.seek(0)
-
-    # Sanitize filename
-    safe_name = "".join([c for c in f"{invoice.customer.name} {invoice.customer.surname or ''}" if c.isalpha() or c.isdigit() or c==' ']).rstrip().replace(" ", "_")
-    filename = f'Invoice_{invoice.id}_{safe_name}.pdf'
 
-    return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
+    return pdf_cache.send_cached(documents.invoice_document(db_session, invoice), documents.render)
 
 
-@app.route('/payments')
+@routes.route('/payments')
 def payments():
     """List all payments"""
-    payments = db_session.query(Payment).order_by(Payment.payment_date.desc()).all()
-    return render_template('payments.html', payments=payments)
+    page = keyset_paginate(db_session.query(Payment).options(*list_loader_options('payments')),
+                           Payment.payment_date, Payment.id)
+    return render_template('payments.html', payments=page.items, page=page)
 
-@app.route('/invoice/<int:invoice_id>/add_payment', methods=['GET', 'POST'])
+@routes.route('/invoice/<int:invoice_id>/add_payment', methods=['GET', 'POST'])
 def add_payment(invoice_id):
     """Add payment to an invoice"""
     invoice = db_session.query(Invoice).get(invoice_id)
@@ -2597,7 +1916,10 @@ def add_payment(invoice_id):
             )
             db_session.add(fin_record)
 
+            refresh_financial_summary(db_session, payment.payment_date, fin_record.date)
             db_session.commit()
+            invalidate_dashboard()
+            pdf_cache.invalidate('invoice', invoice_id)
             flash('Payment recorded successfully!', 'success')
             return redirect(url_for('view_invoice', invoice_id=invoice.id))
 
@@ -2609,180 +1931,121 @@ def add_payment(invoice_id):
     return render_template('add_payment.html', invoice=invoice)
 
 
-@app.route('/payment/<int:payment_id>/pdf')
+@routes.route('/payment/<int:payment_id>/pdf')
+@read_only()
 def generate_payment_pdf(payment_id):
     """Generate PDF receipt for payment"""
     payment = db_session.query(Payment).get(payment_id)
     if not payment:
         from flask import abort
         abort(404)
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Logo and Header (Same as Invoice)
-    logo_path = os.path.join(app.root_path, 'static', 'images', 'logo.png')
-    logo = Image(logo_path, width=1.2*inch, height=1.2*inch, kind='proportional')
-
-    company_name_style = ParagraphStyle(
-        'company_name_style',
-        parent=styles['h1'],
-        fontSize=22,
-        textColor=colors.red,
-        alignment=0,
-        leading=26
-    )
-
-    contact_info_style = ParagraphStyle(
-        'contact_info_style',
-        parent=styles['Normal'],
-        fontSize=9,
-        leading=11
-    )
-
-    address_style = ParagraphStyle(
-        'address_style',
-        parent=styles['Normal'],
-        fontSize=9,
-        leading=11,
-        alignment=2
-    )
-
-    header_text = """
-    <b>+263 774 040 059</b><br/>
-    <b>+263 717 039 984</b><br/>
-    <b>giebeeengineering@gmail.com</b>
-    """
-    address_text = """
-    <b>108 Central Avenue</b><br/>
-    <b>Room 8, 1st Floor</b><br/>
-    <b>Harare, Zimbabwe</b>
-    """
 
-    header_table_data = [
-        [logo, Paragraph('<b>GieBee Engineering (Pvt) Ltd</b>', company_name_style), ''],
-        ['', Paragraph(header_text, contact_info_style), Paragraph(address_text, address_style)]
-    ]
-
-    header_table = Table(header_table_data, colWidths=[1.3*inch, 3.5*inch, 2.7*inch])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('SPAN', (0, 0), (0, 1)),
-        ('SPAN', (1, 0), (2, 0)),
-        ('ALIGN', (2, 1), (2, 1), 'RIGHT'),
-    ]))
-
-    story.append(header_table)
-    story.append(Spacer(1, 0.1*inch))
-    story.append(HRFlowable(width="100%", thickness=1.5, color=colors.red))
-    story.append(Spacer(1, 0.2*inch))
+    return pdf_cache.send_cached(documents.payment_document(payment), documents.render)
 
-    # Receipt Title
-    title_style = ParagraphStyle(
-        'receipt_style',
-        parent=styles['h2'],
-        fontSize=16,
-        alignment=0,
-        spaceAfter=8
-    )
-    story.append(Paragraph('Payment Receipt', title_style))
-    story.append(Paragraph(f'RCPT-{payment.id:05d}', styles['Normal']))
-    story.append(Spacer(1, 0.2*inch))
-
-    # Payment Details
-    details_style = ParagraphStyle(
-        'details_style',
-        parent=styles['Normal'],
-        fontSize=12,
-        alignment=0,
-        spaceAfter=10,
-        leading=16
-    )
-    
-    invoice = payment.invoice
-    customer = invoice.customer
-
-    story.append(Paragraph(f"<b>Received From:</b> {customer.name} {customer.surname or ''}", details_style))
-    story.append(Paragraph(f"<b>Transaction ID:</b> {payment.transaction_id or 'N/A'}", details_style))
-    story.append(Paragraph(f"<b>Date:</b> {payment.payment_date.strftime('%d-%m-%Y')}", details_style))
-    story.append(Paragraph(f"<b>Payment Method:</b> {payment.payment_method.value}", details_style))
-    if payment.reference_number:
-        story.append(Paragraph(f"<b>Reference:</b> {payment.reference_number}", details_style))
-    
-    story.append(Spacer(1, 0.2*inch))
-    
-    story.append(Paragraph(f"<b>Payment For:</b> Invoice #{invoice.id}", details_style))
-    
-    if payment.notes:
-        story.append(Paragraph(f"<b>Notes:</b> {payment.notes}", details_style))
-    
-    story.append(Spacer(1, 0.2*inch))
 
-    # Amount Box
-    amount_data = [
-        ['Amount Received', f"${payment.amount:,.2f}"]
-    ]
-    amount_table = Table(amount_data, colWidths=[2*inch, 2*inch])
-    amount_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('BOX', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    story.append(amount_table)
-
-    story.append(Spacer(1, 0.4*inch))
-    story.append(Paragraph("Thank you for your business!", styles['Normal']))
-
-    doc.build(story)
-    buffer.seek(0)
-
-    # Sanitize filename
-    safe_name = "".join([c for c in f"{customer.name} {customer.surname or ''}" if c.isalpha() or c.isdigit() or c==' ']).rstrip().replace(" ", "_")
-    filename = f'Payment_{payment.id}_{safe_name}.pdf'
-
-    return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
-
-
-# Auto-migration helper
-def check_db_schema():
-    """Checks for missing columns and adds them if necessary (Simple Migration)"""
-    from sqlalchemy import text
-    from database import engine
+@routes.route('/exports', methods=['POST'])
+def start_export():
+    """Queue a ZIP export of invoice and payment receipt PDFs for a date range"""
+    data = request.get_json(silent=True) or request.form
     try:
-        # Check for payer_name in payments
-        with engine.connect() as conn:
-            try:
-                conn.execute(text("ALTER TABLE payments ADD COLUMN payer_name VARCHAR(100)"))
-                conn.commit()
-                print("Added column 'payer_name' to 'payments'")
-            except Exception:
-                pass
-            
-            # Check for quotation_id in invoices
-            try:
-                conn.execute(text("ALTER TABLE invoices ADD COLUMN quotation_id INTEGER REFERENCES quotations(id)"))
-                conn.commit()
-                print("Added column 'quotation_id' to 'invoices'")
-            except Exception:
-                pass
-    except Exception as e:
-        print(f"Schema check warning: {e}")
-
-@app.before_request
-def startup_check():
-    if not hasattr(app, 'schema_checked'):
-        init_db()
-        check_db_schema()
-        app.schema_checked = True
+        start = datetime.fromisoformat(data['start'])
+        end = datetime.fromisoformat(data['end'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "start and end dates (YYYY-MM-DD) are required"}), 400
+    kinds = [k for k in str(data.get('kinds', 'invoice,payment')).split(',') if k in bulk_export.EXPORT_KINDS]
+    if end <= start or not kinds:
+        return jsonify({"error": "end must be after start and kinds must include invoice or payment"}), 400
+
+    export_id = bulk_export.new_export(start, end, kinds)
+    job = jobs.submit(db_session, 'bulk_export', {'export_id': export_id})
+    bulk_export.write_status(export_id, job_id=job.id)
+    return jsonify(export_status_payload(export_id)), 202
+
+def export_status_payload(export_id):
+    status = bulk_export.read_status(export_id)
+    status['status_url'] = url_for('export_status', export_id=export_id)
+    if status.get('job_id'):
+        status['job_url'] = url_for('job_status', job_id=status['job_id'])
+    if status['state'] == 'done':
+        status['download_url'] = url_for('download_export', export_id=export_id)
+    return status
+
+@routes.route('/exports/<export_id>')
+def export_status(export_id):
+    """Progress of a bulk export"""
+    if not bulk_export.valid_export_id(export_id) or not bulk_export.read_status(export_id):
+        return jsonify({"error": "export not found"}), 404
+    return jsonify(export_status_payload(export_id))
+
+@routes.route('/exports/<export_id>/download')
+def download_export(export_id):
+    """Download a finished bulk export"""
+    status = bulk_export.read_status(export_id) if bulk_export.valid_export_id(export_id) else None
+    if not status or status['state'] != 'done':
+        return jsonify({"error": "export not ready"}), 404
+    return send_file(bulk_export.zip_path(export_id), as_attachment=True,
+                     download_name=f"export_{status['start'][:10]}_{status['end'][:10]}.zip",
+                     mimetype='application/zip')
+
+@routes.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a maintenance job: {"kind": ..., "payload": {...}}"""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    # Exports are queued through /exports, which prepares their status file
+    if kind not in jobs.HANDLERS or kind == 'bulk_export':
+        return jsonify({"error": f"unknown job kind: {kind}"}), 400
+    job = jobs.submit(db_session, kind, data.get('payload') or {})
+    return jsonify(dict(jobs.job_status(job), status_url=url_for('job_status', job_id=job.id))), 202
+
+@routes.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    """Status of a background job"""
+    from models import Job
+    job = db_session.get(Job, job_id)
+    if not job:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(jobs.job_status(job))
+
+
+_worker = None
+
+
+def create_app(config=None):
+    """Build a new, fully configured application"""
+    global _worker
+    app = Flask(__name__)
+    if config:
+        app.config.update(config)
+    routes.register(app)
+
+    app.wsgi_app = WhiteNoise(app.wsgi_app, root='static/', prefix='static/')
+
+    # setup a secret key, required by sessions
+    app.secret_key = os.environ.get("FLASK_SECRET_KEY") or "solar_company_secret_key"
+
+    # Opt-in SQL/latency instrumentation (Server-Timing header and /_metrics)
+    if instrumentation.is_enabled():
+        # @read_only() routes run their queries on read_engine
+        instrumentation.init_app(app, engine, read_engine)
+
+    # Several gunicorn workers share one SQLite file: re-run writes that hit its lock
+    if sqlite_profile.is_sqlite(engine):
+        sqlite_profile.init_app(app, db_session)
+
+    # Single-process deployments can run the job worker inside the web process (one per process, not per app)
+    if os.environ.get('JOBS_IN_PROCESS', '').lower() in ('1', 'true', 'yes') and _worker is None:
+        _worker = jobs.start_worker_thread(db_session.session_factory)
+    return app
+
+
+# main:app for gunicorn, api/index.py and desktop_app.py
+app = create_app()
 
 if __name__ == '__main__':
+    import maintenance
+    maintenance.run()
+    # The development server has no separate worker process
+    if not os.environ.get('JOBS_IN_PROCESS') and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        jobs.start_worker_thread(db_session.session_factory)
     app.run(debug=True, host='0.0.0.0', port=5002)
@@ -0,0 +1,209 @@
+"""One-off schema and data maintenance, run once per deploy instead of at import.
+
+Web workers used to create tables, ALTER in missing columns and rescan whole
+tables to normalise enum strings every time they booted or served their first
+request. That now happens here, before the web processes start:
+
+    python maintenance.py [run | create-tables | migrate | create-indexes | normalize-enums | search-index |
+                           financial-summary]
+
+Columns and data that older databases lack are brought up to date by the
+versioned migrations in migrations.py.
+
+Every step is idempotent and runs under a lock (a PostgreSQL advisory lock, or
+a lock file next to the SQLite database), so several instances deploying at
+once take turns instead of racing each other's ALTER TABLEs.
+"""
+import os
+import time
+import argparse
+from contextlib import contextmanager
+
+import sqlalchemy as db
+from sqlalchemy.schema import CreateIndex
+
+import migrations
+from database import Base, engine, database_url, init_db
+
+LOCK_TIMEOUT = float(os.environ.get('MAINTENANCE_LOCK_TIMEOUT', 300))
+LOCK_STALE_SECONDS = 3600
+ADVISORY_LOCK_ID = 0x501A7  # arbitrary, shared by every instance of the app
+
+# Enum-like columns whose legacy values may be in the wrong case
+ENUM_COLUMNS = [
+    ('quotations', 'status', ('PENDING', 'PAID', 'OVERDUE', 'CANCELLED')),
+    ('payments', 'payment_method', ('CASH', 'ECOCASH', 'SWIPE', 'TRANSFER', 'CREDIT')),
+]
+
+# Indexes models.py no longer declares, dropped by create-indexes: (table, index)
+RETIRED_INDEXES = [
+    ('financial_records', 'ix_financial_records_date_type'),  # superseded by ix_financial_records_type_date
+]
+
+
+@contextmanager
+def maintenance_lock(bind=None, timeout=None):
+    """Hold the deploy-wide maintenance lock, waiting up to timeout seconds for it"""
+    bind = bind or engine
+    timeout = LOCK_TIMEOUT if timeout is None else timeout
+    if bind.dialect.name == 'postgresql':
+        with bind.connect() as conn:
+            deadline = time.monotonic() + timeout
+            while not conn.execute(db.text("SELECT pg_try_advisory_lock(:id)"), {'id': ADVISORY_LOCK_ID}).scalar():
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Timed out waiting for the maintenance lock")
+                time.sleep(0.5)
+            try:
+                yield
+            finally:
+                conn.execute(db.text("SELECT pg_advisory_unlock(:id)"), {'id': ADVISORY_LOCK_ID})
+                conn.commit()
+        return
+
+    path = _lock_file_path(str(bind.url))
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for the maintenance lock {path}")
+            time.sleep(0.2)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+def _lock_file_path(url):
+    if url.startswith('sqlite:///') and url != 'sqlite:///:memory:':
+        return url.replace('sqlite:///', '', 1) + '.maintenance.lock'
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'maintenance.lock')
+
+
+def create_indexes(bind=None):
+    """Create the indexes declared in models.py that an existing database lacks; returns their names.
+
+    Indexes listed in RETIRED_INDEXES are dropped first.
+
+    create_all() skips tables that already exist, so indexes added to a model
+    later only reach older databases through here. On PostgreSQL they are built
+    with CREATE INDEX CONCURRENTLY, which does not block writes; a build that
+    was interrupted leaves an INVALID index behind, which is dropped and rebuilt.
+    SQLite has no online variant, but building an index on tables this size
+    holds the write lock for well under a second.
+    """
+    import models  # registers the tables on Base.metadata
+
+    bind = bind or engine
+    postgres = bind.dialect.name == 'postgresql'
+    inspector = db.inspect(bind)
+    created = []
+    with bind.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        invalid = set()
+        if postgres:
+            invalid = {name for (name,) in conn.execute(db.text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"))}
+        for table_name, index_name in RETIRED_INDEXES:
+            if inspector.has_table(table_name) and \
+                    index_name in {ix['name'] for ix in inspector.get_indexes(table_name)}:
+                concurrently = 'CONCURRENTLY ' if postgres else ''
+                conn.execute(db.text(f"DROP INDEX {concurrently}IF EXISTS {index_name}"))
+                print(f"Dropped retired index {index_name}")
+        for table in Base.metadata.sorted_tables:
+            if not table.indexes or not inspector.has_table(table.name):
+                continue
+            existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda ix: ix.name):
+                if index.name in existing and index.name not in invalid:
+                    continue
+                ddl = str(CreateIndex(index).compile(dialect=bind.dialect))
+                if postgres:
+                    if index.name in invalid:
+                        conn.execute(db.text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+                    ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+                started = time.perf_counter()
+                conn.execute(db.text(ddl))
+                print(f"Created index {index.name} in {time.perf_counter() - started:.2f}s")
+                created.append(index.name)
+    return created
+
+
+def normalize_enums(bind=None):
+    """Upper-case legacy enum strings in place; returns how many rows changed"""
+    bind = bind or engine
+    changed = 0
+    with bind.begin() as conn:
+        for table, column, values in ENUM_COLUMNS:
+            # Only rows in the wrong case are written, so a clean database is left alone
+            result = conn.execute(db.text(
+                f"UPDATE {table} SET {column} = UPPER(TRIM({column})) "
+                f"WHERE UPPER(TRIM({column})) IN :values AND {column} != UPPER(TRIM({column}))"
+            ).bindparams(db.bindparam('values', expanding=True)), {'values': list(values)})
+            changed += result.rowcount or 0
+    if changed:
+        print(f"Normalized {changed} enum values")
+    return changed
+
+
+def build_search_index(bind=None):
+    """(Re)build the customer, inventory and supplier search index; returns rows indexed per kind"""
+    import search_index
+    counts = search_index.build_index(bind or engine)
+    if counts:
+        print("Search index: " + ", ".join(f"{count} {kind}" for kind, count in counts.items()))
+    return counts
+
+
+def backfill_financial_summary(bind=None):
+    """Store the monthly rollup for months that have source rows but no rollup yet; returns the months stored"""
+    import reports
+    from sqlalchemy.orm import Session
+    with Session(bind=bind or engine) as session:
+        months = reports.backfill_financial_summary(session)
+    if months:
+        print(f"Financial summary: backfilled {len(months)} months")
+    return months
+
+
+STEPS = {
+    'create-tables': init_db,
+    'migrate': migrations.migrate,
+    'create-indexes': create_indexes,
+    'normalize-enums': normalize_enums,
+    'search-index': build_search_index,
+    'financial-summary': backfill_financial_summary,
+}
+
+
+def run(steps=None):
+    """Run the given maintenance steps (all of them by default) under the lock"""
+    steps = steps or list(STEPS)
+    started = time.perf_counter()
+    results = {}
+    with maintenance_lock():
+        for step in steps:
+            results[step] = STEPS[step]()
+    print(f"Maintenance ({', '.join(steps)}) finished in {time.perf_counter() - started:.2f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Schema and data maintenance, run once per deploy')
+    parser.add_argument('command', nargs='?', default='run', choices=['run'] + list(STEPS))
+    args = parser.parse_args()
+    print(f"Running maintenance against {database_url.split('@')[-1]}")
+    run(None if args.command == 'run' else [args.command])
+
+
+if __name__ == "__main__":
+    main()
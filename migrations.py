@@ -0,0 +1,448 @@
+"""Versioned schema and data migrations, replacing the one-off migrate_*.py scripts.
+
+Every migration has a version number and is applied once per database, in
+order; the schema_version table records which ones have run and how long
+they took. Schema migrations ALTER in the columns an older database lacks
+(tables that do not exist yet are left to create_all). Data migrations walk
+a table in keyset-paged chunks of CHUNK_SIZE rows, one transaction per
+chunk, and save their position with each chunk: memory stays flat however
+big the table is, and a run that was interrupted picks up where it stopped.
+The SQL is plain enough for both SQLite and PostgreSQL.
+
+    python migrations.py [status | migrate] [--to VERSION] [--chunk-size N] [--url DATABASE_URL]
+
+maintenance.py applies the pending migrations on every deploy, under the
+maintenance lock.
+"""
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+
+import sqlalchemy as db
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, Float, Text
+
+from database import engine, database_url, _normalise_url
+
+CHUNK_SIZE = int(os.environ.get('MIGRATION_CHUNK_SIZE', 2000))
+
+SCHEMA_VERSION = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('started_at', DateTime),
+    Column('applied_at', DateTime),  # NULL while in progress, or if the run was interrupted
+    Column('seconds', Float),
+    Column('progress', Text),  # JSON {table: last key done} for chunked data migrations
+)
+
+MIGRATIONS = {}
+
+
+def migration(version, name):
+    """Register fn(step) -> summary as migration number version"""
+    def register(fn):
+        if version in MIGRATIONS:
+            raise ValueError(f"Migration {version} is already registered")
+        MIGRATIONS[version] = (name, fn)
+        return fn
+    return register
+
+
+class Step:
+    """The migration being applied: its bind, chunk size and saved position in each table"""
+
+    def __init__(self, bind, version, chunk_size, progress):
+        self.bind = bind
+        self.version = version
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.now = datetime.utcnow()
+
+    def columns(self, table):
+        """{column: type} for table, or None if the database has no such table"""
+        inspector = db.inspect(self.bind)
+        if not inspector.has_table(table):
+            return None
+        return {c['name']: c['type'] for c in inspector.get_columns(table)}
+
+    def alter(self, ddl):
+        with self.bind.begin() as conn:
+            conn.execute(db.text(ddl))
+        print(f"  {ddl}")
+
+    def add_columns(self, columns):
+        """ALTER in the (table, column, DDL type) columns an existing table lacks; returns the ones added"""
+        added = []
+        for table, column, ddl in columns:
+            existing = self.columns(table)
+            if existing is None or column in existing:
+                continue
+            self.alter(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            added.append(f"{table}.{column}")
+        return added
+
+    def in_chunks(self, table, apply, select='id', where='1 = 1', join='', key='id'):
+        """Call apply(conn, rows) for the rows of table matching where, chunk_size at a time in key order.
+
+        select lists the columns to fetch and must start with the key. Each
+        chunk is one transaction, committed along with the last key done, so
+        a rerun skips the chunks already done. apply returns how many rows it
+        changed; the total is returned.
+        """
+        key = f"{table}.{key}"
+        after = self.progress.get(table)
+        remaining = f"({where})" + (f" AND {key} > :after" if after is not None else "")
+        with self.bind.connect() as conn:
+            total = conn.execute(db.text(f"SELECT count(*) FROM {table} {join} WHERE {remaining}"),
+                                 {'after': after}).scalar()
+        if not total:
+            return 0
+        done = changed = 0
+        started = time.perf_counter()
+        while True:
+            remaining = f"({where})" + (f" AND {key} > :after" if after is not None else "")
+            with self.bind.begin() as conn:
+                rows = conn.execute(db.text(
+                    f"SELECT {select} FROM {table} {join} WHERE {remaining} ORDER BY {key} LIMIT :limit"
+                ), {'after': after, 'limit': self.chunk_size}).fetchall()
+                if not rows:
+                    break
+                changed += apply(conn, rows) or 0
+                after = rows[-1][0]
+                self.progress[table] = after
+                conn.execute(SCHEMA_VERSION.update().where(SCHEMA_VERSION.c.version == self.version)
+                             .values(progress=json.dumps(self.progress)))
+            done += len(rows)
+            print(f"  {table}: {done}/{total} rows, {changed} changed in {time.perf_counter() - started:.2f}s")
+            if len(rows) < self.chunk_size:
+                break
+        return changed
+
+    def update_in_chunks(self, table, assignments, where):
+        """UPDATE table SET assignments for the rows matching where, in chunks; returns the rows changed"""
+        def update(conn, rows):
+            statement = db.text(
+                f"UPDATE {table} SET {assignments}, updated_at = :now WHERE id IN :ids AND ({where})"
+            ).bindparams(db.bindparam('ids', expanding=True))
+            return conn.execute(statement, {'ids': [row[0] for row in rows], 'now': self.now}).rowcount
+        return self.in_chunks(table, update, where=where)
+
+
+# Columns the models gained after databases were first created, which the old
+# migrate_*.py scripts and check_db_schema() used to ALTER in. The amounts are
+# added without a default so the rows that predate them can be told apart.
+LEGACY_COLUMNS = [
+    ('quotations', 'quotation_number', 'VARCHAR(20)'),
+    ('invoices', 'invoice_number', 'VARCHAR(20)'),
+    ('invoices', 'quotation_id', 'INTEGER REFERENCES quotations(id)'),
+    ('invoices', 'activity_type_id', 'INTEGER'),
+    ('invoices', 'paid_amount', 'FLOAT DEFAULT 0.0'),
+    ('invoices', 'balance_due', 'FLOAT'),
+    ('invoice_items', 'item_code', 'VARCHAR(50)'),
+    ('invoice_items', 'amount', 'FLOAT'),
+    ('invoice_items', 'cost_price', 'FLOAT DEFAULT 0.0'),
+    ('inventory', 'cost_price', 'FLOAT DEFAULT 0.0'),
+    ('pricing', 'currency', "VARCHAR(50) DEFAULT 'USD'"),
+    ('activities', 'currency', "VARCHAR(50) DEFAULT 'USD'"),
+    ('suppliers', 'currency', "VARCHAR(50) DEFAULT 'USD'"),
+    ('stock_transactions', 'currency', "VARCHAR(50) DEFAULT 'USD'"),
+    ('stock_transactions', 'unit_cost', 'FLOAT'),
+    ('payments', 'transaction_id', 'VARCHAR(50)'),
+    ('payments', 'payer_name', 'VARCHAR(100)'),
+]
+
+# Every table gained updated_at for the delta sync in sync_to_render.py
+TRACKED_TABLES = (
+    'activity_types', 'custom_fields', 'customers', 'financial_categories', 'financial_records', 'jobs',
+    'locations', 'monthly_expense_summary', 'monthly_financial_summary', 'pricing', 'suppliers', 'activities',
+    'inventory', 'quotations', 'invoices', 'journey_records', 'quotation_items', 'stock_snapshots',
+    'stock_transactions', 'fuel_records', 'invoice_items', 'mileage_records', 'payments',
+)
+
+# Labels written by early versions of the app, mapped to the enum names stored now
+ENUM_LABELS = [
+    ('invoices', 'status', {'PENDING': 'DRAFT'}),
+    ('stock_transactions', 'transaction_type',
+     {'Stock In': 'STOCK_IN', 'Stock Out': 'STOCK_OUT', 'Adjustment': 'ADJUSTMENT'}),
+    ('financial_records', 'type', {'Income': 'INCOME', 'Expense': 'EXPENSE'}),
+    ('financial_categories', 'type', {'Income': 'INCOME', 'Expense': 'EXPENSE'}),
+]
+
+
+# Tables whose customer_id points at customers.identification_number
+CUSTOMER_REFERENCES = ('quotations', 'invoices', 'activities')
+
+# customers keyed by identification_number, as migration 8 builds it. Frozen
+# here rather than taken from models.Customer, so later model changes cannot
+# alter what the migration creates; the indexes are left to create-indexes.
+CUSTOMERS_NEW = Table(
+    'customers_new', MetaData(),
+    Column('identification_number', String(50), primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('surname', String(100)),
+    Column('citizenship', String(50)),
+    Column('address', String(200)),
+    Column('phone', String(20)),
+    Column('email', String(100)),
+    Column('date_created', DateTime),
+    Column('updated_at', DateTime),
+)
+
+
+@migration(1, 'legacy-columns')
+def _legacy_columns(step):
+    return step.add_columns(LEGACY_COLUMNS)
+
+
+@migration(2, 'updated-at-columns')
+def _updated_at_columns(step):
+    return step.add_columns([(table, 'updated_at', 'TIMESTAMP') for table in TRACKED_TABLES])
+
+
+@migration(3, 'customer-references')
+def _customer_references(step):
+    """Point customer_id at customers.identification_number instead of the old integer customers.id.
+
+    SQLite declares the new reference along with the column. PostgreSQL only
+    accepts a foreign key to a unique column, so it gets its constraints from
+    migration 8, once identification_number is the primary key.
+    """
+    customers = step.columns('customers')
+    if not customers or 'id' not in customers:
+        return 0
+    postgres = step.bind.dialect.name == 'postgresql'
+    reference = '' if postgres else ' REFERENCES customers(identification_number)'
+    changed = 0
+    for table in CUSTOMER_REFERENCES:
+        columns = step.columns(table) or {}
+        if 'customer_id_new' not in columns:
+            if not isinstance(columns.get('customer_id'), db.Integer):
+                continue  # no such table, or already converted
+            step.alter(f"ALTER TABLE {table} ADD COLUMN customer_id_new VARCHAR(50){reference}")
+        if 'customer_id' in columns:
+            changed += step.update_in_chunks(
+                table,
+                f"customer_id_new = (SELECT c.identification_number FROM customers c WHERE c.id = {table}.customer_id)",
+                where='customer_id IS NOT NULL')
+            with step.bind.connect() as conn:
+                orphans = conn.execute(db.text(
+                    f"SELECT count(*) FROM {table} WHERE customer_id IS NOT NULL AND customer_id_new IS NULL")).scalar()
+            if orphans:
+                print(f"  WARNING: {orphans} {table} point at customers that no longer exist; they are left without one")
+            cascade = ' CASCADE' if postgres else ''
+            step.alter(f"ALTER TABLE {table} DROP COLUMN customer_id{cascade}")
+        step.alter(f"ALTER TABLE {table} RENAME COLUMN customer_id_new TO customer_id")
+    return changed
+
+
+@migration(4, 'invoice-amounts')
+def _invoice_amounts(step):
+    """Fill in the balances and line amounts of rows older than those columns"""
+    changed = 0
+    if step.columns('invoices'):
+        changed += step.update_in_chunks('invoices', 'balance_due = total_amount - COALESCE(paid_amount, 0)',
+                                         where='balance_due IS NULL')
+    if step.columns('invoice_items'):
+        changed += step.update_in_chunks('invoice_items', 'amount = quantity * unit_price', where='amount IS NULL')
+    return changed
+
+
+@migration(5, 'enum-labels')
+def _enum_labels(step):
+    changed = 0
+    for table, column, labels in ENUM_LABELS:
+        if column not in (step.columns(table) or {}):
+            continue
+        cases = ' '.join(f"WHEN '{old}' THEN '{new}'" for old, new in labels.items())
+        olds = ', '.join(f"'{old}'" for old in labels)
+        changed += step.update_in_chunks(table, f"{column} = CASE {column} {cases} END", where=f"{column} IN ({olds})")
+    return changed
+
+
+@migration(6, 'document-numbers')
+def _document_numbers(step):
+    """Number the quotations and invoices that predate numbering, the way generate_document_number() does"""
+    changed = 0
+    for table, column in (('quotations', 'quotation_number'), ('invoices', 'invoice_number')):
+        if column not in (step.columns(table) or {}):
+            continue
+
+        def number(conn, rows, table=table, column=column):
+            numbered = 0
+            for id_, customer_id, name in rows:
+                prefix = name[:2].upper() if name else 'XX'
+                earlier = conn.execute(db.text(f"SELECT count(*) FROM {table} WHERE customer_id = :customer AND id < :id"),
+                                       {'customer': customer_id, 'id': id_}).scalar()
+                # The customer's next number, or the older per-document one if that is taken
+                for candidate in (f"{prefix}{customer_id}{earlier or ''}", f"{prefix}{id_:05d}"):
+                    taken = conn.execute(db.text(f"SELECT 1 FROM {table} WHERE {column} = :number"),
+                                         {'number': candidate}).first()
+                    if len(candidate) <= 20 and not taken:
+                        conn.execute(db.text(f"UPDATE {table} SET {column} = :number, updated_at = :now WHERE id = :id"),
+                                     {'number': candidate, 'now': step.now, 'id': id_})
+                        numbered += 1
+                        break
+            return numbered
+
+        changed += step.in_chunks(
+            table, number, select=f"{table}.id, {table}.customer_id, customers.name",
+            join=f"LEFT JOIN customers ON customers.identification_number = {table}.customer_id",
+            where=f"{table}.{column} IS NULL AND {table}.customer_id IS NOT NULL")
+    return changed
+
+
+@migration(7, 'fifo-valuation')
+def _fifo_valuation(step):
+    """Give snapshots their FIFO layers and drop the rollup months costed at selling price.
+
+    Snapshots stored without layers (the earliest ones valued at each row's
+    unit cost) cannot be carried on from, so they are dropped; take_snapshots
+    and closing_positions write them again when they are next needed. Stored
+    rollup months hold COGS at selling price, so they are deleted in chunks;
+    the `maintenance.py financial-summary` step that follows stores every
+    month that has no rollup row again, at FIFO cost.
+    """
+    added = step.add_columns([('stock_snapshots', 'layers', 'TEXT')])
+    summary = {'columns': added, 'snapshots_dropped': 0, 'months_dropped': 0}
+    if step.columns('stock_snapshots') is not None:
+        with step.bind.begin() as conn:
+            summary['snapshots_dropped'] = conn.execute(db.text(
+                "DELETE FROM stock_snapshots WHERE layers IS NULL")).rowcount
+    if step.columns('monthly_financial_summary') is not None:
+        def drop(conn, rows):
+            statement = db.text("DELETE FROM monthly_financial_summary WHERE id IN :ids").bindparams(
+                db.bindparam('ids', expanding=True))
+            return conn.execute(statement, {'ids': [row[0] for row in rows]}).rowcount
+        summary['months_dropped'] = step.in_chunks('monthly_financial_summary', drop)
+    print(f"  {summary['snapshots_dropped']} snapshots dropped, {summary['months_dropped']} rollup months dropped")
+    return summary
+
+
+@migration(8, 'customer-primary-key')
+def _customer_primary_key(step):
+    """Rebuild customers keyed by identification_number, which the other tables now point at.
+
+    Older databases still have the integer customers.id as primary key and
+    nothing stopping two customers sharing an identification number. The rows
+    are copied in chunks into CUSTOMERS_NEW, which is then swapped in; an
+    interrupted copy resumes after the last id done. Duplicate or missing
+    identification numbers stop the migration, since there is no safe way to
+    pick which customer the documents belong to.
+
+    On PostgreSQL dropping the old table takes the foreign keys pointing at it
+    along (CASCADE), so they are declared again against identification_number
+    in the same transaction as the swap. SQLite keeps the references declared
+    by migration 3, which name the table rather than point at it.
+    """
+    customers = step.columns('customers')
+    if not customers or 'id' not in customers:
+        return 0
+    with step.bind.connect() as conn:
+        duplicates = conn.execute(db.text(
+            "SELECT identification_number FROM customers GROUP BY identification_number HAVING count(*) > 1 "
+            "UNION ALL SELECT NULL FROM customers WHERE identification_number IS NULL OR identification_number = '' "
+            "LIMIT 10")).fetchall()
+    if duplicates:
+        numbers = ', '.join(repr(number) for (number,) in duplicates)
+        raise RuntimeError(f"customers.identification_number must be unique and set before it becomes the primary "
+                           f"key; fix these customers first: {numbers}")
+
+    CUSTOMERS_NEW.create(step.bind, checkfirst=True)
+    copied = [column.name for column in CUSTOMERS_NEW.columns
+              if column.name in customers and column.name != 'updated_at']
+    values = ', '.join(f"COALESCE(:{c}, '')" if c == 'name' else f":{c}" for c in copied)
+    insert = db.text(f"INSERT INTO customers_new ({', '.join(copied)}, updated_at) VALUES ({values}, :now)")
+
+    def copy(conn, rows):
+        conn.execute(insert, [dict(zip(copied, row[1:]), now=step.now) for row in rows])
+        return len(rows)
+
+    changed = step.in_chunks('customers', copy, select=', '.join(['id'] + copied))
+    postgres = step.bind.dialect.name == 'postgresql'
+    referencing = [table for table in CUSTOMER_REFERENCES if 'customer_id' in (step.columns(table) or {})]
+    with step.bind.begin() as conn:
+        conn.execute(db.text(f"DROP TABLE customers{' CASCADE' if postgres else ''}"))
+        conn.execute(db.text("ALTER TABLE customers_new RENAME TO customers"))
+        if postgres:
+            for table in referencing:
+                conn.execute(db.text(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {table}_customer_id_fkey "
+                    f"FOREIGN KEY (customer_id) REFERENCES customers (identification_number)"))
+    print("  customers rebuilt with identification_number as primary key")
+    return changed
+
+
+def recorded(bind=None):
+    """{version: schema_version row} for every migration started on the database"""
+    bind = bind or engine
+    SCHEMA_VERSION.create(bind, checkfirst=True)
+    with bind.connect() as conn:
+        return {row.version: row for row in conn.execute(db.select(SCHEMA_VERSION))}
+
+
+def migrate(bind=None, target=None, chunk_size=None):
+    """Apply the pending migrations up to version target (all by default), in order; returns {name: summary}"""
+    bind = bind or engine
+    rows = recorded(bind)
+    results = {}
+    for version in sorted(MIGRATIONS):
+        if target is not None and version > target:
+            break
+        row = rows.get(version)
+        if row is not None and row.applied_at is not None:
+            continue
+        name, fn = MIGRATIONS[version]
+        progress = json.loads(row.progress) if row is not None and row.progress else {}
+        print(f"Migration {version} {name}" + (" (resuming)" if progress else ""))
+        started = time.perf_counter()
+        if row is None:
+            with bind.begin() as conn:
+                conn.execute(SCHEMA_VERSION.insert().values(version=version, name=name, started_at=datetime.utcnow()))
+        results[name] = fn(Step(bind, version, chunk_size or CHUNK_SIZE, progress))
+        seconds = time.perf_counter() - started
+        with bind.begin() as conn:
+            conn.execute(SCHEMA_VERSION.update().where(SCHEMA_VERSION.c.version == version)
+                         .values(applied_at=datetime.utcnow(), seconds=seconds))
+        print(f"Migration {version} {name} applied in {seconds:.2f}s")
+    return results
+
+
+def status(bind=None):
+    """Print every migration and when it was applied; returns the versions still pending"""
+    rows = recorded(bind)
+    pending = []
+    for version in sorted(MIGRATIONS):
+        row = rows.get(version)
+        if row is not None and row.applied_at is not None:
+            state = f"applied {row.applied_at:%Y-%m-%d %H:%M} in {row.seconds:.2f}s"
+        else:
+            state = f"interrupted at {row.progress}" if row is not None and row.progress else "pending"
+            pending.append(version)
+        print(f"{version:4d}  {MIGRATIONS[version][0]:<24} {state}")
+    return pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply versioned schema and data migrations')
+    parser.add_argument('command', nargs='?', default='migrate', choices=['status', 'migrate'])
+    parser.add_argument('--to', type=int, help='stop after this version')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--url', help='database to migrate (default: DATABASE_URL)')
+    args = parser.parse_args()
+
+    from maintenance import maintenance_lock
+    bind = db.create_engine(_normalise_url(args.url)) if args.url else engine
+    print(f"Migrations for {(args.url or database_url).split('@')[-1]}")
+    if args.command == 'status':
+        status(bind)
+        return
+    started = time.perf_counter()
+    with maintenance_lock(bind):
+        applied = migrate(bind, args.to, args.chunk_size)
+    print(f"{len(applied)} migrations applied in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
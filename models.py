@@ -1,5 +1,6 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Enum, UniqueConstraint, Text, Index
+from sqlalchemy import event, select
+from sqlalchemy.orm import relationship, joinedload, Session
 from database import Base
 import enum
 from datetime import datetime
@@ -88,7 +89,12 @@ class LocationCategory(enum.Enum):
     OFFICE = "OFFICE"
     OTHER = "OTHER"
 
-class Supplier(Base):
+class ChangeTracked:
+    # Set on insert and by every ORM update (query().update() too); sync_to_render.py
+    # sends only the rows changed since its last run
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class Supplier(ChangeTracked, Base):
     __tablename__ = 'suppliers'
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -101,8 +107,9 @@ class Supplier(Base):
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class Customer(Base):
+class Customer(ChangeTracked, Base):
     __tablename__ = 'customers'
+    __table_args__ = (Index('ix_customers_name_identification_number', 'name', 'identification_number'),)
     identification_number = Column(String(50), primary_key=True)
     name = Column(String(100), nullable=False)
     surname = Column(String(100))
@@ -112,8 +119,9 @@ class Customer(Base):
     email = Column(String(100))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class Inventory(Base):
+class Inventory(ChangeTracked, Base):
     __tablename__ = 'inventory'
+    __table_args__ = (Index('ix_inventory_name_id', 'name', 'id'),)
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     brand = Column(String(50))
@@ -129,7 +137,7 @@ class Inventory(Base):
     date_created = Column(DateTime, default=datetime.utcnow)
     date_updated = Column(DateTime, onupdate=datetime.utcnow)
 
-class ActivityType(Base):
+class ActivityType(ChangeTracked, Base):
     __tablename__ = 'activity_types'
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -137,7 +145,7 @@ class ActivityType(Base):
     is_active = Column(Boolean, default=True)
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class Activity(Base):
+class Activity(ChangeTracked, Base):
     __tablename__ = 'activities'
     id = Column(Integer, primary_key=True)
     customer_id = Column(String(50), ForeignKey('customers.identification_number'))
@@ -158,7 +166,7 @@ class Activity(Base):
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class quotation(Base):
+class quotation(ChangeTracked, Base):
     __tablename__ = 'quotations'
     id = Column(Integer, primary_key=True)
     customer_id = Column(String(50), ForeignKey('customers.identification_number'))
@@ -173,8 +181,9 @@ class quotation(Base):
     quotation_number = Column(String(20), unique=True, nullable=True)
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class quotationItem(Base):
+class quotationItem(ChangeTracked, Base):
     __tablename__ = 'quotation_items'
+    __table_args__ = (Index('ix_quotation_items_quotation_id', 'quotation_id'),)
     id = Column(Integer, primary_key=True)
     quotation_id = Column(Integer, ForeignKey('quotations.id'))
     quotation = relationship('quotation', backref='items')
@@ -185,8 +194,12 @@ class quotationItem(Base):
     description = Column(String(200))
     item_code = Column(String(50))  # For custom item codes or inventory reference
 
-class StockTransaction(Base):
+class StockTransaction(ChangeTracked, Base):
     __tablename__ = 'stock_transactions'
+    __table_args__ = (
+        Index('ix_stock_transactions_inventory_id_date_created', 'inventory_id', 'date_created'),
+        Index('ix_stock_transactions_date_created', 'date_created'),
+    )
     id = Column(Integer, primary_key=True)
     inventory_id = Column(Integer, ForeignKey('inventory.id'))
     inventory = relationship('Inventory')
@@ -194,6 +207,7 @@ class StockTransaction(Base):
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float)
     total_value = Column(Float)
+    unit_cost = Column(Float)  # Cost basis per unit when the movement was recorded, for stock valuation
     currency = Column(Enum(Currency), default=Currency.USD)
     reason = Column(Enum(StockChangeReason))
     reference_id = Column(Integer)
@@ -203,8 +217,30 @@ class StockTransaction(Base):
     created_by = Column(String(100))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class FinancialRecord(Base):
+# Per-item stock position at the start of a period, summed from the ledger
+# (stock_transactions) so point-in-time queries only replay rows after it
+class StockSnapshot(ChangeTracked, Base):
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (
+        UniqueConstraint('inventory_id', 'as_of', name='uq_stock_snapshots_inventory_as_of'),
+        Index('ix_stock_snapshots_as_of', 'as_of'),
+    )
+    id = Column(Integer, primary_key=True)
+    inventory_id = Column(Integer, ForeignKey('inventory.id'), nullable=False)
+    as_of = Column(DateTime, nullable=False)  # Covers ledger rows dated before this instant
+    quantity = Column(Integer, nullable=False)
+    value = Column(Float, nullable=False)
+    layers = Column(Text)  # JSON [[quantity, unit_cost], ...] of the FIFO layers on hand, oldest first
+    date_created = Column(DateTime, default=datetime.utcnow)
+
+class FinancialRecord(ChangeTracked, Base):
     __tablename__ = 'financial_records'
+    __table_args__ = (
+        # Equality on type, then the date range, as compute_month filters them
+        Index('ix_financial_records_type_date', 'type', 'date'),
+        Index('ix_financial_records_date', 'date'),
+        Index('ix_financial_records_category', 'category'),
+    )
     id = Column(Integer, primary_key=True)
     type = Column(Enum(FinancialType), nullable=False)
     category = Column(String(100))
@@ -217,7 +253,7 @@ class FinancialRecord(Base):
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class FinancialCategory(Base):
+class FinancialCategory(ChangeTracked, Base):
     __tablename__ = 'financial_categories'
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -226,7 +262,7 @@ class FinancialCategory(Base):
     is_active = Column(Boolean, default=True)
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class CustomField(Base):
+class CustomField(ChangeTracked, Base):
     __tablename__ = 'custom_fields'
     id = Column(Integer, primary_key=True)
     entity_type = Column(String(50), nullable=False)
@@ -236,7 +272,7 @@ class CustomField(Base):
     field_type = Column(String(50), default='text')
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class FuelRecord(Base):
+class FuelRecord(ChangeTracked, Base):
     __tablename__ = 'fuel_records'
     id = Column(Integer, primary_key=True)
     journey_id = Column(Integer, ForeignKey('journey_records.id'))
@@ -251,7 +287,7 @@ class FuelRecord(Base):
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class MileageRecord(Base):
+class MileageRecord(ChangeTracked, Base):
     __tablename__ = 'mileage_records'
     id = Column(Integer, primary_key=True)
     journey_id = Column(Integer, ForeignKey('journey_records.id'))
@@ -266,8 +302,9 @@ class MileageRecord(Base):
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class JourneyRecord(Base):
+class JourneyRecord(ChangeTracked, Base):
     __tablename__ = 'journey_records'
+    __table_args__ = (Index('ix_journey_records_start_time_id', 'start_time', 'id'),)
     id = Column(Integer, primary_key=True)
     activity_id = Column(Integer, ForeignKey('activities.id'))
     activity = relationship('Activity')
@@ -284,7 +321,7 @@ class JourneyRecord(Base):
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class Location(Base):
+class Location(ChangeTracked, Base):
     __tablename__ = 'locations'
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -297,7 +334,7 @@ class Location(Base):
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class Pricing(Base):
+class Pricing(ChangeTracked, Base):
     __tablename__ = 'pricing'
     id = Column(Integer, primary_key=True)
     item_type = Column(String(50), nullable=False)
@@ -310,8 +347,14 @@ class Pricing(Base):
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class Invoice(Base):
+class Invoice(ChangeTracked, Base):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        Index('ix_invoices_date_created_id', 'date_created', 'id'),
+        Index('ix_invoices_customer_id', 'customer_id'),
+        Index('ix_invoices_activity_type_id', 'activity_type_id'),
+        Index('ix_invoices_status', 'status'),
+    )
     id = Column(Integer, primary_key=True)
     customer_id = Column(String(50), ForeignKey('customers.identification_number'))
     customer = relationship('Customer')
@@ -328,8 +371,9 @@ class Invoice(Base):
     invoice_number = Column(String(20), unique=True, nullable=True)
     date_created = Column(DateTime, default=datetime.utcnow)
 
-class InvoiceItem(Base):
+class InvoiceItem(ChangeTracked, Base):
     __tablename__ = 'invoice_items'
+    __table_args__ = (Index('ix_invoice_items_invoice_id', 'invoice_id'),)
     id = Column(Integer, primary_key=True)
     invoice_id = Column(Integer, ForeignKey('invoices.id'))
     invoice = relationship('Invoice', backref='items')
@@ -342,8 +386,12 @@ class InvoiceItem(Base):
     cost_price = Column(Float, default=0.0)
     amount = Column(Float, nullable=False)
 
-class Payment(Base):
+class Payment(ChangeTracked, Base):
     __tablename__ = 'payments'
+    __table_args__ = (
+        Index('ix_payments_invoice_id', 'invoice_id'),
+        Index('ix_payments_payment_date_id', 'payment_date', 'id'),
+    )
     id = Column(Integer, primary_key=True)
     invoice_id = Column(Integer, ForeignKey('invoices.id'))
     invoice = relationship('Invoice', backref='payments')
@@ -356,3 +404,116 @@ class Payment(Base):
     reference_number = Column(String(100))
     notes = Column(String(500))
     date_created = Column(DateTime, default=datetime.utcnow)
+
+# Rollup tables maintained by reports.refresh_financial_summary()
+class MonthlyFinancialSummary(ChangeTracked, Base):
+    __tablename__ = 'monthly_financial_summary'
+    __table_args__ = (UniqueConstraint('year', 'month', name='uq_monthly_financial_summary_period'),)
+    id = Column(Integer, primary_key=True)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    revenue = Column(Float, default=0.0)  # Invoiced, excluding cancelled invoices
+    stock_revenue = Column(Float, default=0.0)
+    service_revenue = Column(Float, default=0.0)
+    payments_received = Column(Float, default=0.0)
+    income_records = Column(Float, default=0.0)  # All INCOME financial records
+    other_income = Column(Float, default=0.0)  # Categorised INCOME records outside 'Sales'
+    expenses = Column(Float, default=0.0)
+    cogs = Column(Float, default=0.0)  # FIFO cost of stock sold (valuation.cost_of_sales)
+    date_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MonthlyExpenseSummary(ChangeTracked, Base):
+    __tablename__ = 'monthly_expense_summary'
+    __table_args__ = (UniqueConstraint('year', 'month', 'category', name='uq_monthly_expense_summary_category'),)
+    id = Column(Integer, primary_key=True)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    category = Column(String(100))
+    amount = Column(Float, default=0.0)
+
+class JobStatus(enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+# Background work queue processed by `python jobs.py worker`
+class Job(ChangeTracked, Base):
+    __tablename__ = 'jobs'
+    __table_args__ = (Index('ix_jobs_status_run_after', 'status', 'run_after'),)
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text)  # JSON arguments for the handler
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow)  # Not picked up before this time (retry backoff)
+    locked_by = Column(String(100))
+    locked_at = Column(DateTime)
+    result = Column(Text)  # JSON returned by the handler
+    error = Column(Text)
+    date_created = Column(DateTime, default=datetime.utcnow)
+    date_finished = Column(DateTime)
+
+# Tables copied by sync_to_render.py; rollups, snapshots and jobs are rebuilt on the target
+SYNCED_TABLES = (
+    'suppliers', 'customers', 'inventory', 'activity_types', 'financial_categories', 'pricing', 'locations',
+    'quotations', 'invoices', 'activities', 'quotation_items', 'invoice_items', 'payments', 'stock_transactions',
+    'financial_records', 'journey_records', 'fuel_records', 'mileage_records', 'custom_fields',
+)
+
+# A deleted row of a synced table, so the delta sync can delete it on the target too
+class SyncTombstone(Base):
+    __tablename__ = 'sync_tombstones'
+    __table_args__ = (Index('ix_sync_tombstones_table_name_deleted_at', 'table_name', 'deleted_at'),)
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String(50), nullable=False)
+    row_key = Column(String(50), nullable=False)  # Primary key of the deleted row, as text
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+def _add_tombstones(session, table_name, keys):
+    now = datetime.utcnow()
+    rows = [{'table_name': table_name, 'row_key': str(key), 'deleted_at': now} for key in keys]
+    if rows:
+        session.connection().execute(SyncTombstone.__table__.insert(), rows)
+
+@event.listens_for(Session, 'after_flush')
+def _tombstone_deleted_objects(session, flush_context):
+    deleted = {}
+    for obj in session.deleted:
+        if obj.__table__.name in SYNCED_TABLES:
+            deleted.setdefault(obj.__table__.name, []).append(obj.__mapper__.primary_key_from_instance(obj)[0])
+    for table_name, keys in deleted.items():
+        _add_tombstones(session, table_name, keys)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _tombstone_bulk_deletes(orm_execute_state):
+    # query(...).delete() never loads the rows, so read their keys before they go
+    if not orm_execute_state.is_delete or orm_execute_state.bind_mapper is None:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper.local_table.name not in SYNCED_TABLES:
+        return
+    keys = select(mapper.primary_key[0])
+    if orm_execute_state.statement.whereclause is not None:
+        keys = keys.where(orm_execute_state.statement.whereclause)
+    _add_tombstones(orm_execute_state.session, mapper.local_table.name,
+                    orm_execute_state.session.execute(keys).scalars().all())
+
+# Eager-loading policy for list views, keyed by route endpoint. Every relationship
+# a list template dereferences per row is loaded up front so each page renders in
+# a constant number of queries instead of one lazy SELECT per row. The options are
+# built per call because creating them configures every mapper, which would
+# otherwise happen at import time and slow down worker boot.
+LIST_LOADER_OPTIONS = {
+    'invoices': lambda: (joinedload(Invoice.customer),),
+    'quotations': lambda: (joinedload(quotation.customer),),
+    'payments': lambda: (joinedload(Payment.invoice).joinedload(Invoice.customer),),
+    'inventory': lambda: (joinedload(Inventory.supplier),),
+    'activities': lambda: (joinedload(Activity.customer), joinedload(Activity.activity_type)),
+}
+
+def list_loader_options(endpoint):
+    """Loader options for the list view rendered by the given endpoint"""
+    build = LIST_LOADER_OPTIONS.get(endpoint)
+    return build() if build else ()
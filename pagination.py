@@ -0,0 +1,158 @@
+import json
+import base64
+from datetime import datetime
+import sqlalchemy as db
+from flask import request, url_for
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value, key):
+    """Serialize a (sort value, primary key) position into an opaque URL-safe token"""
+    payload = json.dumps([sort_value.isoformat() if sort_value else None, key])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; returns None for missing or malformed tokens"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_value, key = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return (datetime.fromisoformat(sort_value) if sort_value else None), key
+    except (ValueError, TypeError):
+        return None
+
+
+def page_size(args):
+    """Requested page size clamped to [1, MAX_PAGE_SIZE]"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+class Page:
+    """One page of keyset-paginated rows plus the cursors to move around it"""
+
+    def __init__(self, items, next_cursor, prev_cursor, limit, args):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.limit = limit
+        self.args = {k: v for k, v in args.items() if k not in ('after', 'before')}
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def url(self, **cursor):
+        return url_for(request.endpoint, **request.view_args, **self.args, **cursor)
+
+    @property
+    def next_url(self):
+        return self.url(after=self.next_cursor) if self.has_next else None
+
+    @property
+    def prev_url(self):
+        return self.url(before=self.prev_cursor) if self.has_prev else None
+
+    @property
+    def first_url(self):
+        return self.url()
+
+
+def keyset_paginate(query, sort_column, key_column, args=None):
+    """Page through query newest-first using a seek on (sort_column, key_column).
+
+    Rows are ordered by sort_column descending (NULLs last) with key_column as a
+    tie-breaker, so ordering is stable and each page costs one indexed range
+    scan of limit + 1 rows no matter how deep the user has paged. The cursor
+    is read from the ``after`` (older rows) or ``before`` (newer rows) query
+    parameter and the page size from ``limit``.
+    """
+    args = request.args if args is None else args
+    limit = page_size(args)
+    after = decode_cursor(args.get('after'))
+    before = decode_cursor(args.get('before')) if not after else None
+
+    if before:
+        value, key = before
+        if value is None:
+            query = query.filter(db.or_(sort_column.isnot(None),
+                                        db.and_(sort_column.is_(None), key_column > key)))
+        else:
+            query = query.filter(db.or_(sort_column > value,
+                                        db.and_(sort_column == value, key_column > key)))
+        query = query.order_by(sort_column.asc().nulls_first(), key_column.asc())
+    else:
+        if after:
+            value, key = after
+            if value is None:
+                query = query.filter(db.and_(sort_column.is_(None), key_column < key))
+            else:
+                query = query.filter(db.or_(sort_column < value,
+                                            db.and_(sort_column == value, key_column < key),
+                                            sort_column.is_(None)))
+        query = query.order_by(sort_column.desc().nulls_last(), key_column.desc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+
+    sort_attr, key_attr = sort_column.key, key_column.key
+    first_cursor = encode_cursor(getattr(rows[0], sort_attr), getattr(rows[0], key_attr)) if rows else None
+    last_cursor = encode_cursor(getattr(rows[-1], sort_attr), getattr(rows[-1], key_attr)) if rows else None
+
+    if before:
+        next_cursor = last_cursor
+        prev_cursor = first_cursor if has_more else None
+    else:
+        next_cursor = last_cursor if has_more else None
+        prev_cursor = first_cursor if after else None
+
+    return Page(rows, next_cursor, prev_cursor, limit, args)
+
+
+def seek_page(query, sort_column, key_column, args, limit):
+    """One page of query in ascending (sort_column, key_column) order, for the JSON lookups.
+
+    Returns (rows, next_cursor); the client passes next_cursor back as ``after``.
+    With an index on (sort_column, key_column) every page is one index range
+    scan, however far the client has paged.
+    """
+    after = decode_cursor_values(args.get('after'))
+    if after:
+        query = query.filter(db.tuple_(sort_column, key_column) > tuple(after))
+    rows = query.order_by(sort_column, key_column).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor_values(getattr(last, sort_column.key), getattr(last, key_column.key))
+    return rows[:limit], next_cursor
+
+
+def encode_cursor_values(*values):
+    """Opaque token for a position given by plain JSON values (names, ids)"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor_values(token):
+    """Inverse of encode_cursor_values; None for missing or malformed tokens"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return values if isinstance(values, list) and len(values) == 2 else None
+    except ValueError:
+        return None
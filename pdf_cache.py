@@ -0,0 +1,99 @@
+"""Disk cache for rendered quotation, invoice and payment receipt PDFs.
+
+Entries are named <doc_type>-<doc_id>-<fingerprint>.pdf, where the fingerprint
+hashes everything the document shows, so a changed document can never be served
+from a stale entry. The fingerprint doubles as the HTTP ETag. The directory is
+kept under PDF_CACHE_MAX_BYTES by evicting the least recently used files, and
+the write routes drop a document's entries as soon as it changes.
+"""
+import os
+import glob
+import hashlib
+import tempfile
+import threading
+
+from flask import current_app, request, send_file
+
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'instance', 'pdf_cache')
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+_lock = threading.Lock()
+
+
+def fingerprint(doc_type, *parts):
+    """Stable hash of the values a document is rendered from"""
+    import pdf_engine
+    digest = hashlib.sha256(f"{pdf_engine.TEMPLATE_VERSION}|{doc_type}".encode())
+    for part in parts:
+        digest.update(b'\x1f')
+        digest.update(repr(part).encode())
+    return digest.hexdigest()[:32]
+
+
+def entry_path(doc_type, doc_id, etag):
+    return os.path.join(PDF_CACHE_DIR, f"{doc_type}-{doc_id}-{etag}.pdf")
+
+
+def get_or_render(doc_type, doc_id, etag, render):
+    """Path of the cached PDF for etag, calling render() to produce it on a miss"""
+    path = entry_path(doc_type, doc_id, etag)
+    try:
+        os.utime(path)  # mark as recently used
+        return path
+    except FileNotFoundError:
+        pass
+
+    pdf = render()
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp_path, path)
+    evict()
+    return path
+
+
+def send_cached(document, render):
+    """Respond with the cached PDF for document, or 304 when the client already has this version"""
+    if request.if_none_match.contains(document.etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(document.etag)
+        return response
+    path = get_or_render(document.doc_type, document.doc_id, document.etag, lambda: render(document))
+    return send_file(path, as_attachment=True, download_name=document.filename, mimetype='application/pdf',
+                     etag=document.etag, conditional=True)
+
+
+def invalidate(doc_type, *doc_ids):
+    """Remove every cached version of the given documents"""
+    for doc_id in doc_ids:
+        if doc_id is None:
+            continue
+        for path in glob.glob(os.path.join(PDF_CACHE_DIR, f"{doc_type}-{doc_id}-*.pdf")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    max_bytes = PDF_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _lock:
+        entries = []
+        for path in glob.glob(os.path.join(PDF_CACHE_DIR, '*.pdf')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,362 @@
+"""Shared ReportLab engine for the quotation, invoice and payment receipt PDFs.
+
+Stylesheets, the decoded logo and the company header are built once and reused;
+each render call only lays out the per-document content. The render functions
+take plain objects and return PDF bytes, so they work outside a Flask request.
+"""
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Flowable, HRFlowable
+
+# Bump when the layout changes so cached PDFs (see pdf_cache) are rendered again
+TEMPLATE_VERSION = 1
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images', 'logo.png')
+LOGO_SIZE = 1.2 * inch
+# The logo is resampled to this resolution once; None embeds the original file
+LOGO_DPI = 300
+
+COMPANY_NAME = '<b>GieBee Engineering (Pvt) Ltd</b>'
+CONTACT_TEXT = """
+    <b>+263 774 040 059</b><br/>
+    <b>+263 717 039 984</b><br/>
+    <b>giebeeengineering@gmail.com</b>
+    """
+ADDRESS_TEXT = """
+    <b>108 Central Avenue</b><br/>
+    <b>Room 8, 1st Floor</b><br/>
+    <b>Harare, Zimbabwe</b>
+    """
+BANKING_INFO = """
+    Giebee Engineering Pvt Ltd<br/>
+    Bank Transfer: ZB Bank<br/>
+    FCA: 411800483226405<br/>
+    Branch: Chisipite<br/>
+    """
+
+QUOTATION_COL_WIDTHS = [0.4*inch, 1*inch, 3.1*inch, 0.7*inch, 1*inch, 1.3*inch]
+INVOICE_COL_WIDTHS = [0.4*inch, 1.2*inch, 2.9*inch, 0.7*inch, 1*inch, 1.3*inch]
+ITEM_HEADINGS = ['Sr', 'Item Code', 'Description', 'Quantity', 'Price', 'Total Amount']
+
+HEADER_TABLE_STYLE = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('SPAN', (0, 0), (0, 1)),  # Span logo over two rows
+    ('SPAN', (1, 0), (2, 0)),  # Span company name over two columns
+    ('ALIGN', (2, 1), (2, 1), 'RIGHT'),
+])
+
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('TOPPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+])
+
+QUOTATION_TOTAL_STYLE = TableStyle([
+    ('ALIGN', (5, 0), (5, 0), 'RIGHT'),
+    ('FONTNAME', (5, 0), (5, 0), 'Helvetica-Bold'),
+])
+
+INVOICE_TOTAL_STYLE = TableStyle([
+    ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (4, 0), (-1, -1), 'Helvetica-Bold'),
+    ('LINEABOVE', (4, 2), (-1, 2), 1, colors.black),  # Line above Balance
+])
+
+AMOUNT_BOX_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 14),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('TOPPADDING', (0, 0), (-1, -1), 12),
+    ('BOX', (0, 0), (-1, -1), 1, colors.black),
+])
+
+# Write image and page streams as plain Flate instead of ASCII85-wrapped Flate.
+# The wrapper only makes the file 7-bit clean, and without the rl_accel extension
+# it is encoded in pure Python, which dominated render time for the logo.
+# ReportLab only has a process-wide switch for this, so it is flipped for the
+# duration of our own builds and restored afterwards (see _plain_streams).
+PLAIN_STREAMS = True
+
+_lock = threading.Lock()
+_streams_lock = threading.Lock()
+_streams = {'builds': 0, 'saved': None}
+_assets = {}
+# Flowables keep drawing state on themselves while a page is built, so the
+# prebuilt header is shared between documents of the same thread only
+_local = threading.local()
+
+
+class DecodedImage(Flowable):
+    """Draws an already decoded ImageReader, scaled to fit width x height, through the canvas API"""
+
+    def __init__(self, reader, width, height):
+        super().__init__()
+        self.hAlign = 'CENTER'
+        self.reader = reader
+        image_width, image_height = reader.getSize()
+        scale = min(width / image_width, height / image_height)
+        self.width, self.height = image_width * scale, image_height * scale
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.width, self.height, mask='auto')
+
+
+@contextmanager
+def _plain_streams():
+    """Turn ReportLab's ASCII85 stream wrapping off while any of our documents is being built"""
+    if not PLAIN_STREAMS:
+        yield
+        return
+    with _streams_lock:
+        if _streams['builds'] == 0:
+            _streams['saved'] = rl_config.useA85
+            rl_config.useA85 = 0
+        _streams['builds'] += 1
+    try:
+        yield
+    finally:
+        with _streams_lock:
+            _streams['builds'] -= 1
+            if _streams['builds'] == 0:
+                rl_config.useA85 = _streams['saved']
+
+
+def _build_styles():
+    base = getSampleStyleSheet()
+    return {
+        'normal': base['Normal'],
+        'company_name': ParagraphStyle('company_name_style', parent=base['h1'], fontSize=22,
+                                       textColor=colors.red, alignment=0, leading=26),
+        'contact_info': ParagraphStyle('contact_info_style', parent=base['Normal'], fontSize=9, leading=11),
+        'address': ParagraphStyle('address_style', parent=base['Normal'], fontSize=9, leading=11, alignment=2),
+        'title': ParagraphStyle('title_style', parent=base['h2'], fontSize=16, alignment=0, spaceAfter=8),
+        'customer_date': ParagraphStyle('customer_date_style', parent=base['Normal'], fontSize=12,
+                                        alignment=0, spaceAfter=10),
+        'details': ParagraphStyle('details_style', parent=base['Normal'], fontSize=12, alignment=0,
+                                  spaceAfter=10, leading=16),
+        'banking_details': ParagraphStyle('banking_details_style', parent=base['Normal'], spaceBefore=20,
+                                          fontSize=10),
+    }
+
+
+def _load_logo():
+    if LOGO_DPI is None:
+        return ImageReader(LOGO_PATH)
+    from PIL import Image as PILImage
+    image = PILImage.open(LOGO_PATH)
+    image.load()
+    side = int(LOGO_SIZE / inch * LOGO_DPI)
+    if max(image.size) > side:
+        image.thumbnail((side, side), PILImage.LANCZOS)
+    return ImageReader(image)
+
+
+def _asset(name, factory):
+    value = _assets.get(name)
+    if value is None:
+        with _lock:
+            value = _assets.get(name)
+            if value is None:
+                value = _assets[name] = factory()
+    return value
+
+
+def get_styles():
+    """Paragraph styles shared by every document"""
+    return _asset('styles', _build_styles)
+
+
+def get_logo():
+    """Decoded (and resampled) company logo"""
+    return _asset('logo', _load_logo)
+
+
+def reset_cache():
+    """Forget the cached assets; the next render in this thread rebuilds them"""
+    with _lock:
+        _assets.clear()
+        _local.__dict__.clear()
+
+
+def _header_flowables():
+    header = getattr(_local, 'header', None)
+    if header is None:
+        styles = get_styles()
+        header_table = Table([
+            [DecodedImage(get_logo(), LOGO_SIZE, LOGO_SIZE), Paragraph(COMPANY_NAME, styles['company_name']), ''],
+            ['', Paragraph(CONTACT_TEXT, styles['contact_info']), Paragraph(ADDRESS_TEXT, styles['address'])]
+        ], colWidths=[1.3*inch, 3.5*inch, 2.7*inch])
+        header_table.setStyle(HEADER_TABLE_STYLE)
+        header = _local.header = [
+            header_table,
+            Spacer(1, 0.1*inch),
+            HRFlowable(width="100%", thickness=1.5, color=colors.red),
+            Spacer(1, 0.2*inch),
+        ]
+    return header
+
+
+def _banking_flowables():
+    banking = getattr(_local, 'banking', None)
+    if banking is None:
+        styles = get_styles()
+        banking = _local.banking = [
+            Paragraph('<b>Banking Details</b>', styles['banking_details']),
+            Paragraph(BANKING_INFO, styles['normal']),
+        ]
+    return banking
+
+
+def _build(story):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch,
+                            leftMargin=0.5*inch, rightMargin=0.5*inch)
+    with _plain_streams():
+        doc.build(story)
+    return buffer.getvalue()
+
+
+def _items_table(rows, col_widths):
+    normal = get_styles()['normal']
+    data = [ITEM_HEADINGS]
+    for i, (item_code, description, quantity, unit_price, amount) in enumerate(rows):
+        data.append([
+            str(i + 1),
+            Paragraph(item_code, normal),
+            Paragraph(description, normal),
+            str(quantity),
+            f"${unit_price:,.2f}",
+            f"${amount:,.2f}"
+        ])
+    table = Table(data, colWidths=col_widths)
+    table.setStyle(ITEMS_TABLE_STYLE)
+    return table
+
+
+def customer_label(customer):
+    return f"{customer.name} {customer.surname or ''}"
+
+
+def safe_filename(text):
+    """Keep letters, digits and spaces, then join words with underscores"""
+    return "".join([c for c in text if c.isalpha() or c.isdigit() or c == ' ']).rstrip().replace(" ", "_")
+
+
+def render_quotation(quotation, rows):
+    """Quotation PDF; rows are (item_code, description, quantity, unit_price, amount)"""
+    styles = get_styles()
+    story = list(_header_flowables())
+    story.append(Paragraph('Quotation', styles['title']))
+    story.append(Paragraph(f'SAL-QTN-2025-{quotation.id:05d}', styles['normal']))
+    story.append(Spacer(1, 0.2*inch))
+
+    story.append(Paragraph(f"<b>Customer:</b> {customer_label(quotation.customer)}", styles['customer_date']))
+    story.append(Paragraph(f"<b>Date:</b> {quotation.date_created.strftime('%d-%m-%Y')}", styles['customer_date']))
+    story.append(Spacer(1, 0.2*inch))
+
+    story.append(_items_table(rows, QUOTATION_COL_WIDTHS))
+    story.append(Spacer(1, 0.2*inch))
+    total_table = Table([['', '', '', '', '', f"Net Price ${quotation.total_amount:,.2f}"]],
+                        colWidths=QUOTATION_COL_WIDTHS)
+    total_table.setStyle(QUOTATION_TOTAL_STYLE)
+    story.append(total_table)
+    story.append(Spacer(1, 0.4*inch))
+
+    story.extend(_banking_flowables())
+    return _build(story)
+
+
+def render_invoice(invoice, rows):
+    """Tax invoice PDF; rows are (item_code, description, quantity, unit_price, amount)"""
+    styles = get_styles()
+    story = list(_header_flowables())
+    story.append(Paragraph('Tax Invoice', styles['title']))
+    story.append(Paragraph(f'INV-{invoice.id:05d}', styles['normal']))
+    story.append(Spacer(1, 0.2*inch))
+
+    story.append(Paragraph(f"<b>Customer:</b> {customer_label(invoice.customer)}", styles['customer_date']))
+    story.append(Paragraph(f"<b>Date:</b> {invoice.date_created.strftime('%d-%m-%Y')}", styles['customer_date']))
+    story.append(Paragraph(f"<b>Status:</b> {invoice.status.value}", styles['customer_date']))
+    story.append(Spacer(1, 0.2*inch))
+
+    story.append(_items_table(rows, INVOICE_COL_WIDTHS))
+    story.append(Spacer(1, 0.2*inch))
+    total_table = Table([
+        ['', '', '', '', 'Total:', f"${invoice.total_amount:,.2f}"],
+        ['', '', '', '', 'Paid:', f"${invoice.paid_amount:,.2f}"],
+        ['', '', '', '', 'Balance:', f"${invoice.balance_due:,.2f}"]
+    ], colWidths=INVOICE_COL_WIDTHS)
+    total_table.setStyle(INVOICE_TOTAL_STYLE)
+    story.append(total_table)
+    story.append(Spacer(1, 0.4*inch))
+
+    story.extend(_banking_flowables())
+    return _build(story)
+
+
+def render_payment(payment):
+    """Payment receipt PDF for a payment with its invoice and customer loaded"""
+    styles = get_styles()
+    details = styles['details']
+    invoice = payment.invoice
+
+    story = list(_header_flowables())
+    story.append(Paragraph('Payment Receipt', styles['title']))
+    story.append(Paragraph(f'RCPT-{payment.id:05d}', styles['normal']))
+    story.append(Spacer(1, 0.2*inch))
+
+    story.append(Paragraph(f"<b>Received From:</b> {customer_label(invoice.customer)}", details))
+    story.append(Paragraph(f"<b>Transaction ID:</b> {payment.transaction_id or 'N/A'}", details))
+    story.append(Paragraph(f"<b>Date:</b> {payment.payment_date.strftime('%d-%m-%Y')}", details))
+    story.append(Paragraph(f"<b>Payment Method:</b> {payment.payment_method.value}", details))
+    if payment.reference_number:
+        story.append(Paragraph(f"<b>Reference:</b> {payment.reference_number}", details))
+    story.append(Spacer(1, 0.2*inch))
+
+    story.append(Paragraph(f"<b>Payment For:</b> Invoice #{invoice.id}", details))
+    if payment.notes:
+        story.append(Paragraph(f"<b>Notes:</b> {payment.notes}", details))
+    story.append(Spacer(1, 0.2*inch))
+
+    amount_table = Table([['Amount Received', f"${payment.amount:,.2f}"]], colWidths=[2*inch, 2*inch])
+    amount_table.setStyle(AMOUNT_BOX_STYLE)
+    story.append(amount_table)
+    story.append(Spacer(1, 0.4*inch))
+    story.append(Paragraph("Thank you for your business!", styles['normal']))
+    return _build(story)
+
+
+RENDERERS = {
+    'quotation': render_quotation,
+    'invoice': render_invoice,
+    'payment': lambda payment, rows=None: render_payment(payment),
+}
+
+
+def render(doc_type, header, rows=None):
+    """Dispatch to the renderer for doc_type"""
+    return RENDERERS[doc_type](header, rows)
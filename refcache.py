@@ -0,0 +1,207 @@
+"""Reference-data cache for the dropdowns rendered by the form routes.
+
+Each namespace (customers, suppliers, ...) has a version stamp held by the
+backend. Readers look up the current stamp and reuse the value cached under
+(namespace, stamp); writers bump the stamp after committing, which makes every
+worker sharing the backend reload on its next read.
+
+Backends are chosen with REFERENCE_CACHE_URL:
+    unset / memory://     in-process LRU (single worker only)
+    sqlite:///path/file   SQLite file shared by all workers on the host
+    redis://host:port/db  Redis (requires the redis package)
+"""
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from sqlalchemy import inspect
+
+from models import Customer, Supplier, ActivityType, FinancialCategory, Inventory
+
+LOCAL_CACHE_SIZE = 64
+
+
+class Snapshot(SimpleNamespace):
+    """Detached, picklable copy of a row's column values"""
+
+
+def snapshot(row):
+    return Snapshot(**{attr.key: getattr(row, attr.key) for attr in inspect(row).mapper.column_attrs})
+
+
+class LRUBackend:
+    """In-process backend; versions are only coherent within one process"""
+
+    def __init__(self, size=LOCAL_CACHE_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self.versions = {}
+        self.values = OrderedDict()
+
+    def get_version(self, namespace):
+        with self.lock:
+            return self.versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+    def get_value(self, key):
+        with self.lock:
+            if key in self.values:
+                self.values.move_to_end(key)
+                return self.values[key]
+        return None
+
+    def set_value(self, key, value):
+        with self.lock:
+            self.values[key] = value
+            self.values.move_to_end(key)
+            while len(self.values) > self.size:
+                self.values.popitem(last=False)
+
+
+class SQLiteBackend:
+    """Versions and pickled values in a SQLite file shared between workers"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS versions (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS entries (namespace TEXT, version INTEGER, value BLOB, "
+                     "PRIMARY KEY (namespace, version))")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def get_version(self, namespace):
+        row = self._conn().execute("SELECT version FROM versions WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, namespace):
+        conn = self._conn()
+        conn.execute("INSERT INTO versions (namespace, version) VALUES (?, 1) "
+                     "ON CONFLICT(namespace) DO UPDATE SET version = version + 1", (namespace,))
+        # Older versions can never be read again
+        conn.execute("DELETE FROM entries WHERE namespace = ? AND version < "
+                     "(SELECT version FROM versions WHERE namespace = ?)", (namespace, namespace))
+        conn.commit()
+
+    def get_value(self, key):
+        row = self._conn().execute("SELECT value FROM entries WHERE namespace = ? AND version = ?", key).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set_value(self, key, value):
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO entries (namespace, version, value) VALUES (?, ?, ?)",
+                     key + (pickle.dumps(value),))
+        conn.commit()
+
+
+class RedisBackend:
+    """Versions and pickled values in Redis"""
+
+    def __init__(self, url, ttl=3600):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get_version(self, namespace):
+        return int(self.client.get(f"refcache:version:{namespace}") or 0)
+
+    def bump_version(self, namespace):
+        self.client.incr(f"refcache:version:{namespace}")
+
+    def get_value(self, key):
+        raw = self.client.get(f"refcache:value:{key[0]}:{key[1]}")
+        return pickle.loads(raw) if raw else None
+
+    def set_value(self, key, value):
+        self.client.set(f"refcache:value:{key[0]}:{key[1]}", pickle.dumps(value), ex=self.ttl)
+
+
+def backend_from_url(url):
+    if not url or url.startswith('memory://'):
+        return LRUBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url.replace('sqlite:///', '', 1))
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported REFERENCE_CACHE_URL: {url}")
+
+
+class ReferenceCache:
+    """Version-stamped cache in front of a backend, with a per-process LRU on top"""
+
+    def __init__(self, backend, local_size=LOCAL_CACHE_SIZE):
+        self.backend = backend
+        self.local = backend if isinstance(backend, LRUBackend) else LRUBackend(local_size)
+
+    def get(self, namespace, loader):
+        key = (namespace, self.backend.get_version(namespace))
+        value = self.local.get_value(key)
+        if value is None and self.local is not self.backend:
+            value = self.backend.get_value(key)
+            if value is not None:
+                self.local.set_value(key, value)
+        if value is None:
+            value = loader()
+            # A concurrent bump means this load may predate the write; don't publish it
+            if self.backend.get_version(namespace) == key[1]:
+                self.backend.set_value(key, value)
+                if self.local is not self.backend:
+                    self.local.set_value(key, value)
+        return value
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.bump_version(namespace)
+
+
+cache = ReferenceCache(backend_from_url(os.environ.get('REFERENCE_CACHE_URL')))
+
+
+# Namespaces and their loaders. Values are lists of Snapshot objects so they can
+# be shared across requests, threads and (for shared backends) processes.
+def customers(session):
+    return cache.get('customers', lambda: [snapshot(c) for c in session.query(Customer).all()])
+
+
+def suppliers(session):
+    return cache.get('suppliers', lambda: [snapshot(s) for s in session.query(Supplier).all()])
+
+
+def active_activity_types(session):
+    return cache.get('activity_types', lambda: [
+        snapshot(t) for t in session.query(ActivityType).filter_by(is_active=True).all()
+    ])
+
+
+def financial_categories(session):
+    return cache.get('financial_categories', lambda: [snapshot(c) for c in session.query(FinancialCategory).all()])
+
+
+def inventory(session):
+    return cache.get('inventory', lambda: [snapshot(i) for i in session.query(Inventory).all()])
+
+
+def inventory_categories(session):
+    return {item.category for item in inventory(session) if item.category}
+
+
+def invalidate(*namespaces):
+    """Bump the given namespaces; call after committing a write that changes them"""
+    cache.invalidate(*namespaces)
@@ -0,0 +1,333 @@
+import sys
+import argparse
+from datetime import datetime
+import sqlalchemy as db
+
+from database import is_read_only
+from models import (Invoice, InvoiceItem, FinancialRecord, JourneyRecord, ActivityType, Payment,
+                    StockTransaction, MonthlyFinancialSummary, MonthlyExpenseSummary,
+                    FinancialType, InvoiceStatus)
+
+SUMMARY_FIELDS = ('revenue', 'stock_revenue', 'service_revenue', 'payments_received',
+                  'income_records', 'other_income', 'expenses', 'cogs')
+
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def month_range(year, month):
+    """Return the [start, end) datetimes covering a calendar month"""
+    start_date = datetime(year, month, 1)
+    if month == 12:
+        end_date = datetime(year + 1, 1, 1)
+    else:
+        end_date = datetime(year, month + 1, 1)
+    return start_date, end_date
+
+
+def top_locations(session, limit):
+    """Most visited journey locations as (labels, counts), counted in the database"""
+    location = db.func.coalesce(db.func.nullif(JourneyRecord.end_location, ''), JourneyRecord.start_location)
+    rows = session.query(location, db.func.count(JourneyRecord.id)).filter(
+        location.isnot(None),
+        location != ''
+    ).group_by(location).order_by(db.func.count(JourneyRecord.id).desc()).limit(limit).all()
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+
+def compute_month(session, year, month):
+    """Recompute a month's rollup figures from the source tables.
+
+    Returns (totals, expenses_by_category) where totals is keyed by SUMMARY_FIELDS.
+    """
+    start_date, end_date = month_range(year, month)
+    totals = dict.fromkeys(SUMMARY_FIELDS, 0.0)
+
+    invoice_filter = (
+        Invoice.date_created >= start_date,
+        Invoice.date_created < end_date,
+        Invoice.status != InvoiceStatus.CANCELLED
+    )
+    totals['revenue'] = session.query(db.func.sum(Invoice.total_amount)).filter(*invoice_filter).scalar() or 0
+
+    is_service = InvoiceItem.inventory_id.is_(None)
+    source_rows = dict(session.query(is_service, db.func.sum(InvoiceItem.amount)).join(Invoice).filter(
+        *invoice_filter
+    ).group_by(is_service).all())
+    totals['stock_revenue'] = source_rows.get(False) or 0
+    totals['service_revenue'] = source_rows.get(True) or 0
+
+    totals['payments_received'] = session.query(db.func.sum(Payment.amount)).filter(
+        Payment.payment_date >= start_date,
+        Payment.payment_date < end_date
+    ).scalar() or 0
+
+    expenses_by_category = {}
+    record_rows = session.query(FinancialRecord.type, FinancialRecord.category,
+                                db.func.sum(FinancialRecord.amount)).filter(
+        FinancialRecord.type.in_([FinancialType.EXPENSE, FinancialType.INCOME]),
+        FinancialRecord.date >= start_date,
+        FinancialRecord.date < end_date
+    ).group_by(FinancialRecord.type, FinancialRecord.category).all()
+    for record_type, category, amount in record_rows:
+        amount = amount or 0
+        if record_type == FinancialType.EXPENSE:
+            totals['expenses'] += amount
+            expenses_by_category[category] = amount
+        elif record_type == FinancialType.INCOME:
+            totals['income_records'] += amount
+            if category is not None and category != 'Sales':
+                totals['other_income'] += amount
+
+    # Cost of the stock that left, at FIFO purchase cost rather than selling price
+    import valuation
+    totals['cogs'] = valuation.cost_of_sales(session, start_date, end_date)
+
+    return totals, expenses_by_category
+
+
+def store_month(session, year, month, totals, expenses_by_category):
+    """Write a month's figures into the rollup tables (does not commit)"""
+    summary = session.query(MonthlyFinancialSummary).filter_by(year=year, month=month).first()
+    if not summary:
+        summary = MonthlyFinancialSummary(year=year, month=month)
+        session.add(summary)
+    for field in SUMMARY_FIELDS:
+        setattr(summary, field, totals[field])
+
+    session.query(MonthlyExpenseSummary).filter_by(year=year, month=month).delete()
+    for category, amount in expenses_by_category.items():
+        session.add(MonthlyExpenseSummary(year=year, month=month, category=category, amount=amount))
+    session.flush()
+
+
+def _source_periods(session):
+    """All (year, month) pairs spanned by the source rows"""
+    bounds = session.query(db.func.min(Invoice.date_created), db.func.max(Invoice.date_created)).all() + \
+        session.query(db.func.min(Payment.payment_date), db.func.max(Payment.payment_date)).all() + \
+        session.query(db.func.min(FinancialRecord.date), db.func.max(FinancialRecord.date)).all() + \
+        session.query(db.func.min(StockTransaction.date_created), db.func.max(StockTransaction.date_created)).all()
+    dates = [d for pair in bounds for d in pair if d]
+    if not dates:
+        return []
+    first, last = min(dates), max(dates)
+    periods = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        periods.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def _ensure_backfilled(session):
+    """Populate the rollup from source rows the first time it is used"""
+    if session.query(MonthlyFinancialSummary.id).first() is not None:
+        return False
+    for year, month in _source_periods(session):
+        store_month(session, year, month, *compute_month(session, year, month))
+    return True
+
+
+def backfill_financial_summary(session):
+    """Store the rollup for every month spanned by the source rows that has none yet; commits.
+
+    Run on deploy by `python maintenance.py`, so read-only report sessions,
+    which cannot backfill, never find the rollup empty. Returns the months stored.
+    """
+    stored = set(session.query(MonthlyFinancialSummary.year, MonthlyFinancialSummary.month))
+    missing = [period for period in _source_periods(session) if period not in stored]
+    for year, month in missing:
+        store_month(session, year, month, *compute_month(session, year, month))
+    session.commit()
+    return missing
+
+
+def refresh_financial_summary(session, *dates):
+    """Recompute the rollup for the months containing the given dates.
+
+    Call this before committing from any route that writes invoices, payments,
+    financial records or stock movements so the summary commits atomically
+    with the source rows.
+    """
+    session.flush()
+    _ensure_backfilled(session)
+    for year, month in sorted({(d.year, d.month) for d in dates if d}):
+        store_month(session, year, month, *compute_month(session, year, month))
+
+
+def load_summary(session, year, month=None):
+    """Rollup rows for a year (or a single month), keyed by month"""
+    # A read-only session cannot backfill; `python maintenance.py` does it on deploy
+    if not is_read_only(session) and _ensure_backfilled(session):
+        session.commit()
+    query = session.query(MonthlyFinancialSummary).filter_by(year=year)
+    if month:
+        query = query.filter_by(month=month)
+    return {row.month: row for row in query.all()}
+
+
+def expense_categories(session, year, month):
+    """Rollup expense totals by category for a month"""
+    return session.query(MonthlyExpenseSummary.category, MonthlyExpenseSummary.amount).filter_by(
+        year=year, month=month
+    ).all()
+
+
+def cumulative_expenses(session, categories, year, month):
+    """Total rollup expenses in the given categories up to and including a month"""
+    period = MonthlyExpenseSummary.year * 12 + MonthlyExpenseSummary.month
+    return session.query(db.func.sum(MonthlyExpenseSummary.amount)).filter(
+        MonthlyExpenseSummary.category.in_(categories),
+        period <= year * 12 + month
+    ).scalar() or 0
+
+
+def financial_summary(session, year, month):
+    """Compute everything the /financial dashboard shows for a month.
+
+    KPIs, breakdowns and the monthly trend come from the monthly rollup; the
+    per-activity and top-item breakdowns are single GROUP BY queries. Returns
+    one dict whose keys match the variables consumed by financial.html.
+    """
+    start_date, end_date = month_range(year, month)
+    summaries = load_summary(session, year)
+    current = summaries.get(month)
+
+    def figure(row, field):
+        return (getattr(row, field) or 0) if row else 0
+
+    revenue = figure(current, 'revenue')
+    other_income = figure(current, 'other_income')
+    expenses = figure(current, 'expenses')
+    total_income = revenue + other_income
+
+    expense_breakdown = {}
+    for category, amount in expense_categories(session, year, month):
+        key = category or 'Uncategorized'
+        expense_breakdown[key] = expense_breakdown.get(key, 0) + (amount or 0)
+
+    # Revenue per activity type for the selected month
+    activity_rows = session.query(Invoice.activity_type_id, ActivityType.name,
+                                  db.func.sum(Invoice.total_amount)).outerjoin(
+        ActivityType, Invoice.activity_type_id == ActivityType.id
+    ).filter(
+        Invoice.date_created >= start_date,
+        Invoice.date_created < end_date,
+        Invoice.status != InvoiceStatus.CANCELLED
+    ).group_by(Invoice.activity_type_id, ActivityType.name).order_by(Invoice.activity_type_id).all()
+
+    income_by_activity = {}
+    uncat_rev = 0
+    for activity_type_id, name, amount in activity_rows:
+        if activity_type_id is None:
+            uncat_rev = amount or 0
+        elif name is not None and amount and amount > 0:
+            income_by_activity[name] = amount
+    if uncat_rev > 0:
+        income_by_activity['General Sales'] = uncat_rev
+
+    # Top selling items for the selected month
+    top_items = session.query(InvoiceItem.description, db.func.sum(InvoiceItem.amount)).join(Invoice).filter(
+        Invoice.date_created >= start_date, Invoice.date_created < end_date
+    ).group_by(InvoiceItem.description).order_by(db.func.sum(InvoiceItem.amount).desc()).limit(8).all()
+
+    recent_transactions = session.query(FinancialRecord).order_by(FinancialRecord.date.desc()).limit(10).all()
+    location_labels, location_data = top_locations(session, 5)
+
+    return {
+        'selected_month': month,
+        'selected_year': year,
+        'months': MONTH_LABELS,
+
+        # KPIs
+        'total_sales': revenue,
+        'total_expenses': expenses,
+        'total_income': total_income,
+        'other_income': other_income,
+
+        # Breakdowns
+        'financial_breakdown': {
+            'Sales Revenue': revenue,
+            'Other Income': other_income,
+            'Operating Expenses': -expenses,
+            'Total Income': total_income
+        },
+        'income_by_activity': income_by_activity,
+        'income_by_source': {
+            'Stock Sales': figure(current, 'stock_revenue'),
+            'Services/Labor': figure(current, 'service_revenue')
+        },
+        'expense_breakdown': expense_breakdown,
+
+        # Charts
+        'monthly_revenue_data': [figure(summaries.get(m), 'revenue') for m in range(1, 13)],
+        'monthly_expenses_data': [figure(summaries.get(m), 'expenses') for m in range(1, 13)],
+        'item_labels': [i[0] for i in top_items],
+        'item_data': [i[1] for i in top_items],
+        'top_locations': location_labels,
+        'location_data': location_data,
+
+        # Extras
+        'recent_transactions': recent_transactions
+    }
+
+
+def rebuild_financial_summary(session, year=None, month=None, check_only=False):
+    """Recompute rollup months from source rows, returning the months that had drifted.
+
+    With no year every month spanned by the source rows is rebuilt; with a
+    year but no month, the whole year. check_only reports drift without writing.
+    """
+    if year and month:
+        periods = [(year, month)]
+    elif year:
+        periods = [(year, m) for m in range(1, 13)]
+    else:
+        periods = _source_periods(session)
+
+    drifted = []
+    for y, m in periods:
+        totals, expenses_by_category = compute_month(session, y, m)
+        stored = session.query(MonthlyFinancialSummary).filter_by(year=y, month=m).first()
+        stored_categories = dict(expense_categories(session, y, m))
+        differences = {}
+        for field in SUMMARY_FIELDS:
+            stored_value = (getattr(stored, field) or 0) if stored else 0
+            if abs(stored_value - totals[field]) > 0.005:
+                differences[field] = (stored_value, totals[field])
+        for category in set(stored_categories) | set(expenses_by_category):
+            stored_value = stored_categories.get(category) or 0
+            actual = expenses_by_category.get(category) or 0
+            if abs(stored_value - actual) > 0.005:
+                differences[f'expenses[{category}]'] = (stored_value, actual)
+        if differences:
+            drifted.append(((y, m), differences))
+        if not check_only:
+            store_month(session, y, m, totals, expenses_by_category)
+
+    if check_only:
+        session.rollback()
+    else:
+        session.commit()
+    return drifted
+
+
+if __name__ == '__main__':
+    from database import db_session, init_db
+
+    parser = argparse.ArgumentParser(description='Rebuild or verify the monthly financial summary rollup')
+    parser.add_argument('--year', type=int, help='Only rebuild this year')
+    parser.add_argument('--month', type=int, help='Only rebuild this month (requires --year)')
+    parser.add_argument('--check', action='store_true', help='Report drift without writing')
+    args = parser.parse_args()
+    if args.month and not args.year:
+        parser.error('--month requires --year')
+
+    init_db()
+    drifted = rebuild_financial_summary(db_session, args.year, args.month, check_only=args.check)
+    for (y, m), differences in drifted:
+        print(f"{y}-{m:02d} drifted:")
+        for field, (stored, actual) in differences.items():
+            print(f"  - {field}: stored {stored:,.2f}, source {actual:,.2f}")
+    action = 'Checked' if args.check else 'Rebuilt'
+    print(f"{action} monthly financial summary: {len(drifted)} month(s) with drift.")
+    sys.exit(1 if args.check and drifted else 0)
@@ -0,0 +1,199 @@
+"""Ranked prefix search over customers, inventory and suppliers.
+
+On SQLite each kind has an FTS5 table (search_customers, ...) holding a copy of
+its searchable columns; the write routes keep it current by calling index() or
+remove() in the same transaction as their change, and `python maintenance.py
+search-index` rebuilds it from the source tables. On PostgreSQL the search runs
+against a weighted tsvector expression with a GIN index on it, so there is no
+copy to keep in sync. Without either, search falls back to LIKE.
+
+Every word of the query must match the start of a word in the record, so
+"sol pan" finds "Solar Panel 450W"; results are ordered best match first.
+"""
+import re
+from collections import namedtuple
+
+import sqlalchemy as db
+
+from models import Customer, Inventory, Supplier
+
+MAX_TERMS = 8
+MAX_RESULTS = 200
+
+# Relative weights of the A-D tiers, as bm25() column weights on SQLite
+TIER_WEIGHTS = {'A': 10.0, 'B': 5.0, 'C': 2.0, 'D': 1.0}
+
+Kind = namedtuple('Kind', 'model table key fields')
+
+KINDS = {
+    'customers': Kind(Customer, 'customers', 'identification_number', (
+        ('name', 'A'), ('surname', 'A'), ('identification_number', 'A'), ('phone', 'C'), ('email', 'C'))),
+    'inventory': Kind(Inventory, 'inventory', 'id', (
+        ('name', 'A'), ('brand', 'B'), ('category', 'C'), ('specifications', 'D'))),
+    'suppliers': Kind(Supplier, 'suppliers', 'id', (
+        ('name', 'A'), ('contact_person', 'B'), ('email', 'C'), ('phone', 'C'))),
+}
+
+_fts_tables = {}  # engine url -> set of FTS tables present
+
+
+def query_terms(text):
+    """Words of a search string, lower-cased and capped at MAX_TERMS"""
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def _fts_table(kind):
+    return f"search_{kind}"
+
+
+def _backend(bind, kind):
+    if bind.dialect.name == 'postgresql':
+        return 'postgres'
+    if bind.dialect.name == 'sqlite':
+        url = str(bind.url)
+        if url not in _fts_tables:
+            with bind.connect() as conn:
+                _fts_tables[url] = {name for (name,) in conn.execute(db.text(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'search_%'"))}
+        if _fts_table(kind) in _fts_tables[url]:
+            return 'fts5'
+    return 'like'
+
+
+def _pg_document(kind):
+    """Weighted tsvector expression; must match the GIN index built by build_index()"""
+    return ' || '.join(f"setweight(to_tsvector('simple'::regconfig, coalesce({column}::text, '')), '{tier}')"
+                       for column, tier in KINDS[kind].fields)
+
+
+def _ranked(session, kind, query, terms):
+    """query narrowed to the rows matching terms and ordered best match first"""
+    spec = KINDS[kind]
+    key_column = getattr(spec.model, spec.key)
+    backend = _backend(session.get_bind(), kind)
+
+    if backend == 'fts5':
+        table = _fts_table(kind)
+        match = ' '.join('"' + term.replace('"', '""') + '"*' for term in terms)
+        weights = ', '.join(str(TIER_WEIGHTS[tier]) for _, tier in spec.fields)
+        matches = db.text(
+            f"SELECT key, bm25({table}, 0.0, {weights}) AS rank FROM {table} WHERE {table} MATCH :match"
+        ).bindparams(match=match).columns(key=db.String, rank=db.Float).subquery()
+    elif backend == 'postgres':
+        document = _pg_document(kind)
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        matches = db.text(
+            f"SELECT {spec.key} AS key, -ts_rank({document}, to_tsquery('simple'::regconfig, :q)) AS rank "
+            f"FROM {spec.table} WHERE {document} @@ to_tsquery('simple'::regconfig, :q)"
+        ).bindparams(q=tsquery).columns(key=key_column.type, rank=db.Float).subquery()
+    else:
+        columns = [getattr(spec.model, column) for column, _ in spec.fields]
+        for term in terms:
+            query = query.filter(db.or_(*[column.ilike(f"%{term}%") for column in columns]))
+        return query.order_by(key_column)
+    # The filters of query apply before the ranking is cut off by any LIMIT
+    return query.join(matches, key_column == matches.c.key).order_by(matches.c.rank, key_column)
+
+
+def search_keys(session, kind, text, limit=10):
+    """Primary keys of the best matches for text, best first"""
+    spec = KINDS[kind]
+    terms = query_terms(text)
+    if not terms:
+        return []
+    limit = max(1, min(int(limit), MAX_RESULTS))
+    query = _ranked(session, kind, session.query(getattr(spec.model, spec.key)), terms)
+    return [row[0] for row in query.limit(limit)]
+
+
+def search(session, kind, text, limit=10, query=None, offset=0):
+    """Matching rows of kind, best first.
+
+    query narrows the candidates (e.g. a category filter) inside the search,
+    so limit and offset count matching rows only; limit=None returns all.
+    """
+    spec = KINDS[kind]
+    terms = query_terms(text)
+    if not terms:
+        return []
+    query = _ranked(session, kind, query if query is not None else session.query(spec.model), terms)
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def typeahead_result(kind, row):
+    """JSON view of a search hit for the typeahead endpoint"""
+    if kind == 'customers':
+        label = ' '.join(part for part in (row.name, row.surname) if part)
+        return {'id': row.identification_number, 'label': f"{label} ({row.identification_number})",
+                'name': row.name, 'surname': row.surname, 'phone': row.phone}
+    if kind == 'inventory':
+        label = f"{row.name} ({row.brand})" if row.brand else row.name
+        return {'id': row.id, 'label': label, 'name': row.name, 'brand': row.brand, 'category': row.category,
+                'specifications': row.specifications, 'quantity': row.quantity, 'unit_price': row.unit_price,
+                'cost_price': row.cost_price}
+    return {'id': row.id, 'label': row.name, 'contact_person': row.contact_person, 'phone': row.phone}
+
+
+# Keeping the SQLite index in sync
+
+def index(session, kind, row):
+    """Add or refresh row's search entry; call before the write is committed"""
+    bind = session.get_bind()
+    if _backend(bind, kind) != 'fts5':
+        return
+    spec = KINDS[kind]
+    if getattr(row, spec.key) is None:
+        session.flush()
+    key = getattr(row, spec.key)
+    remove(session, kind, key)
+    columns = ', '.join(column for column, _ in spec.fields)
+    params = {column: getattr(row, column) for column, _ in spec.fields}
+    params['key'] = str(key)
+    session.execute(db.text(
+        f"INSERT INTO {_fts_table(kind)} (key, {columns}) "
+        f"VALUES (:key, {', '.join(':' + column for column, _ in spec.fields)})"
+    ), params)
+
+
+def remove(session, kind, key):
+    """Drop key's search entry; call before the delete is committed"""
+    bind = session.get_bind()
+    if _backend(bind, kind) != 'fts5':
+        return
+    session.execute(db.text(f"DELETE FROM {_fts_table(kind)} WHERE key = :key"), {'key': str(key)})
+
+
+def build_index(bind, kinds=None):
+    """Create the search index for each kind and fill it from the source table; returns rows indexed"""
+    kinds = kinds or list(KINDS)
+    counts = {}
+    if bind.dialect.name == 'postgresql':
+        with bind.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for kind in kinds:
+                spec = KINDS[kind]
+                conn.execute(db.text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{spec.table}_search "
+                    f"ON {spec.table} USING gin (({_pg_document(kind)}))"))
+                counts[kind] = conn.execute(db.text(f"SELECT count(*) FROM {spec.table}")).scalar()
+        return counts
+    if bind.dialect.name != 'sqlite':
+        return counts
+
+    with bind.begin() as conn:
+        for kind in kinds:
+            spec = KINDS[kind]
+            table = _fts_table(kind)
+            columns = ', '.join(column for column, _ in spec.fields)
+            conn.execute(db.text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(key UNINDEXED, {columns}, "
+                f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"))
+            conn.execute(db.text(f"DELETE FROM {table}"))
+            conn.execute(db.text(
+                f"INSERT INTO {table} (key, {columns}) SELECT {spec.key}, {columns} FROM {spec.table}"))
+            counts[kind] = conn.execute(db.text(f"SELECT count(*) FROM {table}")).scalar()
+    _fts_tables.pop(str(bind.url), None)
+    return counts
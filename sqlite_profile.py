@@ -0,0 +1,157 @@
+"""SQLite settings for running under several gunicorn workers.
+
+With the default rollback journal a writer blocks every reader and a second
+writer fails at once with "database is locked". configure() sets, on every new
+connection:
+
+    journal_mode=WAL      readers no longer block on the writer (and vice versa)
+    busy_timeout          a writer waits for the lock instead of failing at once
+    synchronous=NORMAL    fsync at checkpoints, not every commit; safe with WAL
+    mmap_size, cache_size larger page cache and memory-mapped reads
+    temp_store=MEMORY     sorts and temp tables for the reports stay off disk
+
+busy_timeout does not cover everything. A transaction that read first and
+then writes, after another worker committed in between, gets SQLITE_BUSY
+straight away, because waiting could not help it. init_app() therefore
+re-runs POST views that hit a lock, after a rollback and a short randomised
+backoff. The views catch their own exceptions, so a lock is also noticed
+through the engine's handle_error event. Any messages the failed attempt
+flashed are dropped. Nothing here applies to PostgreSQL.
+
+The read-only engine for reports (database.read_engine) gets the same
+pragmas plus query_only. Its statement timeout is enforced by a progress
+handler that interrupts any statement still running past the deadline.
+
+    python bench_sqlite.py   # throughput with and without this profile
+"""
+import os
+import time
+import random
+import functools
+
+from flask import current_app, g, request, session as flask_session, has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative is KiB: 64 MiB
+    'temp_store': 'MEMORY',
+}
+
+WRITE_ATTEMPTS = int(os.environ.get('SQLITE_WRITE_ATTEMPTS', 5))
+BACKOFF_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 1.0
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def is_sqlite(engine):
+    return engine.dialect.name == 'sqlite'
+
+
+def _set_pragmas(dbapi_connection, connection_record, skip=()):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in PRAGMAS.items():
+            if name not in skip:
+                cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def _set_read_only(dbapi_connection, connection_record):
+    # Switching to WAL writes the file header; the writers' engine takes care of it
+    _set_pragmas(dbapi_connection, connection_record, skip=('journal_mode',))
+    dbapi_connection.execute('PRAGMA query_only=ON')
+
+
+def _set_deadline_handler(dbapi_connection, connection_record):
+    info = connection_record.info
+    # Called every N virtual machine steps; a true result aborts the statement with "interrupted"
+    dbapi_connection.set_progress_handler(
+        lambda: time.monotonic() > info.get('statement_deadline', float('inf')), 10000)
+
+
+def _on_error(context):
+    if is_lock_error(context.original_exception) and has_request_context():
+        g.sqlite_locked = True
+
+
+def configure(engine, read_only=False, statement_timeout_ms=None):
+    """Apply PRAGMAS to every connection engine opens; does nothing for other databases.
+
+    read_only connections also refuse writes, and with statement_timeout_ms
+    statements running longer than that are interrupted.
+    """
+    if not is_sqlite(engine):
+        return False
+    event.listen(engine, 'connect', _set_read_only if read_only else _set_pragmas)
+    event.listen(engine, 'handle_error', _on_error)
+    if statement_timeout_ms:
+        event.listen(engine, 'connect', _set_deadline_handler)
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _start_deadline(conn, cursor, statement, parameters, context, executemany):
+            conn.info['statement_deadline'] = time.monotonic() + statement_timeout_ms / 1000
+    return True
+
+
+def is_lock_error(exc):
+    if isinstance(exc, OperationalError):
+        exc = exc.orig
+    return exc is not None and any(message in str(exc).lower() for message in LOCK_MESSAGES)
+
+
+def backoff(attempt):
+    """Seconds to wait before retry number attempt (1-based): exponential, jittered so workers spread out"""
+    return random.uniform(0.5, 1.0) * min(BACKOFF_MAX_SECONDS, BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+
+def run_with_retry(session, work, attempts=WRITE_ATTEMPTS):
+    """Call work() and retry it on a lock error, rolling session back before each retry"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return work()
+        except OperationalError as e:
+            if not is_lock_error(e) or attempt == attempts:
+                raise
+            session.rollback()
+            time.sleep(backoff(attempt))
+
+
+def retry_on_lock(view, session, attempts=WRITE_ATTEMPTS):
+    """Wrap a view so a POST that hit a database lock is rolled back and run again"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'POST':
+            return view(*args, **kwargs)
+        for attempt in range(1, attempts + 1):
+            g.sqlite_locked = False
+            flashes = list(flask_session.get('_flashes', []))
+            last = attempt == attempts
+            try:
+                response = view(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e) or last:
+                    raise
+            else:
+                # The view may have caught the error itself and rendered a failure
+                if not g.sqlite_locked or last:
+                    return response
+            current_app.logger.warning("Database locked during %s, retry %d of %d", request.endpoint, attempt,
+                                       attempts - 1)
+            session.rollback()
+            flask_session['_flashes'] = flashes
+            time.sleep(backoff(attempt))
+    return wrapper
+
+
+def init_app(app, session):
+    """Wrap every view that accepts POST with retry_on_lock; call after the routes are registered"""
+    for rule in app.url_map.iter_rules():
+        if 'POST' in rule.methods:
+            app.view_functions[rule.endpoint] = retry_on_lock(app.view_functions[rule.endpoint], session)
@@ -0,0 +1,89 @@
+// Fills the customer and stock datalists on the invoice and quotation forms from /lookup/<kind>.
+// An input opts in with data-lookup="<lookup url>" and data-lookup-format="customer-id",
+// "customer-name" or "inventory"; its list="..." datalist is refilled as the user types.
+// Options marked data-static (e.g. "Create Custom Item") are kept.
+(function () {
+    const DELAY_MS = 200;
+    const PAGE_SIZE = 20;
+    const timers = new WeakMap();
+    const lastQuery = new WeakMap();
+
+    function customerName(result) {
+        return result.name + ' ' + (result.surname || '');
+    }
+
+    function makeOption(format, result) {
+        const option = document.createElement('option');
+        if (format === 'customer-id') {
+            option.value = result.id;
+            option.textContent = customerName(result).trim() + ' - ' + result.id;
+        } else if (format === 'customer-name') {
+            option.value = customerName(result);
+            option.textContent = 'ID: ' + result.id;
+        } else {
+            option.value = result.name;
+            option.dataset.id = result.id;
+            option.dataset.price = result.unit_price;
+            option.dataset.cost = result.cost_price;
+            option.textContent = 'Stock: ' + result.quantity;
+        }
+        return option;
+    }
+
+    function fill(datalist, format, results) {
+        for (const option of Array.from(datalist.options)) {
+            if (!('static' in option.dataset)) {
+                option.remove();
+            }
+        }
+        const firstStatic = datalist.querySelector('option[data-static]');
+        for (const result of results) {
+            datalist.insertBefore(makeOption(format, result), firstStatic);
+        }
+    }
+
+    function refresh(input) {
+        const datalist = input.list;
+        if (!datalist) {
+            return;
+        }
+        const q = input.value.trim();
+        if (lastQuery.get(input) === q) {
+            return;
+        }
+        // Picking a suggestion sets the input to its value; keep the list that offered it
+        for (const option of datalist.options) {
+            if (q && option.value.trim() === q && !('static' in option.dataset)) {
+                return;
+            }
+        }
+        lastQuery.set(input, q);
+        const url = new URL(input.dataset.lookup, window.location.origin);
+        url.searchParams.set('limit', PAGE_SIZE);
+        if (q) {
+            url.searchParams.set('q', q);
+        }
+        fetch(url)
+            .then(response => response.ok ? response.json() : { results: [] })
+            .then(data => {
+                // Ignore answers to queries the user has already typed past
+                if (lastQuery.get(input) === q) {
+                    fill(datalist, input.dataset.lookupFormat, data.results);
+                }
+            })
+            .catch(() => lastQuery.delete(input));
+    }
+
+    function schedule(event) {
+        const input = event.target;
+        if (!(input instanceof HTMLInputElement) || !input.dataset.lookup) {
+            return;
+        }
+        clearTimeout(timers.get(input));
+        timers.set(input, setTimeout(() => refresh(input), event.type === 'focusin' ? 0 : DELAY_MS));
+    }
+
+    // Delegated, so item rows added after page load are covered too
+    document.addEventListener('input', schedule);
+    document.addEventListener('focusin', schedule);
+})();
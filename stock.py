@@ -0,0 +1,265 @@
+"""Moving inventory quantities without losing updates under concurrent requests.
+
+Routes used to read Inventory.quantity, check it in Python and write back
+quantity - n, so two invoices saved at the same moment could both pass the
+check and oversell. take() instead issues
+
+    UPDATE inventory SET quantity = quantity - :n WHERE id = :id AND quantity >= :n
+
+per item, which the database applies atomically: on PostgreSQL the UPDATE
+takes the row lock and re-checks the condition against the committed
+quantity, and SQLite serialises writers. Items are updated in id order so two
+multi-item invoices cannot deadlock each other.
+
+Both functions run inside the caller's transaction; on InsufficientStock the
+caller rolls back, which also undoes the lines that did succeed.
+
+stock_transactions is the ledger: every change to a quantity is paired with a
+record() row in the same transaction, so the sum of an item's ledger rows is
+its quantity. Monthly StockSnapshot rows hold each item's quantity, FIFO
+value and FIFO layers (see valuation.py) at the start of the month, and
+position_as_of() answers "what did we hold on date X" from the latest
+snapshot plus the ledger rows since: the snapshot's layers are costed ahead
+of those rows, so the value is the same FIFO value a replay of the whole
+ledger gives. The reconcile command checks Inventory.quantity against the
+ledger.
+
+    python stock.py reconcile [--adjust]
+    python stock.py snapshot [--as-of 2025-03-01]
+"""
+import sys
+import json
+import argparse
+from datetime import datetime
+from collections import namedtuple
+
+from sqlalchemy import select, func, case, and_
+from sqlalchemy.orm.util import identity_key
+
+from models import Inventory, StockTransaction, StockSnapshot, TransactionType, StockChangeReason
+
+Position = namedtuple('Position', 'quantity value')
+Mismatch = namedtuple('Mismatch', 'inventory_id name quantity ledger_quantity')
+
+
+class InsufficientStock(Exception):
+    """Some lines asked for more than is on hand; failures lists (item, requested, available)"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__('; '.join(f'Insufficient stock for {item.name}. Available: {available}'
+                                   for item, requested, available in failures))
+
+
+def _totals(quantities):
+    """{inventory_id: quantity} from a dict or from (inventory_id, quantity) pairs, summing repeats"""
+    pairs = quantities.items() if isinstance(quantities, dict) else quantities
+    totals = {}
+    for inventory_id, quantity in pairs:
+        if inventory_id is not None and quantity:
+            totals[inventory_id] = totals.get(inventory_id, 0) + quantity
+    return totals
+
+
+def _expire_quantities(session, inventory_ids):
+    # The UPDATEs bypass the ORM, so loaded rows must re-read their quantity
+    for inventory_id in inventory_ids:
+        item = session.identity_map.get(identity_key(Inventory, inventory_id))
+        if item is not None:
+            session.expire(item, ['quantity'])
+
+
+def take(session, quantities):
+    """Remove stock for each item only if enough is on hand; raises InsufficientStock listing every short item"""
+    totals = _totals(quantities)
+    failed = {}
+    for inventory_id in sorted(totals):
+        requested = totals[inventory_id]
+        updated = session.query(Inventory).filter(
+            Inventory.id == inventory_id, Inventory.quantity >= requested
+        ).update({Inventory.quantity: Inventory.quantity - requested}, synchronize_session=False)
+        if not updated:
+            failed[inventory_id] = requested
+    _expire_quantities(session, totals)
+
+    if failed:
+        items = {item.id: item for item in
+                 session.query(Inventory).filter(Inventory.id.in_(failed)).all()}
+        failures = []
+        for inventory_id, requested in failed.items():
+            item = items.get(inventory_id)
+            if item is None:
+                item = Inventory(id=inventory_id, name=f'item #{inventory_id}')
+            failures.append((item, requested, item.quantity or 0))
+        raise InsufficientStock(failures)
+    return totals
+
+
+def give(session, quantities):
+    """Add stock back for each item (stock in, returns, reverting an invoice)"""
+    totals = _totals(quantities)
+    for inventory_id in sorted(totals):
+        session.query(Inventory).filter(Inventory.id == inventory_id).update(
+            {Inventory.quantity: func.coalesce(Inventory.quantity, 0) + totals[inventory_id]},
+            synchronize_session=False)
+    _expire_quantities(session, totals)
+    return totals
+
+
+# The ledger
+
+def record(session, item, transaction_type, quantity, unit_price=None, unit_cost=None, **fields):
+    """Append a ledger row for a change of quantity (negative for stock leaving) to item.
+
+    total_value is quantity * unit_price, so it is signed like quantity.
+    unit_cost defaults to the item's current cost price.
+    """
+    if unit_cost is None:
+        unit_cost = item.cost_price
+    transaction = StockTransaction(
+        inventory_id=item.id,
+        transaction_type=transaction_type,
+        quantity=quantity,
+        unit_price=unit_price,
+        total_value=quantity * unit_price if unit_price is not None else None,
+        unit_cost=unit_cost,
+        **fields
+    )
+    session.add(transaction)
+    return transaction
+
+
+def ledger_unit_cost():
+    """SQL expression for a ledger row's cost per unit; needs Inventory joined on inventory_id"""
+    # Rows written before unit_cost existed: a purchase's price was its cost,
+    # anything else is valued at the item's cost price
+    return func.coalesce(
+        StockTransaction.unit_cost,
+        case((StockTransaction.transaction_type == TransactionType.STOCK_IN, StockTransaction.unit_price)),
+        Inventory.cost_price,
+        0.0)
+
+
+def _latest_snapshots(as_of):
+    """Subquery of (inventory_id, as_of) for each item's newest snapshot at or before as_of"""
+    return (select(StockSnapshot.inventory_id, func.max(StockSnapshot.as_of).label('as_of'))
+            .where(StockSnapshot.as_of <= as_of)
+            .group_by(StockSnapshot.inventory_id)
+            .subquery())
+
+
+def _costed_since_snapshots(session, as_of, inventory_ids=None):
+    """valuation.fifo() over each item's latest snapshot before as_of plus its ledger rows since.
+
+    Two queries whatever the ledger size: the latest snapshot per item, then
+    the ledger rows each item has had since its snapshot.
+    """
+    import pandas as pd
+    import valuation
+    latest = _latest_snapshots(as_of)
+    snapshots = session.query(StockSnapshot).join(latest, and_(
+        StockSnapshot.inventory_id == latest.c.inventory_id, StockSnapshot.as_of == latest.c.as_of))
+    if inventory_ids is not None:
+        snapshots = snapshots.filter(StockSnapshot.inventory_id.in_(inventory_ids))
+    opening = [row for snapshot in snapshots for row in valuation.opening_rows(snapshot)]
+
+    delta = session.query(
+        StockTransaction.id, StockTransaction.inventory_id, StockTransaction.date_created,
+        StockTransaction.quantity, StockTransaction.transaction_type, StockTransaction.reference_type,
+        ledger_unit_cost(),
+    ).outerjoin(Inventory, Inventory.id == StockTransaction.inventory_id) \
+     .outerjoin(latest, latest.c.inventory_id == StockTransaction.inventory_id) \
+     .filter(StockTransaction.date_created < as_of,
+             StockTransaction.inventory_id.isnot(None),
+             (latest.c.as_of.is_(None)) | (StockTransaction.date_created >= latest.c.as_of))
+    if inventory_ids is not None:
+        delta = delta.filter(StockTransaction.inventory_id.in_(inventory_ids))
+    return valuation.fifo(pd.DataFrame(opening + delta.all(), columns=valuation.LEDGER_COLUMNS))
+
+
+def position_as_of(session, as_of, inventory_ids=None):
+    """{inventory_id: Position(quantity, value)} held just before as_of, at FIFO cost"""
+    _, closing = _costed_since_snapshots(session, as_of, inventory_ids)
+    return {int(inventory_id): Position(int(row.quantity), float(row.value))
+            for inventory_id, row in closing.iterrows()}
+
+
+def month_start(when=None):
+    when = when or datetime.utcnow()
+    return datetime(when.year, when.month, 1)
+
+
+def take_snapshots(session, as_of=None):
+    """Store every item's FIFO position and layers at as_of (the start of this month by default); returns rows written.
+
+    Each item carries on from its previous snapshot. Items that already have
+    a snapshot at as_of are left alone, so the job can be re-run safely. Commits.
+    """
+    import valuation
+    as_of = as_of or month_start()
+    done = {inventory_id for (inventory_id,) in
+            session.query(StockSnapshot.inventory_id).filter(StockSnapshot.as_of == as_of)}
+    costed, closing = _costed_since_snapshots(session, as_of)
+    layers = valuation.layers(costed)
+    rows = [{'inventory_id': int(inventory_id), 'as_of': as_of, 'quantity': int(position.quantity),
+             'value': round(float(position.value), 2), 'layers': json.dumps(layers.get(int(inventory_id), [])),
+             'date_created': datetime.utcnow()}
+            for inventory_id, position in closing.iterrows() if inventory_id not in done]
+    if rows:
+        session.execute(StockSnapshot.__table__.insert(), rows)
+    session.commit()
+    return len(rows)
+
+
+def reconcile(session):
+    """Items whose Inventory.quantity differs from the sum of their ledger rows, in one aggregate query"""
+    ledger = session.query(StockTransaction.inventory_id, func.sum(StockTransaction.quantity).label('quantity')) \
+        .group_by(StockTransaction.inventory_id).subquery()
+    ledger_quantity = func.coalesce(ledger.c.quantity, 0)
+    rows = session.query(Inventory.id, Inventory.name, func.coalesce(Inventory.quantity, 0), ledger_quantity) \
+        .outerjoin(ledger, ledger.c.inventory_id == Inventory.id) \
+        .filter(func.coalesce(Inventory.quantity, 0) != ledger_quantity) \
+        .order_by(Inventory.id)
+    return [Mismatch(*row) for row in rows]
+
+
+def adjust_ledger(session, mismatches):
+    """Post ADJUSTMENT rows so the ledger agrees with the quantities on hand; commits"""
+    items = {item.id: item for item in
+             session.query(Inventory).filter(Inventory.id.in_([m.inventory_id for m in mismatches]))}
+    for mismatch in mismatches:
+        record(session, items[mismatch.inventory_id], TransactionType.ADJUSTMENT,
+               mismatch.quantity - mismatch.ledger_quantity,
+               reason=StockChangeReason.ADJUSTMENT, reference_type='reconciliation',
+               notes=f'Ledger brought in line with quantity on hand ({mismatch.quantity})')
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stock ledger checks and snapshots')
+    commands = parser.add_subparsers(dest='command', required=True)
+    reconcile_cmd = commands.add_parser('reconcile', help='compare Inventory.quantity with the ledger')
+    reconcile_cmd.add_argument('--adjust', action='store_true',
+                               help='post ADJUSTMENT rows so the ledger matches the quantities on hand')
+    snapshot_cmd = commands.add_parser('snapshot', help='store per-item positions for a date')
+    snapshot_cmd.add_argument('--as-of', type=datetime.fromisoformat, help='default: start of this month')
+    args = parser.parse_args()
+
+    from database import db_session
+    if args.command == 'snapshot':
+        as_of = args.as_of or month_start()
+        print(f"Stored {take_snapshots(db_session, as_of)} stock snapshots as of {as_of:%Y-%m-%d %H:%M}")
+        return
+    mismatches = reconcile(db_session)
+    for m in mismatches:
+        print(f"#{m.inventory_id} {m.name}: quantity {m.quantity}, ledger {m.ledger_quantity}")
+    print(f"{len(mismatches)} items disagree with the ledger")
+    if mismatches and args.adjust:
+        adjust_ledger(db_session, mismatches)
+        print(f"Posted {len(mismatches)} adjustments")
+    elif mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
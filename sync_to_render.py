@@ -1,132 +1,344 @@
+"""Copy the local SQLite database into the Render PostgreSQL database.
+
+Each table is streamed from the source in batches of BATCH_SIZE rows, so
+memory stays flat however large it is. Each batch is written in one
+statement and committed:
+
+* PostgreSQL targets: COPY FROM STDIN into a temporary staging table, then
+  INSERT ... SELECT ... ON CONFLICT on the primary key.
+* Anything else (a second SQLite file for testing): a multi-row
+  INSERT ... ON CONFLICT through executemany.
+
+Syncs are incremental. Every model has an updated_at column and deletes
+leave a SyncTombstone row (see models.py). The target keeps a watermark per
+table in sync_watermarks. Each run sends only the rows changed since the
+watermark, as upserts (ON CONFLICT DO UPDATE), and deletes the rows
+tombstoned since then. The watermark is committed with every batch, so an
+interrupted sync resumes where it stopped. The first run, or --full, copies
+everything. Tables without updated_at are copied in full each time; their
+existing rows are left alone (DO NOTHING) unless --update is given.
+
+Tables are grouped into waves by their foreign keys. The tables in one wave
+do not depend on each other and are copied in parallel; a wave starts once
+the waves it depends on are done. Deletes run first, children before parents.
+
+    python sync_to_render.py <RENDER_DATABASE_URL> [--source sqlite:///instance/database.db]
+                             [--batch-size 5000] [--workers 4] [--full] [--update] [--no-copy]
+"""
+import io
 import os
+import csv
 import sys
-from sqlalchemy import create_engine, MetaData, Table, select, insert
-from sqlalchemy.orm import sessionmaker
+import time
+import argparse
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, MetaData, Table, Column, String, DateTime, select, func, text
 
 # Add current directory to path for imports
 sys.path.append(os.getcwd())
 
-from database import Base, database_url as local_db_url
+from database import Base
 import models
 
-# Hardcode local DB to ensure we pull from file, not the live DB in .env
-local_db_url = 'sqlite:///instance/database.db'
-
-def sync_data(target_url):
-    print(f"Starting sync from {local_db_url} to {target_url}...")
-    
-    # 1. Connect to both databases
-    local_engine = create_engine(local_db_url)
-    target_engine = create_engine(target_url)
-    
-    # 2. Reflected metadata
-    local_metadata = MetaData()
-    local_metadata.reflect(bind=local_engine)
-    
-    target_metadata = MetaData()
-    target_metadata.reflect(bind=target_engine)
-    
-    # 3. Tables to sync in order of dependency
-    # Note: Using table names as defined in __tablename__
-    tables_order = [
-        'suppliers',
-        'customers',
-        'inventory',
-        'activity_types',
-        'financial_categories',
-        'pricing',
-        'locations',
-        'invoices',
-        'activities',
-        'quotations',
-        'quotation_items',
-        'invoice_items',
-        'payments',
-        'stock_transactions',
-        'financial_records',
-        'journey_records',
-        'fuel_records',
-        'mileage_records',
-        'custom_fields'
-    ]
-
-    # Create tables in target if they don't exist
-    print("Ensuring target database schema is ready...")
-    Base.metadata.create_all(bind=target_engine)
-
-    # 4. Sync data for each table
-    with target_engine.connect() as target_conn:
-        # We need to handle transaction properly
-        # Note: PostgreSQL might have SERIAL columns that need reset after sync
-        
-        for table_name in tables_order:
-            if table_name not in local_metadata.tables:
-                print(f"Skipping {table_name}: not found in local DB.")
-                continue
-                
-            local_table = local_metadata.tables[table_name]
-            
-            if table_name not in target_metadata.tables:
-                print(f"Skipping {table_name}: not found in target DB schema.")
-                continue
-            
-            target_table = target_metadata.tables[table_name]
-            print(f"Syncing table {table_name}...")
-            
-            # Read local data
-            with local_engine.connect() as local_conn:
-                result = local_conn.execute(select(local_table))
-                rows = [dict(row._mapping) for row in result]
-            
-            if not rows:
-                print(f"  - No data found in {table_name}.")
+# Sync from the file, not whatever DATABASE_URL in .env points at
+LOCAL_DB_URL = 'sqlite:///instance/database.db'
+
+BATCH_SIZE = 5000
+WORKERS = 4
+
+SYNC_TABLES = list(models.SYNCED_TABLES)
+
+# Rows are re-sent from a little before the watermark: a transaction that
+# committed late can carry an updated_at older than rows already synced, and
+# upserting a row twice is harmless
+OVERLAP = timedelta(minutes=5)
+
+# Lives in the target database so each target has its own progress
+WATERMARKS = Table(
+    'sync_watermarks', MetaData(),
+    Column('table_name', String(50), primary_key=True),
+    Column('changed_until', DateTime),  # updated_at of the last row sent
+    Column('deleted_until', DateTime),  # deleted_at of the last tombstone applied
+)
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+def waves(table_names):
+    """Group tables so each group only references tables in earlier groups (per the models' foreign keys)"""
+    names = set(table_names)
+    remaining = {name: {fk.column.table.name for fk in Base.metadata.tables[name].foreign_keys} & names - {name}
+                 for name in table_names}
+    done, result = set(), []
+    while remaining:
+        ready = [name for name in table_names if name in remaining and remaining[name] <= done]
+        if not ready:
+            raise ValueError(f"Circular foreign keys between {sorted(remaining)}")
+        result.append(ready)
+        done.update(ready)
+        for name in ready:
+            del remaining[name]
+    return result
+
+
+def _insert_statement(dialect, table, key_columns, columns, update):
+    """INSERT ... ON CONFLICT (key) DO NOTHING / DO UPDATE for the target dialect"""
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(table)
+    changed = [c for c in columns if c not in key_columns]
+    if update and changed:
+        return statement.on_conflict_do_update(index_elements=key_columns,
+                                               set_={c: statement.excluded[c] for c in changed})
+    return statement.on_conflict_do_nothing(index_elements=key_columns)
+
+
+def _copy_batch(conn, table, key_columns, columns, rows, update):
+    """COPY rows into a temporary staging table and merge them into table with one INSERT ... SELECT"""
+    preparer = conn.dialect.identifier_preparer
+    target = preparer.format_table(table)
+    staging = preparer.quote(f'_sync_{table.name}')
+    column_list = ', '.join(preparer.quote(c) for c in columns)
+    conn.exec_driver_sql(f'CREATE TEMP TABLE IF NOT EXISTS {staging} '
+                         f'(LIKE {target} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS')
+
+    buffer = io.StringIO()
+    # csv writes None as an empty field, so NULLs are spelled out with COPY's \N marker
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+    finally:
+        cursor.close()
+
+    keys = ', '.join(preparer.quote(c) for c in key_columns)
+    changed = [c for c in columns if c not in key_columns]
+    if update and changed:
+        action = 'DO UPDATE SET ' + ', '.join(f'{preparer.quote(c)} = EXCLUDED.{preparer.quote(c)}' for c in changed)
+    else:
+        action = 'DO NOTHING'
+    result = conn.exec_driver_sql(f'INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging} '
+                                  f'ON CONFLICT ({keys}) {action}')
+    return result.rowcount
+
+
+def read_watermarks(target_engine):
+    """{table_name: (changed_until, deleted_until)} stored in the target"""
+    with target_engine.connect() as conn:
+        return {row.table_name: (row.changed_until, row.deleted_until) for row in conn.execute(select(WATERMARKS))}
+
+
+def _save_watermark(conn, table_name, **fields):
+    statement = _insert_statement(conn.dialect.name, WATERMARKS, ['table_name'], list(fields), update=True)
+    conn.execute(statement, [dict(fields, table_name=table_name)])
+
+
+def _since(watermark):
+    return watermark - OVERLAP if watermark else None
+
+
+def sync_table(source_engine, target_engine, source_table, target_table, batch_size=BATCH_SIZE,
+               update=False, use_copy=True, changed_since=None):
+    """Stream one table from source to target in batches; returns (rows read, rows written, seconds).
+
+    Tables with updated_at are sent in updated_at order, only rows changed at
+    or after changed_since, as upserts; the table's watermark is committed
+    with each batch.
+    """
+    started = time.perf_counter()
+    columns = [c.name for c in source_table.columns if c.name in target_table.columns]
+    key_columns = [c.name for c in target_table.primary_key]
+    tracked = 'updated_at' in columns
+    update = update or tracked
+    copy = use_copy and target_engine.dialect.name == 'postgresql' and target_engine.dialect.driver == 'psycopg2'
+    statement = None if copy else _insert_statement(target_engine.dialect.name, target_table, key_columns,
+                                                    columns, update)
+
+    query = select(*[source_table.c[c] for c in columns])
+    if tracked:
+        # Rows from before change tracking have no updated_at; they only go out on a full copy
+        query = query.order_by(source_table.c.updated_at.asc().nulls_first(),
+                               *[source_table.c[c] for c in key_columns])
+        if changed_since:
+            query = query.where(source_table.c.updated_at >= changed_since)
+    else:
+        query = query.order_by(*[source_table.c[c] for c in key_columns])
+
+    read = written = 0
+    with source_engine.connect() as source_conn, target_engine.connect() as target_conn:
+        total = source_conn.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar()
+        result = source_conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        try:
+            for batch in result.mappings().partitions(batch_size):
+                if copy:
+                    count = _copy_batch(target_conn, target_table, key_columns, columns, batch, update)
+                else:
+                    count = target_conn.execute(statement, [dict(row) for row in batch]).rowcount
+                if tracked and batch[-1]['updated_at']:
+                    _save_watermark(target_conn, source_table.name, changed_until=batch[-1]['updated_at'])
+                target_conn.commit()
+                read += len(batch)
+                written += max(count, 0)
+                log(f"  {source_table.name}: {read}/{total} rows")
+        finally:
+            result.close()  # an interrupted stream would otherwise keep its read lock on SQLite
+    return read, written, time.perf_counter() - started
+
+
+def apply_tombstones(source_engine, target_engine, target_table, deleted_since=None, batch_size=BATCH_SIZE):
+    """Delete from the target the rows tombstoned in the source since deleted_since; returns rows deleted"""
+    tombstones = models.SyncTombstone.__table__
+    key = target_table.c[list(target_table.primary_key)[0].name]
+    python_type = key.type.python_type
+    query = select(tombstones.c.row_key, tombstones.c.deleted_at) \
+        .where(tombstones.c.table_name == target_table.name) \
+        .order_by(tombstones.c.deleted_at, tombstones.c.id)
+    if deleted_since:
+        query = query.where(tombstones.c.deleted_at >= deleted_since)
+
+    deleted = 0
+    with source_engine.connect() as source_conn, target_engine.connect() as target_conn:
+        result = source_conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        try:
+            for batch in result.partitions(batch_size):
+                keys = [python_type(row_key) for row_key, _ in batch]
+                deleted += max(target_conn.execute(target_table.delete().where(key.in_(keys))).rowcount, 0)
+                _save_watermark(target_conn, target_table.name, deleted_until=batch[-1][1])
+                target_conn.commit()
+        finally:
+            result.close()
+    if deleted:
+        log(f"  {target_table.name}: {deleted} rows deleted")
+    return deleted
+
+
+def reset_sequences(target_engine, table_names):
+    """Move each PostgreSQL id sequence past the highest synced id"""
+    with target_engine.connect() as conn:
+        for table_name in table_names:
+            if 'id' not in Base.metadata.tables[table_name].c:
                 continue
-            
-            # Get target columns to avoid UndefinedColumn errors
-            target_columns = [c.name for c in target_table.columns]
-            
-            # Insert into target row by row to handle errors individually if needed
-            success_count = 0
-            fail_count = 0
-            for row in rows:
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), "
+                              f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table_name}"))
+            conn.commit()
+
+
+def sync_data(target_url, source_url=LOCAL_DB_URL, batch_size=BATCH_SIZE, workers=WORKERS, update=False,
+              use_copy=True, tables=SYNC_TABLES, full=False):
+    """Send changes (everything with full) from source_url to target_url.
+
+    Returns {table: (rows read, rows written, seconds)}.
+    """
+    print(f"Starting sync from {source_url} to {target_engine_name(target_url)}...")
+    started = time.perf_counter()
+    source_engine = create_engine(source_url)
+    target_engine = create_engine(target_url, pool_size=workers, max_overflow=0) \
+        if not target_url.startswith('sqlite') else create_engine(target_url)
+    if target_engine.dialect.name == 'sqlite':
+        workers = 1  # SQLite takes one writer at a time; more threads would only queue on its lock
+
+    try:
+        print("Ensuring target database schema is ready...")
+        Base.metadata.create_all(bind=target_engine)
+        WATERMARKS.create(target_engine, checkfirst=True)
+        watermarks = {} if full else read_watermarks(target_engine)
+        source_metadata = MetaData()
+        source_metadata.reflect(bind=source_engine)
+        target_metadata = MetaData()
+        target_metadata.reflect(bind=target_engine)
+
+        present = [name for name in tables if name in source_metadata.tables and name in target_metadata.tables]
+        for name in set(tables) - set(present):
+            print(f"Skipping {name}: not found in both databases.")
+
+        stats, deleted, failures = {}, {}, {}
+        if 'sync_tombstones' in source_metadata.tables:
+            for name in reversed([name for wave in waves(present) for name in wave]):
                 try:
-                    # Only keep keys that exist in the target table
-                    clean_row = {k: v for k, v in row.items() if k in target_columns}
-                    
-                    target_conn.execute(insert(target_table), [clean_row])
-                    target_conn.commit()
-                    success_count += 1
+                    deleted[name] = apply_tombstones(source_engine, target_engine, target_metadata.tables[name],
+                                                     _since(watermarks.get(name, (None, None))[1]), batch_size)
                 except Exception as e:
-                    target_conn.rollback()
-                    # print(f"  - Failed to sync row in {table_name}: {e}")
-                    fail_count += 1
+                    failures[name] = e
+                    log(f"  {name}: FAILED deleting - {e}")
 
-            if success_count:
-                print(f"  - Successfully synced {success_count} records to {table_name}.")
-            if fail_count:
-                print(f"  - Skipped {fail_count} records in {table_name} due to inconsistencies (like duplicate IDs).")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for wave in waves(present):
+                futures = {name: pool.submit(sync_table, source_engine, target_engine, source_metadata.tables[name],
+                                             target_metadata.tables[name], batch_size, update, use_copy,
+                                             _since(watermarks.get(name, (None, None))[0]))
+                           for name in wave if name not in failures}
+                for name, future in futures.items():
+                    try:
+                        stats[name] = future.result()
+                    except Exception as e:
+                        failures[name] = e
+                        log(f"  {name}: FAILED - {e}")
 
-    # 5. Reset PostgreSQL Sequences (IDs)
-    print("\nResetting PostgreSQL ID sequences...")
-    with target_engine.connect() as conn:
-        for table_name in tables_order:
-            try:
-                # This is a standard PG way to reset sequences for tables with 'id'
-                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table_name}"))
-                conn.commit()
-            except Exception:
-                pass # Not all tables have serial IDs or matching names
-    
+        if target_engine.dialect.name == 'postgresql':
+            print("\nResetting PostgreSQL ID sequences...")
+            reset_sequences(target_engine, [name for name in present if name in stats])
+
+        elapsed = time.perf_counter() - started
+        print(f"\n{'table':<22} {'read':>9} {'written':>9} {'deleted':>8} {'seconds':>8} {'rows/s':>9}")
+        for name in present:
+            if name in stats:
+                read, written, seconds = stats[name]
+                print(f"{name:<22} {read:>9} {written:>9} {deleted.get(name, 0):>8} {seconds:>8.2f} "
+                      f"{read / seconds if seconds else 0:>9.0f}")
+        total_read = sum(read for read, _, _ in stats.values())
+        total_written = sum(written for _, written, _ in stats.values())
+        print(f"{'total':<22} {total_read:>9} {total_written:>9} {sum(deleted.values()):>8} {elapsed:>8.2f} "
+              f"{total_read / elapsed:>9.0f}")
+    finally:
+        source_engine.dispose()
+        target_engine.dispose()
+    if failures:
+        raise RuntimeError(f"Sync failed for {', '.join(sorted(failures))}")
     print("\nSync Complete!")
-    print("Your live system should now have all recovered records!")
+    return stats
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python sync_to_render.py <RENDER_DATABASE_URL>")
-        sys.exit(1)
-    
-    target_url = sys.argv[1]
+
+def target_engine_name(url):
+    """The target URL without its password, for log lines"""
+    from sqlalchemy.engine import make_url
+    return make_url(url).render_as_string(hide_password=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy the local database into the Render PostgreSQL database')
+    parser.add_argument('target_url', help='target database URL (postgres:// or sqlite:///)')
+    parser.add_argument('--source', default=LOCAL_DB_URL, help=f'source database URL (default {LOCAL_DB_URL})')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=WORKERS, help='tables copied in parallel')
+    parser.add_argument('--full', action='store_true', help='ignore the watermarks and send every row')
+    parser.add_argument('--update', action='store_true',
+                        help='overwrite existing rows of tables without updated_at (tracked tables always are)')
+    parser.add_argument('--no-copy', action='store_true', help='use INSERT batches instead of COPY on PostgreSQL')
+    args = parser.parse_args()
+
+    target_url = args.target_url
     if target_url.startswith("postgres://"):
         target_url = target_url.replace("postgres://", "postgresql://", 1)
-        
-    sync_data(target_url)
+    try:
+        sync_data(target_url, args.source, args.batch_size, args.workers, args.update, not args.no_copy,
+                  full=args.full)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import sqlite3
+import subprocess
+
+import backup
+
+
+def make_database(directory):
+    path = os.path.join(directory, 'source.db')
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [(f'item {i}',) for i in range(500)])
+    conn.commit()
+    return path, conn
+
+
+def backup_files(backup_dir):
+    return sorted(f for f in os.listdir(backup_dir) if f.startswith('backup_'))
+
+
+def manifest_files(backup_dir):
+    snapshots = backup.load_manifest(backup_dir)['snapshots']
+    return sorted([s['file'] for s in snapshots] + [s['wal'] for s in snapshots if s.get('wal')])
+
+
+def count_items(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM items").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def add_item(conn):
+    conn.execute("INSERT INTO items (name) VALUES ('more')")
+    conn.commit()
+
+
+def test_incremental_snapshots_restore(tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    db_path, conn = make_database(str(tmp_path))
+
+    first = backup.snapshot(db_path, backup_dir)
+    assert first is not None and 'base' not in first
+    # Rows still in the WAL (not yet checkpointed) are part of the snapshot
+    assert count_items(os.path.join(backup_dir, first['file'])) == 500
+    assert backup.snapshot(db_path, backup_dir) is None, "unchanged database should be skipped"
+
+    add_item(conn)
+    second = backup.snapshot(db_path, backup_dir)
+    assert second['base'] == first['file'], "only the new WAL frames are written"
+    assert second['size'] < os.path.getsize(os.path.join(backup_dir, first['file']))
+    add_item(conn)
+    third = backup.snapshot(db_path, backup_dir)
+    assert third['base'] == first['file'] and third['wal_start'] == second['wal_end']
+
+    assert count_items(backup.restore(second['file'], str(tmp_path / 'second.db'), backup_dir)) == 501
+    assert count_items(backup.restore(third['file'], str(tmp_path / 'third.db'), backup_dir)) == 502
+    assert count_items(backup.restore(first['file'], str(tmp_path / 'first.db'), backup_dir)) == 500
+
+    # A checkpoint that resets the WAL ends the chain
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    add_item(conn)
+    fourth = backup.snapshot(db_path, backup_dir)
+    assert 'base' not in fourth
+    assert count_items(backup.restore(fourth['file'], str(tmp_path / 'fourth.db'), backup_dir)) == 503
+    conn.close()
+
+
+def test_retention_keeps_whole_chains_and_verify(tmp_path, monkeypatch):
+    backup_dir = str(tmp_path / 'backups')
+    db_path, conn = make_database(str(tmp_path))
+    # Not created by the service, so retention must never delete it
+    os.makedirs(backup_dir)
+    open(os.path.join(backup_dir, 'pre_migration_manual.db'), 'wb').close()
+    monkeypatch.setattr(backup, 'BACKUP_KEEP', 2)
+    monkeypatch.setattr(backup, 'BACKUP_KEEP_DAILY', 0)
+    monkeypatch.setattr(backup, 'BACKUP_FULL_EVERY', 1)
+
+    entries = []
+    for i in range(5):
+        add_item(conn)
+        entries.append(backup.snapshot(db_path, backup_dir))
+    # full, incremental, full, incremental, full
+    assert [bool(e.get('base')) for e in entries] == [False, True, False, True, False]
+
+    snapshots = backup.load_manifest(backup_dir)['snapshots']
+    # The newest two are the last full copy and an incremental, which needs its own full copy
+    assert [s['file'] for s in snapshots] == [e['file'] for e in entries[2:]]
+    assert manifest_files(backup_dir) == backup_files(backup_dir)
+    assert os.path.exists(os.path.join(backup_dir, 'pre_migration_manual.db'))
+    assert count_items(backup.restore(entries[3]['file'], str(tmp_path / 'restored.db'), backup_dir)) == 504
+
+    assert all(ok for _, ok in backup.verify(backup_dir))
+    with open(os.path.join(backup_dir, snapshots[-1]['file']), 'ab') as f:
+        f.write(b'corrupt')
+    assert dict(backup.verify(backup_dir))[snapshots[-1]['file']] is False
+    conn.close()
+
+
+def test_importing_database_has_no_side_effects():
+    # In a fresh interpreter: reloading the module here would replace the engine and db_session under other tests
+    root = os.path.dirname(os.path.abspath(__file__))
+    before = set(os.listdir(root))
+    subprocess.run([sys.executable, '-c', 'import database'], cwd=root, check=True)
+    assert set(os.listdir(root)) == before
+
+
+if __name__ == "__main__":
+    test_importing_database_has_no_side_effects()
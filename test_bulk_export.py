@@ -0,0 +1,49 @@
+import io
+import zipfile
+from datetime import datetime
+
+from main import app, db_session
+from models import Customer, Invoice, InvoiceItem, Payment, PaymentType
+import bulk_export
+import jobs
+
+
+def test_bulk_export_zip(app_db, tmp_path, monkeypatch):
+    # app_db already gives the PDF cache its own directory
+    monkeypatch.setattr(bulk_export, 'EXPORT_DIR', str(tmp_path / 'exports'))
+    monkeypatch.setattr(bulk_export, 'EXPORT_PROCESSES', 2)
+    period = datetime(1990, 1, 15)
+    with app.app_context():
+        customer = Customer(identification_number='EXP1', name='Export', surname='Test', date_created=period)
+        db_session.add(customer)
+        invoice_ids = []
+        for i in range(3):
+            invoice = Invoice(customer_id=customer.identification_number, total_amount=10.0, paid_amount=5.0,
+                              balance_due=5.0, date_created=period)
+            db_session.add(invoice)
+            db_session.flush()
+            db_session.add(InvoiceItem(invoice_id=invoice.id, quantity=1, unit_price=10.0, amount=10.0,
+                                       description=f'Export line {i}', item_code='EXP'))
+            db_session.add(Payment(invoice_id=invoice.id, amount=5.0, payment_method=PaymentType.CASH,
+                                   payment_date=period))
+            invoice_ids.append(invoice.id)
+        db_session.commit()
+
+        client = app.test_client()
+        response = client.post('/exports', data={'start': '1990-01-01', 'end': '1990-02-01'})
+        assert response.status_code == 202
+        status_url = response.get_json()['status_url']
+        assert client.get(status_url).get_json()['state'] == 'queued'
+
+        # What `python jobs.py worker` does in production
+        jobs.run_pending(db_session)
+        status = client.get(status_url).get_json()
+        assert status['state'] == 'done', status
+        assert client.get(status['job_url']).get_json()['status'] == 'DONE'
+
+        archive = zipfile.ZipFile(io.BytesIO(client.get(status['download_url']).data))
+        names = archive.namelist()
+        assert all(f'invoices/Invoice_{i}_Export_Test.pdf' in names for i in invoice_ids)
+        assert all(archive.read(name).startswith(b'%PDF') for name in names)
+
+        assert client.get('/exports/not-an-export').status_code == 404
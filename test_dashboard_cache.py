@@ -0,0 +1,54 @@
+import dashboard_cache
+from main import app, db_session
+from models import Customer, Invoice
+
+
+def count_rebuilds(monkeypatch):
+    """Wrap compute_dashboard_metrics so the test can see when the cache is rebuilt"""
+    rebuilds = []
+    compute = dashboard_cache.compute_dashboard_metrics
+
+    def counted(session):
+        rebuilds.append(1)
+        return compute(session)
+
+    monkeypatch.setattr(dashboard_cache, 'compute_dashboard_metrics', counted)
+    return rebuilds
+
+
+def test_dashboard_is_served_from_cache_within_ttl(app_db, monkeypatch):
+    rebuilds = count_rebuilds(monkeypatch)
+    clock = [1000.0]
+    monkeypatch.setattr(dashboard_cache.time, 'monotonic', lambda: clock[0])
+    client = app.test_client()
+
+    assert client.get('/').status_code == 200
+    clock[0] += dashboard_cache.DASHBOARD_CACHE_TTL - 1
+    assert client.get('/').status_code == 200
+    assert len(rebuilds) == 1, "a second visit within the TTL should not recompute"
+
+    clock[0] += 2
+    client.get('/')
+    assert len(rebuilds) == 2, "the counters are recomputed once the TTL has passed"
+
+
+def test_invoice_and_payment_writes_rebuild_the_dashboard(app_db, monkeypatch):
+    rebuilds = count_rebuilds(monkeypatch)
+    client = app.test_client()
+    with app.app_context():
+        db_session.add(Customer(identification_number='DC1', name='Dashboard'))
+        db_session.commit()
+    client.get('/')
+
+    client.post('/invoices/add', data={'customer_identification': 'DC1', 'activity_type_id': '',
+                                       'item_id[]': 'custom', 'quantity[]': '1', 'unit_price[]': '50',
+                                       'custom_item_name[]': 'Site visit'})
+    with app.app_context():
+        invoice_id = db_session.query(Invoice.id).filter_by(customer_id='DC1').scalar()
+    assert invoice_id is not None
+    client.get('/')
+    assert len(rebuilds) == 2, "adding an invoice should invalidate the cached dashboard"
+
+    client.post(f'/invoice/{invoice_id}/add_payment', data={'amount': '20', 'payment_method': 'CASH'})
+    client.get('/')
+    assert len(rebuilds) == 3, "recording a payment should invalidate the cached dashboard"
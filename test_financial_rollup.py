@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import reports
+from main import app, db_session
+from models import Customer, Inventory, Invoice, Payment, StockTransaction, TransactionType, quotation, quotationItem
+
+BACKDATED = datetime(2025, 1, 15)
+
+
+def assert_rollup_in_sync(step):
+    with app.app_context():
+        drifted = reports.rebuild_financial_summary(db_session, check_only=True)
+    assert drifted == [], f"rollup drifted after {step}: {drifted}"
+
+
+def test_rollup_stays_in_sync_with_every_write(app_db):
+    client = app.test_client()
+    with app.app_context():
+        db_session.add(Customer(identification_number='FR1', name='Rollup'))
+        db_session.commit()
+
+    client.post('/inventory/add', data={'name': 'Rollup item', 'brand': '', 'category': 'Lookup',
+                                        'specifications': '', 'quantity': '10', 'unit_price': '30',
+                                        'supplier_id': ''})
+    with app.app_context():
+        item_id = db_session.query(Inventory.id).filter_by(name='Rollup item').scalar()
+    client.post('/inventory/stock_in', data={'item_id': str(item_id), 'quantity': '5', 'unit_price': '12'})
+    assert_rollup_in_sync('stock in')
+
+    form = {'customer_identification': 'FR1', 'activity_type_id': '', 'item_id[]': str(item_id),
+            'quantity[]': '3', 'unit_price[]': '30', 'custom_item_name[]': ''}
+    client.post('/invoices/add', data=form)
+    assert_rollup_in_sync('adding an invoice')
+
+    # An invoice from an earlier month: its stock still moves, and is costed, this month
+    with app.app_context():
+        invoice = db_session.query(Invoice).filter_by(customer_id='FR1').one()
+        invoice.date_created = BACKDATED
+        invoice_id = invoice.id
+        reports.rebuild_financial_summary(db_session)
+    client.post(f'/invoices/edit/{invoice_id}', data=dict(form, **{'quantity[]': '4'}))
+    assert_rollup_in_sync('editing an invoice')
+
+    client.post(f'/invoice/{invoice_id}/add_payment', data={'amount': '20', 'payment_method': 'CASH'})
+    assert_rollup_in_sync('adding a payment')
+    with app.app_context():
+        payment_id = db_session.query(Payment.id).filter_by(invoice_id=invoice_id).scalar()
+    client.post(f'/payments/delete/{payment_id}')
+    assert_rollup_in_sync('deleting a payment')
+
+    with app.app_context():
+        quote = quotation(customer_id='FR1', total_amount=60.0)
+        db_session.add(quote)
+        db_session.flush()
+        db_session.add(quotationItem(quotation_id=quote.id, inventory_id=item_id, quantity=2, unit_price=30.0))
+        db_session.commit()
+        quotation_id = quote.id
+    client.post(f'/quotations/{quotation_id}/convert')
+    assert_rollup_in_sync('converting a quotation')
+
+    client.post('/inventory/stock_out', data={'item_id': str(item_id), 'quantity': '1', 'reason': 'DAMAGED'})
+    assert_rollup_in_sync('stock out')
+
+    client.post(f'/invoices/delete/{invoice_id}')
+    assert_rollup_in_sync('deleting an invoice')
+
+    client.post(f'/inventory/delete/{item_id}')
+    assert_rollup_in_sync('deleting an inventory item')
+    with app.app_context():
+        assert db_session.query(Invoice).count() == 1
+
+
+def test_deleting_an_item_refreshes_the_months_its_returns_were_costed(app_db):
+    client = app.test_client()
+    with app.app_context():
+        item = Inventory(name='Returned item', quantity=8, unit_price=30.0, cost_price=10.0)
+        db_session.add(item)
+        db_session.flush()
+        item_id = item.id
+        for quantity, kind, reference_type, when in ((10, TransactionType.STOCK_IN, None, datetime(2025, 1, 2)),
+                                                     (-4, TransactionType.STOCK_OUT, 'invoice', datetime(2025, 1, 20)),
+                                                     (2, TransactionType.STOCK_IN, 'invoice_deletion',
+                                                      datetime(2025, 3, 5))):
+            db_session.add(StockTransaction(inventory_id=item_id, transaction_type=kind, quantity=quantity,
+                                            unit_cost=10.0, reference_type=reference_type, date_created=when))
+        db_session.commit()
+        reports.rebuild_financial_summary(db_session)
+        assert reports.load_summary(db_session, 2025, 3)[3].cogs == -20.0
+
+    client.post(f'/inventory/delete/{item_id}')
+    with app.app_context():
+        assert db_session.get(Inventory, item_id) is None
+        # No source rows are left in 2025, so the year is checked explicitly
+        assert reports.rebuild_financial_summary(db_session, 2025, check_only=True) == []
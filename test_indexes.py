@@ -0,0 +1,112 @@
+from datetime import datetime
+from contextlib import contextmanager
+
+import sqlalchemy as db
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import maintenance
+import reports
+from pagination import keyset_paginate, encode_cursor
+from models import Invoice, Payment, JourneyRecord, InvoiceItem, quotationItem, StockTransaction
+
+# Tables whose hot queries must be answered from an index rather than a full scan
+HOT_TABLES = ('invoices', 'invoice_items', 'payments', 'financial_records', 'stock_transactions',
+              'journey_records', 'quotation_items')
+# Whole-table aggregates that are expected to scan (reports.top_locations counts every journey)
+EXPECTED_SCANS = ('journey_records.end_location',)
+
+
+@contextmanager
+def capture_statements(bind):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(bind, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, 'before_cursor_execute', before_cursor_execute)
+
+
+def full_scans(bind, statements):
+    """(statement, plan line) for every hot table a statement reads without an index"""
+    problems = []
+    with bind.connect() as conn:
+        for statement, parameters in statements:
+            if any(marker in statement for marker in EXPECTED_SCANS):
+                continue
+            for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+                detail = row[-1]
+                words = detail.split()
+                if words[:1] == ['SCAN'] and words[1] in HOT_TABLES and 'INDEX' not in detail:
+                    problems.append((statement, detail))
+    return problems
+
+
+def test_financial_queries_use_indexes(make_engine):
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    with capture_statements(bind) as statements:
+        reports.compute_month(session, 2025, 3)
+        reports.financial_summary(session, 2025, 3)
+    session.close()
+    assert statements
+    problems = full_scans(bind, statements)
+    assert not problems, "\n\n".join(f"{detail}\n{statement}" for statement, detail in problems)
+
+
+def test_list_and_lookup_queries_use_indexes(make_engine):
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    cursor = {'after': encode_cursor(datetime(2025, 3, 1), 5)}
+    with capture_statements(bind) as statements:
+        for model, sort_column in ((Invoice, Invoice.date_created), (Payment, Payment.payment_date),
+                                   (JourneyRecord, JourneyRecord.start_time)):
+            keyset_paginate(session.query(model), sort_column, model.id, args={})
+            keyset_paginate(session.query(model), sort_column, model.id, args=cursor)
+        session.query(InvoiceItem).filter_by(invoice_id=1).all()
+        session.query(quotationItem).filter_by(quotation_id=1).all()
+        session.query(Payment).filter_by(invoice_id=1).all()
+        session.query(Invoice).filter_by(customer_id='X1').count()
+        session.query(StockTransaction.date_created).filter_by(inventory_id=1).all()
+    session.close()
+    problems = full_scans(bind, statements)
+    assert not problems, "\n\n".join(f"{detail}\n{statement}" for statement, detail in problems)
+
+
+def test_create_indexes_adds_missing_indexes_once(make_engine):
+    bind = make_engine()
+    with bind.begin() as conn:
+        conn.execute(db.text("DROP INDEX ix_invoices_date_created_id"))
+        conn.execute(db.text("DROP INDEX ix_payments_invoice_id"))
+    assert maintenance.create_indexes(bind) == ['ix_invoices_date_created_id', 'ix_payments_invoice_id']
+    assert maintenance.create_indexes(bind) == []
+
+
+
+def test_monthly_records_are_searched_by_type_then_date(make_engine):
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    with capture_statements(bind) as statements:
+        reports.compute_month(session, 2025, 3)
+    session.close()
+    statement, parameters = next((s, p) for s, p in statements if 'FROM financial_records' in s)
+    with bind.connect() as conn:
+        plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+    assert any('USING INDEX ix_financial_records_type_date (type=? AND date>? AND date<?)' in line
+               for line in plan), plan
+
+
+def test_create_indexes_drops_retired_indexes(make_engine):
+    bind = make_engine()
+    with bind.begin() as conn:
+        conn.execute(db.text("DROP INDEX ix_financial_records_type_date"))
+        conn.execute(db.text("CREATE INDEX ix_financial_records_date_type ON financial_records (date, type)"))
+    assert maintenance.create_indexes(bind) == ['ix_financial_records_type_date']
+    names = {ix['name'] for ix in db.inspect(bind).get_indexes('financial_records')}
+    assert 'ix_financial_records_date_type' not in names
+    assert 'ix_financial_records_type_date' in names
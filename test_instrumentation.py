@@ -0,0 +1,58 @@
+import logging
+
+import sqlalchemy as db
+from flask import Flask, render_template_string
+
+import instrumentation
+
+
+def make_app(bind, read_bind=None):
+    app = Flask(__name__)
+
+    @app.route('/items')
+    def items():
+        with bind.connect() as conn:
+            count = conn.execute(db.text("SELECT count(*) FROM inventory")).scalar()
+            conn.execute(db.text("SELECT count(*) FROM suppliers")).scalar()
+        return render_template_string("{{ count }} items", count=count)
+
+    @app.route('/report')
+    def report():
+        with (read_bind or bind).connect() as conn:
+            return str(conn.execute(db.text("SELECT count(*) FROM invoices")).scalar())
+
+    instrumentation.init_app(app, bind, read_bind or bind)
+    return app
+
+
+def test_server_timing_and_metrics(make_engine, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'registry', instrumentation.MetricsRegistry())
+    app = make_app(make_engine())
+    client = app.test_client()
+    response = client.get('/items')
+    assert response.get_data(as_text=True) == '0 items'
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('app;dur=') and 'desc="2 queries"' in timing and 'render;dur=' in timing
+
+    metrics = client.get('/_metrics').get_data(as_text=True)
+    assert 'http_request_sql_queries_bucket{route="/items",method="GET",le="2"} 1' in metrics
+    assert 'http_request_duration_seconds_count{route="/items",method="GET"} 1' in metrics
+    assert 'FROM inventory' in metrics, "slowest statements are listed"
+
+
+def test_read_engine_queries_are_counted(make_engine, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'registry', instrumentation.MetricsRegistry())
+    app = make_app(make_engine('primary.db'), make_engine('replica.db'))
+    client = app.test_client()
+    assert 'desc="1 queries"' in client.get('/report').headers['Server-Timing']
+    assert 'http_request_sql_queries_count{route="/report",method="GET"} 1' in \
+        client.get('/_metrics').get_data(as_text=True)
+
+
+def test_slow_requests_are_logged(make_engine, monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation, 'SLOW_REQUEST_SQL_MS', 0)
+    app = make_app(make_engine())
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        app.test_client().get('/items')
+    assert "Slow request GET /items: 2 queries" in caplog.text
+    assert "SELECT count(*) FROM suppliers" in caplog.text
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from main import app, db_session
+from models import Job, JobStatus
+import jobs
+
+calls = []
+
+
+@jobs.handler('test_flaky')
+def flaky(session, payload):
+    calls.append(payload)
+    if len(calls) < payload['succeed_on']:
+        raise RuntimeError('transient failure')
+    return {'calls': len(calls)}
+
+
+def test_retry_then_succeed(app_db):
+    calls.clear()
+    with app.app_context():
+        job = jobs.submit(db_session, 'test_flaky', {'succeed_on': 2}, max_attempts=3)
+        job_id = job.id
+
+        ran = jobs.run_job(db_session, jobs.claim(db_session, 'test-worker'))
+        assert ran.id == job_id
+        job = db_session.get(Job, job_id)
+        assert job.status == JobStatus.QUEUED and job.attempts == 1
+        assert job.run_after > datetime.utcnow(), "a failed attempt should back off"
+        assert 'transient failure' in job.error
+
+        # Make the retry due now instead of waiting for the backoff
+        job.run_after = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+        jobs.run_job(db_session, jobs.claim(db_session, 'test-worker'))
+        job = db_session.get(Job, job_id)
+        assert job.status == JobStatus.DONE and job.attempts == 2
+        assert jobs.job_status(job)['result'] == {'calls': 2}
+
+
+def test_gives_up_after_max_attempts(app_db):
+    calls.clear()
+    with app.app_context():
+        job = jobs.submit(db_session, 'test_flaky', {'succeed_on': 99}, max_attempts=1)
+        jobs.run_job(db_session, jobs.claim(db_session, 'test-worker'))
+        job = db_session.get(Job, job.id)
+        assert job.status == JobStatus.FAILED and job.date_finished is not None
+
+
+def test_claim_is_exclusive_and_stale_jobs_requeue(app_db):
+    with app.app_context():
+        job = jobs.submit(db_session, 'test_flaky', {'succeed_on': 1})
+        claimed = jobs.claim(db_session, 'worker-a')
+        assert claimed.id == job.id and claimed.locked_by == 'worker-a'
+        # Another worker sees nothing runnable while the job is RUNNING
+        assert jobs.claim(db_session, 'worker-b') is None
+
+        claimed.locked_at = datetime.utcnow() - timedelta(seconds=jobs.JOB_LOCK_TIMEOUT + 1)
+        db_session.commit()
+        assert jobs.requeue_stale(db_session) >= 1
+        assert jobs.claim(db_session, 'worker-b').locked_by == 'worker-b'
+        jobs.run_job(db_session, db_session.get(Job, job.id))
+
+
+def test_status_api(app_db):
+    with app.app_context():
+        client = app.test_client()
+        response = client.post('/jobs', json={'kind': 'test_flaky', 'payload': {'succeed_on': 1}})
+        assert response.status_code == 202
+        status_url = response.get_json()['status_url']
+        assert client.get(status_url).get_json()['status'] == 'QUEUED'
+        jobs.run_pending(db_session)
+        assert client.get(status_url).get_json()['status'] == 'DONE'
+        assert client.post('/jobs', json={'kind': 'nope'}).status_code == 400
+        assert client.get('/jobs/999999999').status_code == 404
+
@@ -0,0 +1,72 @@
+import sqlalchemy as db
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from werkzeug.datastructures import MultiDict
+
+import line_items
+from models import Inventory
+
+LINES = 60
+
+
+def make_session(make_engine):
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    session.add_all([Inventory(name=f'Panel {i}', quantity=5, unit_price=100.0, cost_price=60.0,
+                               specifications=f'SPEC-{i}') for i in range(LINES)])
+    session.commit()
+    return bind, session
+
+
+def form(*rows):
+    """MultiDict shaped like the invoice/quotation form from (item_id, quantity, unit_price, custom_name) rows"""
+    data = MultiDict()
+    for item_id, quantity, unit_price, custom_name in rows:
+        data.add('item_id[]', str(item_id))
+        data.add('quantity[]', str(quantity))
+        data.add('unit_price[]', str(unit_price))
+        data.add('custom_item_name[]', custom_name)
+    return data
+
+
+def expect_error(message, session, data, **kwargs):
+    try:
+        line_items.load(session, data, **kwargs)
+    except line_items.LineItemError as e:
+        assert str(e) == message, str(e)
+    else:
+        assert False, f"expected LineItemError({message!r})"
+
+
+def test_large_quote_loads_inventory_in_one_query(make_engine):
+    bind, session = make_session(make_engine)
+    rows = [(i + 1, 2, 110.0, '') for i in range(LINES)] + [('custom', 1, 25.5, 'Cabling labour'), ('', 1, 1, '')]
+    statements = []
+    event.listen(bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    lines = line_items.load(session, form(*rows), check_stock=True)
+
+    assert len(statements) == 1 and ' IN ' in statements[0], statements
+    assert len(lines) == LINES + 1
+    assert lines.total == LINES * 2 * 110.0 + 25.5
+    first, custom = lines.lines[0], lines.lines[-1]
+    assert (first.inventory_id, first.description, first.item_code('CUST')) == (1, 'Panel 0', 'SPEC-0')
+    assert custom.is_custom and custom.inventory_id is None
+    assert (custom.description, custom.item_code('CUST-1'), custom.position) == ('Cabling labour', 'CUST-1', LINES)
+
+
+def test_stock_is_checked_across_repeated_lines(make_engine):
+    bind, session = make_session(make_engine)
+    data = form((1, 3, 100, ''), (1, 3, 100, ''))
+    expect_error('Insufficient stock for Panel 0. Available: 5', session, data, check_stock=True)
+    assert len(line_items.load(session, data)) == 2, "quotations may be edited beyond stock"
+    # Stock held by the lines of the invoice being edited counts as available
+    assert len(line_items.load(session, data, check_stock=True, released={1: 1})) == 2
+
+
+def test_invalid_lines_are_rejected(make_engine):
+    bind, session = make_session(make_engine)
+    expect_error('Custom item name is required', session, form(('custom', 1, 10, ' ')))
+    expect_error('Item not found', session, form((LINES + 1, 1, 10, '')))
+    expect_error('Line 1: quantity and unit price must be numbers', session, form((1, 'two', 10, '')))
+    expect_error('Line 1: quantity must be at least 1', session, form((1, 0, 10, '')))
+
@@ -0,0 +1,79 @@
+import search_index
+from main import app, db_session
+from models import Customer, Inventory
+
+SEED_ROWS = 7
+
+
+def seed(rows=SEED_ROWS):
+    customers = [Customer(identification_number=f'LK{i}', name='Lookup', surname=f'Cust{i}') for i in range(rows)]
+    items = [Inventory(name=f'Lookup item {i}', brand='Test', category='Lookup', quantity=i,
+                       unit_price=10.0 + i, cost_price=5.0 + i) for i in range(rows)]
+    with app.app_context():
+        db_session.add_all(customers + items)
+        for customer in customers:
+            search_index.index(db_session, 'customers', customer)
+        for item in items:
+            search_index.index(db_session, 'inventory', item)
+        db_session.commit()
+        return [c.identification_number for c in customers], [i.id for i in items]
+
+
+def follow(client, url):
+    """Every result reachable from url by following next links, plus the number of pages"""
+    results, pages = [], 0
+    while url:
+        data = client.get(url).get_json()
+        results.extend(data['results'])
+        url = data['next']
+        pages += 1
+    return results, pages
+
+
+def test_lookup_pages_through_every_row_once(app_db):
+    seed(120)
+    client = app.test_client()
+    results, pages = follow(client, '/lookup/customers?limit=50')
+    ids = [r['id'] for r in results]
+    assert len(ids) == len(set(ids)) == 120
+    assert pages == 3
+    names = [(r['name'], r['id']) for r in results]
+    assert names == sorted(names)
+    assert client.get('/lookup/suppliers').status_code == 404
+
+
+def test_lookup_search_and_stock_filter(app_db):
+    customer_ids, item_ids = seed()
+    client = app.test_client()
+    results, pages = follow(client, '/lookup/customers?q=lookup&limit=3')
+    assert sorted(r['id'] for r in results) == sorted(customer_ids)
+    assert pages == 3
+
+    items, _ = follow(client, '/lookup/inventory?q=lookup&in_stock=1&limit=50')
+    assert sorted(r['id'] for r in items) == item_ids[1:], "the item with no stock is left out"
+    first = next(r for r in items if r['id'] == item_ids[1])
+    assert (first['quantity'], first['unit_price'], first['cost_price']) == (1, 11.0, 6.0)
+
+
+def test_lookup_search_pages_past_max_results(app_db):
+    rows = search_index.MAX_RESULTS + 30
+    customer_ids, item_ids = seed(rows)
+    # Out-of-stock items that rank above the ones in stock must not use up the pages
+    with app.app_context():
+        db_session.query(Inventory).filter(Inventory.id.in_(item_ids[:search_index.MAX_RESULTS])) \
+            .update({Inventory.quantity: 0}, synchronize_session=False)
+        db_session.commit()
+    client = app.test_client()
+    results, _ = follow(client, '/lookup/customers?q=lookup&limit=50')
+    assert sorted(r['id'] for r in results) == sorted(customer_ids)
+    items, _ = follow(client, '/lookup/inventory?q=lookup&in_stock=1&limit=50')
+    assert sorted(r['id'] for r in items) == item_ids[search_index.MAX_RESULTS:]
+
+
+def test_form_pages_do_not_embed_customers(app_db):
+    seed()
+    client = app.test_client()
+    for url in ('/invoices/add', '/quotations/add'):
+        body = client.get(url).get_data(as_text=True)
+        assert 'Cust0' not in body, url
+        assert '/lookup/customers' in body and '/lookup/inventory' in body, url
@@ -0,0 +1,85 @@
+import os
+import sys
+import subprocess
+from datetime import datetime
+
+import sqlalchemy as db
+
+import maintenance
+
+
+def make_legacy_database(make_engine):
+    bind = make_engine('legacy.db', tables=False)
+    with bind.begin() as conn:
+        conn.execute(db.text("CREATE TABLE quotations (id INTEGER PRIMARY KEY, status VARCHAR(50))"))
+        conn.execute(db.text("CREATE TABLE payments (id INTEGER PRIMARY KEY, payment_method VARCHAR(8))"))
+        conn.execute(db.text("INSERT INTO quotations (status) VALUES ('pending'), (' Paid '), ('PAID'), ('draft')"))
+        conn.execute(db.text("INSERT INTO payments (payment_method) VALUES ('ecocash'), ('CASH')"))
+    return bind
+
+
+def test_normalize_enums(make_engine):
+    bind = make_legacy_database(make_engine)
+    assert maintenance.normalize_enums(bind) == 3
+    assert maintenance.normalize_enums(bind) == 0
+    with bind.connect() as conn:
+        statuses = [r[0] for r in conn.execute(db.text("SELECT status FROM quotations ORDER BY id"))]
+        methods = [r[0] for r in conn.execute(db.text("SELECT payment_method FROM payments ORDER BY id"))]
+    # Values outside the enum are left for a human to look at
+    assert statuses == ['PENDING', 'PAID', 'PAID', 'draft']
+    assert methods == ['ECOCASH', 'CASH']
+
+
+def test_lock_is_exclusive(make_engine):
+    bind = make_legacy_database(make_engine)
+    with maintenance.maintenance_lock(bind):
+        try:
+            with maintenance.maintenance_lock(bind, timeout=0.3):
+                assert False, "lock acquired twice"
+        except TimeoutError:
+            pass
+    with maintenance.maintenance_lock(bind, timeout=0.3):
+        pass
+
+
+def test_financial_summary_step_backfills_missing_months(make_engine):
+    from sqlalchemy.orm import sessionmaker
+    from models import FinancialRecord, FinancialType, MonthlyFinancialSummary
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    session.add_all([FinancialRecord(type=FinancialType.EXPENSE, category='Rent', amount=100.0,
+                                     date=datetime(2025, 1, 10)),
+                     FinancialRecord(type=FinancialType.EXPENSE, category='Rent', amount=120.0,
+                                     date=datetime(2025, 3, 10)),
+                     MonthlyFinancialSummary(year=2025, month=1, expenses=100.0)])
+    session.commit()
+    assert maintenance.backfill_financial_summary(bind) == [(2025, 2), (2025, 3)]
+    assert maintenance.backfill_financial_summary(bind) == []
+    expenses = dict(session.query(MonthlyFinancialSummary.month, MonthlyFinancialSummary.expenses))
+    assert expenses == {1: 100.0, 2: 0.0, 3: 120.0}
+    session.close()
+
+
+def test_importing_main_skips_pdf_stack_and_database():
+    code = ("import sys, main; "
+            "print('loaded:' + ','.join(m for m in ('reportlab', 'PIL', 'pdf_engine') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.stdout.strip().endswith('loaded:'), result.stdout
+    assert 'initialize database' not in result.stdout
+
+
+
+def test_create_app_builds_a_new_app_each_call():
+    import main
+    other = main.create_app({'TESTING': True})
+    assert other is not main.app and other.testing and not main.app.testing
+    assert sorted(r.endpoint for r in other.url_map.iter_rules()) == \
+        sorted(r.endpoint for r in main.app.url_map.iter_rules())
+    # The lock retry wraps the shared view once per app, not twice
+    assert other.view_functions['add_supplier'].__wrapped__ is main.add_supplier
+
+
+if __name__ == "__main__":
+    test_importing_main_skips_pdf_stack_and_database()
+    test_create_app_builds_a_new_app_each_call()
@@ -0,0 +1,145 @@
+from datetime import datetime
+
+import sqlalchemy as db
+from sqlalchemy.orm import sessionmaker
+
+import maintenance
+import migrations
+from models import (Inventory, StockTransaction, StockSnapshot, MonthlyFinancialSummary, TransactionType)
+
+
+def make_legacy_database(make_engine):
+    # Customers still keyed by an integer id, no document numbers or balances yet
+    bind = make_engine('legacy.db', tables=False)
+    with bind.begin() as conn:
+        conn.execute(db.text("CREATE TABLE customers (id INTEGER PRIMARY KEY, identification_number VARCHAR(50), "
+                             "name VARCHAR(100))"))
+        conn.execute(db.text("CREATE TABLE quotations (id INTEGER PRIMARY KEY, customer_id INTEGER, status VARCHAR(50))"))
+        conn.execute(db.text("CREATE TABLE invoices (id INTEGER PRIMARY KEY, customer_id INTEGER, status VARCHAR(20), "
+                             "total_amount FLOAT)"))
+        conn.execute(db.text("CREATE TABLE invoice_items (id INTEGER PRIMARY KEY, invoice_id INTEGER, quantity INTEGER, "
+                             "unit_price FLOAT)"))
+        conn.execute(db.text("CREATE TABLE payments (id INTEGER PRIMARY KEY, payment_method VARCHAR(8))"))
+        conn.execute(db.text("INSERT INTO customers VALUES (1, '00001', 'Alice'), (2, '00002', 'bob')"))
+        conn.execute(db.text("INSERT INTO quotations (customer_id, status) VALUES (1, 'PENDING'), (1, 'PAID'), "
+                             "(1, 'PENDING'), (9, 'PENDING')"))
+        conn.execute(db.text("INSERT INTO invoices (customer_id, status, total_amount) VALUES (1, 'PENDING', 100.0), "
+                             "(2, 'SENT', 50.0)"))
+        conn.execute(db.text("INSERT INTO invoice_items (invoice_id, quantity, unit_price) VALUES (1, 2, 25.0), "
+                             "(1, 1, 50.0)"))
+    return bind
+
+
+def column(bind, sql):
+    with bind.connect() as conn:
+        return [row[0] for row in conn.execute(db.text(sql))]
+
+
+def test_migrate_upgrades_a_legacy_database_once(make_engine):
+    bind = make_legacy_database(make_engine)
+    first = migrations.migrate(bind, target=2)
+    assert list(first) == ['legacy-columns', 'updated-at-columns']
+    assert {'payments.payer_name', 'payments.transaction_id', 'invoices.balance_due'} <= set(first['legacy-columns'])
+    assert 'quotations.updated_at' in first['updated-at-columns']
+
+    rest = migrations.migrate(bind, chunk_size=2)
+    assert list(rest) == ['customer-references', 'invoice-amounts', 'enum-labels', 'document-numbers',
+                          'fifo-valuation', 'customer-primary-key']
+    assert rest['customer-primary-key'] == 2
+    inspector = db.inspect(bind)
+    assert inspector.get_pk_constraint('customers')['constrained_columns'] == ['identification_number']
+    for table in ('quotations', 'invoices'):
+        references = [(fk['referred_table'], fk['referred_columns']) for fk in inspector.get_foreign_keys(table)
+                      if fk['constrained_columns'] == ['customer_id']]
+        assert references == [('customers', ['identification_number'])], f"{table}.customer_id lost its reference"
+    assert column(bind, "SELECT name FROM customers ORDER BY identification_number") == ['Alice', 'bob']
+    assert None not in column(bind, "SELECT updated_at FROM customers"), "rebuilt rows are picked up by the delta sync"
+    assert column(bind, "SELECT customer_id FROM quotations ORDER BY id") == ['00001', '00001', '00001', None]
+    assert column(bind, "SELECT quotation_number FROM quotations ORDER BY id") == \
+        ['AL00001', 'AL000011', 'AL000012', None]
+    assert column(bind, "SELECT invoice_number FROM invoices ORDER BY id") == ['AL00001', 'BO00002']
+    assert column(bind, "SELECT status FROM invoices ORDER BY id") == ['DRAFT', 'SENT']
+    assert column(bind, "SELECT balance_due FROM invoices ORDER BY id") == [100.0, 50.0]
+    assert column(bind, "SELECT amount FROM invoice_items ORDER BY id") == [50.0, 50.0]
+    assert None not in column(bind, "SELECT updated_at FROM invoices"), "changed rows are picked up by the delta sync"
+
+    assert migrations.migrate(bind) == {}, "applied migrations do not run again"
+    assert migrations.status(bind) == []
+    assert sorted(migrations.recorded(bind)) == sorted(migrations.MIGRATIONS)
+
+
+def test_duplicate_identification_numbers_stop_the_customer_rebuild(make_engine):
+    bind = make_legacy_database(make_engine)
+    with bind.begin() as conn:
+        conn.execute(db.text("INSERT INTO customers VALUES (3, '00002', 'Bobby')"))
+    try:
+        migrations.migrate(bind)
+        assert False, "duplicate identification numbers were accepted"
+    except RuntimeError as e:
+        assert "'00002'" in str(e)
+    assert migrations.status(bind) == [8], "left pending until the duplicates are fixed"
+    assert 'id' in {c['name'] for c in db.inspect(bind).get_columns('customers')}
+
+    with bind.begin() as conn:
+        conn.execute(db.text("UPDATE customers SET identification_number = '00003' WHERE id = 3"))
+    assert migrations.migrate(bind) == {'customer-primary-key': 3}
+
+
+def test_fifo_valuation_drops_stale_rollups_and_snapshots(make_engine):
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    session.add(Inventory(id=1, name='Panel', cost_price=40.0))
+    session.add_all([
+        StockTransaction(inventory_id=1, transaction_type=TransactionType.STOCK_IN, quantity=10, unit_cost=40.0,
+                         date_created=datetime(2025, 1, 3)),
+        StockTransaction(inventory_id=1, transaction_type=TransactionType.STOCK_OUT, quantity=-4, unit_price=90.0,
+                         total_value=-360.0, date_created=datetime(2025, 1, 9)),
+        # Written before FIFO: selling-price COGS and a snapshot without layers
+        MonthlyFinancialSummary(year=2025, month=1, cogs=360.0),
+        StockSnapshot(inventory_id=1, as_of=datetime(2025, 2, 1), quantity=6, value=240.0),
+    ])
+    session.commit()
+    migrations.migrate(bind, target=6)
+
+    assert migrations.migrate(bind, target=7, chunk_size=1) == {
+        'fifo-valuation': {'columns': [], 'snapshots_dropped': 1, 'months_dropped': 1}}
+    assert session.query(StockSnapshot).count() == 0
+    assert session.query(MonthlyFinancialSummary).count() == 0
+    session.rollback()
+
+    # The financial-summary maintenance step stores the month again at FIFO cost
+    assert maintenance.backfill_financial_summary(bind) == [(2025, 1)]
+    assert session.query(MonthlyFinancialSummary.cogs).filter_by(year=2025, month=1).scalar() == 160.0
+    session.close()
+
+
+def test_interrupted_data_migration_resumes_from_its_last_chunk(make_engine, monkeypatch):
+    bind = make_engine('items.db', tables=False)
+    with bind.begin() as conn:
+        conn.execute(db.text("CREATE TABLE items (id INTEGER PRIMARY KEY, done INTEGER DEFAULT 0)"))
+        conn.execute(db.text("INSERT INTO items (id) VALUES " + ", ".join(f"({i})" for i in range(1, 11))))
+    monkeypatch.setattr(migrations, 'MIGRATIONS', {})
+    chunks = []
+
+    @migrations.migration(1, 'mark-items')
+    def mark_items(step):
+        def mark(conn, rows):
+            chunks.append([row[0] for row in rows])
+            if len(chunks) == 4:
+                raise KeyboardInterrupt
+            return conn.execute(db.text(f"UPDATE items SET done = 1 WHERE done = 0 AND id <= {rows[-1][0]}")).rowcount
+        return step.in_chunks('items', mark)
+
+    try:
+        migrations.migrate(bind, chunk_size=3)
+        assert False, "migration was not interrupted"
+    except KeyboardInterrupt:
+        pass
+    assert column(bind, "SELECT count(*) FROM items WHERE done = 1") == [9]
+    assert migrations.status(bind) == [1]
+    assert migrations.recorded(bind)[1].progress == '{"items": 9}'
+
+    assert migrations.migrate(bind, chunk_size=3) == {'mark-items': 1}
+    assert chunks[4:] == [[10]], "resumes after the last committed chunk"
+    assert migrations.status(bind) == []
+
@@ -0,0 +1,50 @@
+import os
+import glob
+from datetime import datetime
+
+from main import app, db_session
+from models import Customer, Invoice, InvoiceItem
+import pdf_cache
+
+
+def test_invoice_pdf_cache_and_etag(app_db):
+    # app_db points PDF_CACHE_DIR at an empty temporary directory
+    with app.app_context():
+        customer = Customer(identification_number='PDF1', name='Cache', surname='Test', date_created=datetime.utcnow())
+        db_session.add(customer)
+        invoice = Invoice(customer_id=customer.identification_number, total_amount=50.0, paid_amount=0.0,
+                          balance_due=50.0, date_created=datetime.utcnow())
+        db_session.add(invoice)
+        db_session.flush()
+        db_session.add(InvoiceItem(invoice_id=invoice.id, quantity=1, unit_price=50.0, amount=50.0,
+                                   description='Cached item', item_code='CACHE'))
+        db_session.commit()
+        invoice_id = invoice.id
+
+        client = app.test_client()
+        url = f'/invoice/{invoice_id}/pdf'
+        first = client.get(url)
+        assert first.status_code == 200 and first.data.startswith(b'%PDF')
+        etag = first.headers['ETag']
+        assert len(glob.glob(os.path.join(pdf_cache.PDF_CACHE_DIR, f'invoice-{invoice_id}-*.pdf'))) == 1
+
+        # Same document: served from disk with the same ETag, or 304 when the client has it
+        assert client.get(url).headers['ETag'] == etag
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+        # Recording a payment changes the invoice, drops the cached file and the ETag
+        client.post(f'/invoice/{invoice_id}/add_payment', data={'amount': '20', 'payment_method': 'CASH'})
+        assert not glob.glob(os.path.join(pdf_cache.PDF_CACHE_DIR, f'invoice-{invoice_id}-*.pdf'))
+        after = client.get(url, headers={'If-None-Match': etag})
+        assert after.status_code == 200 and after.headers['ETag'] != etag
+
+
+def test_evict_keeps_most_recent(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, 'PDF_CACHE_DIR', str(tmp_path))
+    for i in range(3):
+        path = pdf_cache.get_or_render('quotation', i, f'etag{i}', lambda: b'%PDF' + b'x' * 100)
+        os.utime(path, (i, i))
+    pdf_cache.evict(max_bytes=250)
+    remaining = sorted(os.path.basename(p) for p in glob.glob(os.path.join(pdf_cache.PDF_CACHE_DIR, '*.pdf')))
+    assert remaining == ['quotation-1-etag1.pdf', 'quotation-2-etag2.pdf']
+
@@ -0,0 +1,54 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from reportlab import rl_config
+
+import pdf_engine
+
+CUSTOMER = SimpleNamespace(name='Engine', surname='Test')
+
+
+def sample_rows(count):
+    return [(f'CODE-{i}', f'Line item {i} ' + 'with a long wrapping description ' * 3, 2, 10.0, 20.0)
+            for i in range(count)]
+
+
+def test_render_quotation_reuses_assets():
+    quotation = SimpleNamespace(id=7, customer=CUSTOMER, date_created=datetime(2025, 3, 1), total_amount=40.0)
+    first = pdf_engine.render_quotation(quotation, sample_rows(2))
+    styles, logo = pdf_engine.get_styles(), pdf_engine.get_logo()
+    # A long document spills onto several pages and must not disturb the shared header
+    long_doc = pdf_engine.render_quotation(quotation, sample_rows(200))
+    second = pdf_engine.render_quotation(quotation, sample_rows(2))
+
+    assert first.startswith(b'%PDF') and long_doc.startswith(b'%PDF')
+    assert long_doc.count(b'/Type /Page\n') > 1
+    assert pdf_engine.get_styles() is styles and pdf_engine.get_logo() is logo
+    assert len(first) == len(second)
+
+
+def test_render_invoice_and_payment():
+    invoice = SimpleNamespace(id=9, customer=CUSTOMER, date_created=datetime(2025, 3, 2),
+                              status=SimpleNamespace(value='PARTIAL'), total_amount=40.0,
+                              paid_amount=15.0, balance_due=25.0)
+    payment = SimpleNamespace(id=3, invoice=invoice, amount=15.0, transaction_id='TX-1', reference_number=None,
+                              notes='Deposit', payment_date=datetime(2025, 3, 3),
+                              payment_method=SimpleNamespace(value='CASH'))
+    assert pdf_engine.render_invoice(invoice, sample_rows(3)).startswith(b'%PDF')
+    assert pdf_engine.render_payment(payment).startswith(b'%PDF')
+    assert pdf_engine.safe_filename(pdf_engine.customer_label(CUSTOMER)) == 'Engine_Test'
+
+
+def test_plain_streams_only_for_our_builds():
+    default = rl_config.useA85
+    quotation = SimpleNamespace(id=8, customer=CUSTOMER, date_created=datetime(2025, 3, 1), total_amount=20.0)
+    pdf = pdf_engine.render_quotation(quotation, sample_rows(1))
+    assert b'/Subtype /Image' in pdf, "the logo is embedded"
+    assert b'/ASCII85Decode' not in pdf
+    assert rl_config.useA85 == default, "the process-wide ReportLab setting is restored"
+
+
+if __name__ == "__main__":
+    test_render_quotation_reuses_assets()
+    test_render_invoice_and_payment()
+    test_plain_streams_only_for_our_builds()
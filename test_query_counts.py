@@ -0,0 +1,145 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+import reports
+from main import app, db_session
+from models import (Supplier, Customer, Inventory, Activity, ActivityType, quotation, Invoice, InvoiceItem,
+                    Payment, FuelRecord, MileageRecord, JourneyRecord, PaymentType, FinancialRecord,
+                    FinancialType, InvoiceStatus)
+
+# Route -> maximum number of SQL statements allowed to render one page
+LIST_ROUTE_QUERY_BUDGET = {
+    '/suppliers': 1,
+    '/customers': 1,
+    '/inventory': 3,
+    '/quotations': 1,
+    '/activities': 2,
+    '/invoices': 1,
+    '/payments': 1,
+    '/fuel_tracking': 2,
+    '/mileage_tracking': 2,
+    '/journey_tracking': 1,
+}
+
+SEED_ROWS = 12
+
+
+@contextmanager
+def count_queries(bind):
+    """Collect every SQL statement executed on bind inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, 'before_cursor_execute', before_cursor_execute)
+
+
+def assert_route_queries(client, bind, url, max_queries):
+    """GET url and assert it renders within max_queries SQL statements"""
+    with count_queries(bind) as statements:
+        response = client.get(url)
+    assert response.status_code == 200, f"GET {url} returned {response.status_code}"
+    assert len(statements) <= max_queries, (
+        f"GET {url} ran {len(statements)} queries (budget {max_queries}):\n" + "\n".join(statements)
+    )
+    return len(statements)
+
+
+def seed_list_data():
+    """Add rows with distinct related objects so any lazy load shows up as extra queries"""
+    now = datetime.utcnow()
+    activity_type = ActivityType(name='QC Type')
+    db_session.add(activity_type)
+    for i in range(SEED_ROWS):
+        supplier = Supplier(name=f'QC Supplier {i}', date_created=now)
+        customer = Customer(identification_number=f'QC{i}', name=f'QC{i}', date_created=now)
+        db_session.add_all([supplier, customer])
+        db_session.flush()
+
+        db_session.add(Inventory(name=f'QC Item {i}', quantity=1, unit_price=1.0,
+                                 supplier_id=supplier.id, date_created=now))
+        db_session.add(quotation(customer_id=customer.identification_number, total_amount=1.0, date_created=now))
+        db_session.add(Activity(customer_id=customer.identification_number, activity_type_id=activity_type.id,
+                                description='Query count check', date=now))
+        invoice = Invoice(customer_id=customer.identification_number, total_amount=1.0, balance_due=0.0,
+                          date_created=now)
+        db_session.add(invoice)
+        db_session.flush()
+        db_session.add(Payment(invoice_id=invoice.id, amount=1.0, payment_method=PaymentType.CASH, payment_date=now))
+        db_session.add(FuelRecord(vehicle_id='QC-1', quantity_liters=1.0, price_per_liter=1.0, total_cost=1.0, date=now))
+        db_session.add(MileageRecord(vehicle_id='QC-1', distance_km=1.0, date=now))
+        db_session.add(JourneyRecord(vehicle_id='QC-1', start_location='QC', start_time=now))
+    db_session.commit()
+
+
+def test_list_route_query_counts(app_db):
+    with app.app_context():
+        seed_list_data()
+        client = app.test_client()
+        # Warm-up request so one-time startup work is not counted
+        client.get('/_health')
+        for url, budget in LIST_ROUTE_QUERY_BUDGET.items():
+            used = assert_route_queries(client, app_db, url, budget)
+            print(f"GET {url}: {used} queries (budget {budget})")
+
+
+
+SUMMARY_YEAR = 2024
+
+
+def seed_financial_month(month):
+    """Add one month of invoices, payments and income/expense records"""
+    date = datetime(SUMMARY_YEAR, month, 10)
+    invoice = Invoice(total_amount=100.0 * month, balance_due=0.0, status=InvoiceStatus.PAID, date_created=date)
+    db_session.add(invoice)
+    db_session.flush()
+    db_session.add(InvoiceItem(invoice_id=invoice.id, description=f'Labour {month}', quantity=1,
+                               unit_price=100.0 * month, amount=100.0 * month))
+    db_session.add(Payment(invoice_id=invoice.id, amount=50.0 * month, payment_method=PaymentType.CASH,
+                           payment_date=date))
+    db_session.add(FinancialRecord(type=FinancialType.EXPENSE, category='Rent', amount=10.0 * month, date=date))
+    db_session.add(FinancialRecord(type=FinancialType.INCOME, category='Interest', amount=5.0 * month, date=date))
+    reports.refresh_financial_summary(db_session, date)
+    db_session.commit()
+
+
+def count_summary_queries(bind, month):
+    with count_queries(bind) as statements:
+        reports.financial_summary(db_session, SUMMARY_YEAR, month)
+    return len(statements)
+
+
+def test_financial_summary_matches_source_rows(app_db):
+    for month in (1, 2, 6):
+        seed_financial_month(month)
+
+    assert reports.rebuild_financial_summary(db_session, check_only=True) == []
+    summary = reports.financial_summary(db_session, SUMMARY_YEAR, 6)
+    totals, expenses_by_category = reports.compute_month(db_session, SUMMARY_YEAR, 6)
+    assert summary['total_sales'] == totals['revenue'] == 600.0
+    assert summary['total_expenses'] == totals['expenses'] == 60.0
+    assert summary['other_income'] == totals['other_income'] == 30.0
+    assert summary['expense_breakdown'] == expenses_by_category == {'Rent': 60.0}
+    assert summary['income_by_source'] == {'Stock Sales': totals['stock_revenue'],
+                                           'Services/Labor': totals['service_revenue']}
+    assert summary['monthly_revenue_data'] == [
+        reports.compute_month(db_session, SUMMARY_YEAR, m)[0]['revenue'] for m in range(1, 13)
+    ]
+
+
+def test_financial_summary_query_count_is_flat_across_months(app_db):
+    seed_financial_month(1)
+    # First call backfills the rollup; only steady-state reads are counted
+    reports.financial_summary(db_session, SUMMARY_YEAR, 1)
+    one_month = count_summary_queries(app_db, 1)
+
+    for month in range(2, 13):
+        seed_financial_month(month)
+    assert count_summary_queries(app_db, 12) == one_month
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import sqlalchemy as db
+from sqlalchemy.orm import sessionmaker
+
+import sqlite_profile
+import valuation
+import database
+from database import db_session, is_read_only
+from main import app
+from models import Inventory, StockSnapshot, StockTransaction, TransactionType
+
+
+def test_read_only_block_routes_db_session_to_the_read_engine():
+    with app.app_context():
+        outer = db_session()
+        with database.read_only() as session:
+            assert db_session() is session and is_read_only(session)
+            assert session.get_bind() is database.read_engine
+            db_session.query(Inventory.id).first()
+            try:
+                db_session.execute(db.text("UPDATE inventory SET quantity = quantity WHERE id = -1"))
+                assert False, "read-only session accepted a write"
+            except db.exc.OperationalError as e:
+                assert 'readonly' in str(e) or 'read-only' in str(e)
+        assert db_session() is outer and not is_read_only(outer)
+
+
+def test_report_routes_are_read_only():
+    client = app.test_client()
+    assert client.get('/financial').status_code == 200
+    view = app.view_functions['financial']
+    assert view.__wrapped__.__name__ == 'financial', "@read_only() wraps the view"
+
+
+def test_statement_timeout_interrupts_long_reads(make_engine):
+    writer = make_engine('timeout.db', tables=False)
+    writer.connect().close()
+    engine = db.create_engine(f'sqlite:///file:{writer.url.database}?mode=ro&uri=true')
+    sqlite_profile.configure(engine, read_only=True, statement_timeout_ms=50)
+    endless = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+    with engine.connect() as conn:
+        try:
+            conn.exec_driver_sql(endless).scalar()
+            assert False, "statement was not interrupted"
+        except db.exc.OperationalError as e:
+            assert 'interrupted' in str(e)
+        assert conn.exec_driver_sql('SELECT 1').scalar() == 1, "the connection is still usable"
+
+
+def test_read_only_balance_sheet_values_without_storing_snapshots(make_engine):
+    engine = make_engine()
+    session = sessionmaker(bind=engine)()
+    session.add(Inventory(id=1, name='Panel', cost_price=0.0))
+    session.add(StockTransaction(inventory_id=1, transaction_type=TransactionType.STOCK_IN, quantity=4,
+                                 unit_cost=25.0, date_created=datetime(2025, 1, 10)))
+    session.commit()
+
+    reader = sessionmaker(bind=engine, info={'read_only': True})()
+    assert valuation.closing_value(reader, 2025, 1) == 100.0
+    assert session.query(StockSnapshot).count() == 0
+
+
+if __name__ == "__main__":
+    test_read_only_block_routes_db_session_to_the_read_engine()
+    test_report_routes_are_read_only()
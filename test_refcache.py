@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+from main import app, db_session
+import refcache
+
+
+def check_version_stamps(backend):
+    cache = refcache.ReferenceCache(backend)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return ['v%d' % len(loads)]
+
+    assert cache.get('things', loader) == ['v1']
+    assert cache.get('things', loader) == ['v1']
+    assert len(loads) == 1, "second read should be served from the cache"
+
+    cache.invalidate('things')
+    assert cache.get('things', loader) == ['v2']
+    assert len(loads) == 2, "bumping the version should force a reload"
+
+
+def test_lru_backend():
+    check_version_stamps(refcache.LRUBackend())
+
+
+def test_sqlite_backend_shared_between_caches():
+    path = os.path.join(tempfile.mkdtemp(), 'refcache.db')
+    check_version_stamps(refcache.SQLiteBackend(path))
+
+    # Two caches on the same file behave like two workers
+    worker_a = refcache.ReferenceCache(refcache.SQLiteBackend(path))
+    worker_b = refcache.ReferenceCache(refcache.SQLiteBackend(path))
+    assert worker_a.get('shared', lambda: ['a']) == ['a']
+    assert worker_b.get('shared', lambda: ['b']) == ['a']
+    worker_b.invalidate('shared')
+    assert worker_a.get('shared', lambda: ['c']) == ['c']
+
+
+def test_supplier_write_invalidates_form_data(app_db):
+    with app.app_context():
+        before = {s.name for s in refcache.suppliers(db_session)}
+        name = 'Refcache Supplier'
+        client = app.test_client()
+        client.post('/suppliers/add', data={'name': name, 'contact_person': '', 'phone': '', 'email': '',
+                                            'address': '', 'payment_terms': '', 'currency': ''})
+        after = {s.name for s in refcache.suppliers(db_session)}
+        assert name not in before
+        assert name in after
+
+
+if __name__ == "__main__":
+    test_lru_backend()
+    test_sqlite_backend_shared_between_caches()
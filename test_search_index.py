@@ -0,0 +1,95 @@
+import sqlalchemy as db
+from sqlalchemy.orm import sessionmaker
+
+import search_index
+from main import app, db_session
+from models import Inventory, Supplier
+
+
+def make_session(make_engine):
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    session.add_all([
+        Inventory(name='Solar Panel 450W', brand='Jinko', category='Panels', specifications='Mono PERC'),
+        Inventory(name='Inverter 5kVA', brand='Growatt', category='Inverters',
+                  specifications='Hybrid, pairs with a solar panel array'),
+        Inventory(name='Lithium Battery', brand='Pylontech', category='Batteries', specifications='48V 100Ah'),
+    ])
+    session.commit()
+    return bind, session
+
+
+def names(rows):
+    return [row.name for row in rows]
+
+
+def test_ranked_prefix_search(make_engine):
+    bind, session = make_session(make_engine)
+    search_index.build_index(bind)
+    # Both items mention a solar panel; the one named after it ranks first
+    assert names(search_index.search(session, 'inventory', 'sol pan')) == ['Solar Panel 450W', 'Inverter 5kVA']
+    assert names(search_index.search(session, 'inventory', 'pylon')) == ['Lithium Battery']
+    assert search_index.search(session, 'inventory', 'sol xyz') == []
+    assert search_index.search(session, 'inventory', '"*') == []
+
+    category = session.query(Inventory).filter(Inventory.category == 'Inverters')
+    assert names(search_index.search(session, 'inventory', 'solar', query=category)) == ['Inverter 5kVA']
+
+
+def test_index_follows_writes(make_engine):
+    bind, session = make_session(make_engine)
+    search_index.build_index(bind)
+    item = Inventory(name='Charge Controller', brand='Victron', category='Controllers')
+    session.add(item)
+    search_index.index(session, 'inventory', item)
+    session.commit()
+    assert names(search_index.search(session, 'inventory', 'victr')) == ['Charge Controller']
+
+    item.brand = 'Epever'
+    search_index.index(session, 'inventory', item)
+    session.commit()
+    assert search_index.search(session, 'inventory', 'victr') == []
+    assert names(search_index.search(session, 'inventory', 'epev')) == ['Charge Controller']
+
+    search_index.remove(session, 'inventory', item.id)
+    session.delete(item)
+    session.commit()
+    assert search_index.search(session, 'inventory', 'epev') == []
+
+
+def test_like_fallback_without_index(make_engine):
+    bind, session = make_session(make_engine)
+    assert names(search_index.search(session, 'inventory', 'lith 48v')) == ['Lithium Battery']
+
+
+def test_inventory_page_filters_before_ranking(app_db):
+    # More strong matches than MAX_RESULTS in another category, ranked above the weak one we filter for
+    with app.app_context():
+        items = [Inventory(name=f'Solar Panel {i}', brand='Jinko', category='Panels')
+                 for i in range(search_index.MAX_RESULTS + 10)]
+        items.append(Inventory(name='Cable 6mm', brand='Generic', category='Cables', specifications='solar DC'))
+        db_session.add_all(items)
+        db_session.commit()
+    search_index.build_index(app_db)
+    client = app.test_client()
+    body = client.get('/inventory?search=solar&category=Cables').get_data(as_text=True)
+    assert 'Cable 6mm' in body and 'Solar Panel 0' not in body
+    body = client.get('/inventory?search=solar').get_data(as_text=True)
+    assert all(f'Solar Panel {i}<' in body for i in range(search_index.MAX_RESULTS + 10)), \
+        "every match is listed, not just the first MAX_RESULTS"
+    assert 'Cable 6mm' in body
+
+
+def test_typeahead_endpoint_tracks_supplier_writes(app_db):
+    client = app.test_client()
+    client.post('/suppliers/add', data={'name': 'Typeahead Solar', 'contact_person': '', 'phone': '',
+                                        'email': '', 'address': '', 'payment_terms': '', 'currency': ''})
+    results = client.get('/search/suppliers?q=typeahead').get_json()['results']
+    assert [r['label'] for r in results] == ['Typeahead Solar']
+    assert client.get('/search/widgets?q=x').status_code == 404
+
+    client.post(f"/suppliers/delete/{results[0]['id']}")
+    assert client.get('/search/suppliers?q=typeahead').get_json()['results'] == []
+    with app.app_context():
+        assert db_session.query(Supplier).filter(Supplier.name.like('Typeahead%')).count() == 0
+
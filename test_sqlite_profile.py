@@ -0,0 +1,85 @@
+import logging
+
+import sqlalchemy as db
+from flask import Flask, flash, request
+from sqlalchemy.orm import sessionmaker
+
+import sqlite_profile
+from database import Base
+from models import Supplier
+
+
+def profiled_engine(make_engine):
+    engine = make_engine(tables=False)
+    sqlite_profile.configure(engine)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def test_pragmas_applied_to_new_connections(make_engine):
+    engine = profiled_engine(make_engine)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert conn.exec_driver_sql('PRAGMA busy_timeout').scalar() == sqlite_profile.PRAGMAS['busy_timeout']
+        assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql('PRAGMA temp_store').scalar() == 2  # MEMORY
+    assert not sqlite_profile.configure(db.create_engine('postgresql://localhost/none'))
+
+
+def test_locked_post_is_retried_after_the_view_handles_the_error(make_engine, monkeypatch, caplog):
+    # Fail at once instead of waiting out the lock
+    monkeypatch.setitem(sqlite_profile.PRAGMAS, 'busy_timeout', 0)
+    engine = profiled_engine(make_engine)
+    session = sessionmaker(bind=engine)()
+    monkeypatch.setattr(sqlite_profile, 'BACKOFF_SECONDS', 0.001)
+    blocker = engine.raw_connection()
+    blocker.execute('BEGIN IMMEDIATE')
+    attempts = []
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/suppliers/add', methods=['GET', 'POST'])
+    def add_supplier():
+        attempts.append(request.method)
+        try:
+            session.add(Supplier(name='Retried'))
+            session.commit()
+            flash('Supplier added successfully!', 'success')
+        except Exception as e:
+            session.rollback()
+            flash(f'Error: {e}', 'error')
+            # The lock is released while the retry backs off
+            blocker.rollback()
+        return 'done'
+
+    sqlite_profile.init_app(app, session)
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        assert client.post('/suppliers/add').status_code == 200
+    assert [r.getMessage() for r in caplog.records] == ['Database locked during add_supplier, retry 1 of 4']
+    with client.session_transaction() as flask_session:
+        assert flask_session['_flashes'] == [('success', 'Supplier added successfully!')], \
+            "the failed attempt's flash is dropped"
+    assert attempts == ['POST', 'POST']
+    assert session.query(Supplier).filter_by(name='Retried').count() == 1
+    blocker.close()
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def work():
+        calls.append(1)
+        raise db.exc.OperationalError('SELECT', {}, Exception('no such table: missing'))
+
+    try:
+        sqlite_profile.run_with_retry(None, work)
+        assert False, "should have raised"
+    except db.exc.OperationalError:
+        pass
+    assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    test_other_errors_are_not_retried()
@@ -0,0 +1,177 @@
+import random
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+import stock
+import valuation
+from main import app, db_session
+from models import Customer, Inventory, Invoice, InvoiceItem, StockTransaction, StockSnapshot, TransactionType
+
+STOCK = 5
+BUYERS = 16
+
+
+def make_session(make_engine):
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    session.add_all([Inventory(id=1, name='Panel', quantity=3), Inventory(id=2, name='Battery', quantity=1)])
+    session.commit()
+    return session
+
+
+def test_take_is_all_or_nothing(make_engine):
+    session = make_session(make_engine)
+    panel = session.get(Inventory, 1)
+    try:
+        stock.take(session, [(1, 2), (2, 1), (2, 1)])
+        assert False, "battery was oversold"
+    except stock.InsufficientStock as e:
+        assert [(item.name, requested, available) for item, requested, available in e.failures] == [('Battery', 2, 1)]
+        assert str(e) == 'Insufficient stock for Battery. Available: 1'
+    session.rollback()
+    assert panel.quantity == 3
+
+    assert stock.take(session, {1: 3, 2: 1}) == {1: 3, 2: 1}
+    assert panel.quantity == 0, "loaded rows see the new quantity"
+    stock.give(session, {1: 2})
+    session.commit()
+    assert [i.quantity for i in session.query(Inventory).order_by(Inventory.id)] == [2, 0]
+
+
+def test_parallel_invoices_never_oversell(app_db):
+    with app.app_context():
+        customer = Customer(identification_number='ST1', name='Stock')
+        item = Inventory(name='Stress', quantity=STOCK, unit_price=10.0, cost_price=5.0)
+        db_session.add_all([customer, item])
+        db_session.commit()
+        item_id = item.id
+
+    barrier = threading.Barrier(BUYERS)
+
+    def buy():
+        client = app.test_client()
+        barrier.wait()
+        client.post('/invoices/add', data={'customer_identification': 'ST1', 'activity_type_id': '',
+                                           'item_id[]': str(item_id), 'quantity[]': '1', 'unit_price[]': '10',
+                                           'custom_item_name[]': ''})
+
+    threads = [threading.Thread(target=buy) for _ in range(BUYERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        remaining = db_session.get(Inventory, item_id).quantity
+        sold = db_session.query(InvoiceItem).filter_by(inventory_id=item_id).count()
+        assert remaining >= 0
+        assert 0 < sold <= STOCK
+        assert remaining == STOCK - sold, f"{sold} sold but stock fell by {STOCK - remaining}"
+
+
+def ledger_row(session, inventory_id, quantity, when, unit_cost):
+    kind = TransactionType.STOCK_IN if quantity > 0 else TransactionType.STOCK_OUT
+    session.add(StockTransaction(inventory_id=inventory_id, transaction_type=kind, quantity=quantity,
+                                 unit_cost=unit_cost, date_created=when))
+
+
+def test_positions_from_snapshot_plus_ledger(make_engine):
+    session = make_session(make_engine)
+    ledger_row(session, 1, 10, datetime(2025, 1, 5), 50.0)
+    ledger_row(session, 1, -4, datetime(2025, 1, 20), 50.0)
+    ledger_row(session, 1, 6, datetime(2025, 2, 10), 60.0)
+    ledger_row(session, 2, 1, datetime(2025, 2, 11), 200.0)
+    ledger_row(session, 1, -3, datetime(2025, 3, 2), 55.0)
+    session.commit()
+
+    march = datetime(2025, 3, 1)
+    replayed = stock.position_as_of(session, march)
+    assert replayed == {1: (12, 660.0), 2: (1, 200.0)}
+    assert stock.take_snapshots(session, datetime(2025, 2, 1)) == 1
+    assert stock.take_snapshots(session, datetime(2025, 2, 1)) == 0, "re-running is a no-op"
+    assert session.query(StockSnapshot).one().quantity == 6
+    # The February snapshot plus February's rows gives the same answer as a full replay
+    assert stock.position_as_of(session, march) == replayed
+    # March's issue comes out of the oldest layer: 3 @ 50 + 6 @ 60
+    assert stock.position_as_of(session, datetime(2025, 4, 1), [1]) == {1: (9, 510.0)}
+    assert stock.position_as_of(session, datetime(2025, 1, 1)) == {}
+
+
+def test_snapshot_value_carries_fifo_layers(make_engine):
+    session = make_session(make_engine)
+    ledger_row(session, 1, 10, datetime(2025, 1, 3), 50.0)
+    ledger_row(session, 1, 10, datetime(2025, 1, 4), 60.0)
+    ledger_row(session, 1, -5, datetime(2025, 1, 20), 60.0)
+    ledger_row(session, 1, 2, datetime(2025, 2, 10), 70.0)
+    session.commit()
+
+    march = datetime(2025, 3, 1)
+    # 5 @ 50 + 10 @ 60 + 2 @ 70, whether replayed or carried on from the February snapshot
+    assert stock.position_as_of(session, march) == {1: (17, 990.0)}
+    stock.take_snapshots(session, datetime(2025, 2, 1))
+    assert session.query(StockSnapshot).one().layers == '[[5, 50.0], [10, 60.0]]'
+    assert stock.position_as_of(session, march) == {1: (17, 990.0)}
+
+
+def test_snapshot_chain_matches_full_replay(make_engine):
+    session = make_session(make_engine)
+    rng = random.Random(3)
+    on_hand = {1: 0, 2: 0}
+    for day in range(180):
+        item = rng.choice([1, 2])
+        quantity = -rng.randint(1, on_hand[item]) if on_hand[item] and rng.random() < 0.5 else rng.randint(1, 9)
+        on_hand[item] += quantity
+        ledger_row(session, item, quantity, datetime(2025, 1, 1) + timedelta(days=day), round(rng.uniform(10, 90), 2))
+    session.commit()
+    for month in range(2, 8):
+        # Each snapshot carries on from the previous one; mid-month adds the rows since
+        stock.take_snapshots(session, datetime(2025, month, 1))
+        for as_of in (datetime(2025, month, 1), datetime(2025, month, 16)):
+            replayed = valuation.positions(session, as_of)
+            carried = stock.position_as_of(session, as_of)
+            assert carried.keys() == replayed.keys()
+            for item, position in replayed.items():
+                assert carried[item].quantity == position.quantity
+                assert abs(carried[item].value - position.value) < 0.01, (as_of, item)
+
+
+def test_reconcile_reports_and_adjusts(make_engine):
+    session = make_session(make_engine)
+    ledger_row(session, 1, 3, datetime(2025, 1, 5), 50.0)
+    session.commit()
+    assert stock.reconcile(session) == [(2, 'Battery', 1, 0)]
+    stock.adjust_ledger(session, stock.reconcile(session))
+    assert stock.reconcile(session) == []
+
+
+def test_invoice_round_trip_keeps_ledger_balanced(app_db):
+    client = app.test_client()
+    with app.app_context():
+        customer = Customer(identification_number='LG1', name='Ledger')
+        db_session.add(customer)
+        db_session.commit()
+    client.post('/inventory/add', data={'name': 'Ledger item', 'brand': '', 'category': 'Lookup',
+                                        'specifications': '', 'quantity': '8', 'unit_price': '30',
+                                        'supplier_id': ''})
+    with app.app_context():
+        item_id = db_session.query(Inventory.id).filter_by(name='Ledger item').scalar()
+    form = {'customer_identification': 'LG1', 'activity_type_id': '', 'item_id[]': str(item_id),
+            'quantity[]': '3', 'unit_price[]': '30', 'custom_item_name[]': ''}
+    client.post('/invoices/add', data=form)
+    with app.app_context():
+        invoice_id = db_session.query(Invoice.id).filter_by(customer_id='LG1').scalar()
+    client.post(f'/invoices/edit/{invoice_id}', data=dict(form, **{'quantity[]': '5'}))
+    client.post(f'/inventory/edit/{item_id}', data={'name': 'Ledger item', 'brand': '', 'category': 'Lookup',
+                                                   'specifications': '', 'quantity': '4', 'unit_price': '30',
+                                                   'supplier_id': ''})
+    client.post(f'/invoices/delete/{invoice_id}')
+
+    with app.app_context():
+        rows = db_session.query(StockTransaction).filter_by(inventory_id=item_id).all()
+        assert [r.quantity for r in rows] == [8, -3, 3, -5, 1, 5]
+        assert all(r.total_value is not None for r in rows if r.transaction_type != TransactionType.ADJUSTMENT)
+        assert db_session.get(Inventory, item_id).quantity == 9 == sum(r.quantity for r in rows)
+        assert item_id not in [m.inventory_id for m in stock.reconcile(db_session)]
+
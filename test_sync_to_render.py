@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import sqlalchemy as db
+from sqlalchemy.orm import sessionmaker
+
+import sync_to_render
+from models import Customer, Inventory, Invoice, InvoiceItem, Supplier
+
+ITEMS = 250
+
+
+def make_database(make_engine, name):
+    engine = make_engine(name)
+    return str(engine.url), sessionmaker(bind=engine)()
+
+
+def seed(session):
+    session.add(Supplier(id=1, name='Sun Supply'))
+    session.add(Customer(identification_number='C1', name='Alice'))
+    session.add_all([Inventory(id=i, name=f'Panel {i}', quantity=i, supplier_id=1, specifications=None)
+                     for i in range(1, ITEMS + 1)])
+    session.add(Invoice(id=1, customer_id='C1', total_amount=20.0, balance_due=20.0))
+    session.add_all([InvoiceItem(id=i, invoice_id=1, inventory_id=i, quantity=1, unit_price=10.0, amount=10.0)
+                     for i in range(1, 3)])
+    session.commit()
+
+
+def test_waves_follow_foreign_keys():
+    waves = sync_to_render.waves(sync_to_render.SYNC_TABLES)
+    position = {name: i for i, wave in enumerate(waves) for name in wave}
+    assert sorted(position) == sorted(sync_to_render.SYNC_TABLES)
+    assert position['quotations'] < position['invoices'] < position['invoice_items']
+    assert position['journey_records'] < position['fuel_records']
+    assert len(waves[0]) > 1, "independent tables share a wave"
+
+
+def test_sync_streams_batches_and_upserts(make_engine):
+    source_url, source = make_database(make_engine, 'source.db')
+    target_url, target = make_database(make_engine, 'target.db')
+    seed(source)
+    target.add(Inventory(id=1, name='Stale copy', quantity=0))
+    target.commit()
+
+    stats = sync_to_render.sync_data(target_url, source_url, batch_size=40)
+    assert stats['inventory'][:2] == (ITEMS, ITEMS)
+    assert target.query(Inventory).count() == ITEMS
+    assert target.get(Inventory, 1).name == 'Panel 1', "changed rows overwrite the target's copy"
+    assert target.get(Inventory, 7).specifications is None and target.get(Inventory, 7).supplier_id == 1
+    assert [i.inventory_id for i in target.query(InvoiceItem).order_by(InvoiceItem.id)] == [1, 2]
+
+
+def test_delta_sync_sends_changes_and_deletes_and_resumes(make_engine, monkeypatch):
+    monkeypatch.setattr(sync_to_render, 'OVERLAP', timedelta(0))
+    source_url, source = make_database(make_engine, 'source.db')
+    target_url, target = make_database(make_engine, 'target.db')
+    seed(source)
+    for item in source.query(Inventory):
+        item.updated_at = datetime(2025, 1, 1) + timedelta(seconds=item.id)
+    source.commit()
+
+    # Stop after the third batch of inventory has been committed
+    batches = []
+
+    def interrupt(message):
+        if message.startswith('  inventory:'):
+            batches.append(message)
+            if len(batches) == 3:
+                raise KeyboardInterrupt
+    monkeypatch.setattr(sync_to_render, 'log', interrupt)
+    try:
+        sync_to_render.sync_data(target_url, source_url, batch_size=40)
+        assert False, "sync was not interrupted"
+    except KeyboardInterrupt:
+        pass
+    assert target.query(Inventory).count() == 120
+    assert sync_to_render.read_watermarks(db.create_engine(target_url))['inventory'][0] == \
+        datetime(2025, 1, 1, 0, 2)
+
+    monkeypatch.setattr(sync_to_render, 'log', lambda message: None)
+    resumed = sync_to_render.sync_data(target_url, source_url, batch_size=40)
+    assert resumed['inventory'][0] == ITEMS - 119, "picks up from the last committed batch"
+    assert target.query(Inventory).count() == ITEMS
+
+    source.get(Inventory, 5).quantity = 99
+    source.delete(source.get(Inventory, 7))
+    source.query(Inventory).filter(Inventory.id == 8).delete()
+    source.commit()
+    delta = sync_to_render.sync_data(target_url, source_url, batch_size=40)
+    assert delta['inventory'][0] == 2, "the row at the watermark and the edited row"
+    assert delta['suppliers'][0] == 1
+    target.expire_all()
+    assert target.get(Inventory, 5).quantity == 99
+    assert target.get(Inventory, 7) is None and target.get(Inventory, 8) is None
+    assert target.query(Inventory).count() == ITEMS - 2
+
+
+if __name__ == "__main__":
+    test_waves_follow_foreign_keys()
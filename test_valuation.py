@@ -0,0 +1,113 @@
+import random
+from collections import deque
+from datetime import datetime, timedelta
+
+import pandas as pd
+import sqlalchemy as db
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import valuation
+from models import Inventory, StockTransaction, StockSnapshot, TransactionType
+
+
+def make_session(make_engine):
+    bind = make_engine()
+    session = sessionmaker(bind=bind)()
+    session.add_all([Inventory(id=1, name='Panel', cost_price=0.0), Inventory(id=2, name='Battery', cost_price=0.0)])
+    session.commit()
+    return bind, session
+
+
+def add(session, inventory_id, quantity, when, unit_cost=None, reference_type=None):
+    kind = TransactionType.STOCK_IN if quantity > 0 else TransactionType.STOCK_OUT
+    session.add(StockTransaction(inventory_id=inventory_id, transaction_type=kind, quantity=quantity,
+                                 unit_cost=unit_cost, reference_type=reference_type, date_created=when))
+
+
+def ledger(rows):
+    return pd.DataFrame([(i, item, datetime(2025, 1, 1) + timedelta(hours=i), quantity, None, None, cost)
+                         for i, (item, quantity, cost) in enumerate(rows)], columns=valuation.LEDGER_COLUMNS)
+
+
+def brute_force_fifo(rows):
+    """Row costs and closing values with an explicit queue of layers per item"""
+    layers, last_cost, costs = {}, {}, []
+    for item, quantity, cost in rows:
+        queue = layers.setdefault(item, deque())
+        if quantity > 0:
+            queue.append([quantity, cost])
+            last_cost[item] = cost
+            costs.append(quantity * cost)
+            continue
+        remaining, total = -quantity, 0.0
+        while remaining and queue:
+            take = min(remaining, queue[0][0])
+            total += take * queue[0][1]
+            queue[0][0] -= take
+            remaining -= take
+            if not queue[0][0]:
+                queue.popleft()
+        total += remaining * last_cost.get(item, 0.0)
+        costs.append(-total)
+    return costs
+
+
+def test_fifo_layers():
+    rows, closing = valuation.fifo(ledger([
+        (1, 10, 5.0), (1, 10, 7.0), (1, -12, None), (1, 5, 8.0), (1, -6, None),
+        (2, 2, 3.0), (2, -3, None),
+    ]))
+    assert rows['cost'].round(6).tolist() == [50.0, 70.0, -64.0, 40.0, -42.0, 6.0, -9.0]
+    assert closing.loc[1, 'quantity'] == 7 and round(closing.loc[1, 'value'], 6) == 54.0
+    assert valuation.layers(rows) == {1: [[2, 7.0], [5, 8.0]]}
+    # Issued past everything received: the extra unit goes at the last receipt cost
+    assert closing.loc[2, 'quantity'] == -1 and round(closing.loc[2, 'value'], 6) == -3.0
+
+
+def test_fifo_matches_brute_force_on_random_ledger():
+    rng = random.Random(7)
+    rows, on_hand = [], {}
+    for _ in range(3000):
+        item = rng.randint(1, 40)
+        if on_hand.get(item, 0) > 0 and rng.random() < 0.55:
+            quantity = -rng.randint(1, on_hand[item])
+            rows.append((item, quantity, None))
+        else:
+            quantity = rng.randint(1, 25)
+            rows.append((item, quantity, round(rng.uniform(10, 500), 2)))
+        on_hand[item] = on_hand.get(item, 0) + quantity
+    # fifo() sorts by item, so compare against the brute force run in the same order
+    ordered = sorted(enumerate(rows), key=lambda pair: (pair[1][0], pair[0]))
+    expected = brute_force_fifo([row for _, row in ordered])
+    costed, closing = valuation.fifo(ledger(rows))
+    assert max(abs(a - b) for a, b in zip(costed['cost'], expected)) < 1e-6
+    assert closing['quantity'].to_dict() == on_hand
+
+
+def test_cost_of_sales_and_cached_closing(make_engine):
+    bind, session = make_session(make_engine)
+    add(session, 1, 10, datetime(2025, 1, 3), 100.0)
+    add(session, 1, 10, datetime(2025, 1, 9), 120.0)
+    add(session, 1, -12, datetime(2025, 2, 4), reference_type='invoice')
+    add(session, 1, 2, datetime(2025, 2, 5), 120.0, reference_type='invoice_deletion')
+    add(session, 2, 4, datetime(2025, 2, 6), 50.0)
+    session.commit()
+
+    assert valuation.cost_of_sales(session, datetime(2025, 1, 1), datetime(2025, 2, 1)) == 0.0
+    # 10 @ 100 + 2 @ 120 issued, 2 @ 120 put back
+    assert valuation.cost_of_sales(session, datetime(2025, 2, 1), datetime(2025, 3, 1)) == 1000.0
+
+    assert valuation.closing_value(session, 2025, 1) == 2200.0
+    assert valuation.closing_value(session, 2025, 2) == 8 * 120.0 + 2 * 120.0 + 4 * 50.0
+    assert session.query(StockSnapshot).filter_by(as_of=datetime(2025, 3, 1)).count() == 2
+
+    statements = []
+    event.listen(bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert valuation.closing_value(session, 2025, 2) == 1400.0
+    assert len(statements) == 1 and 'stock_transactions' not in statements[0], "served from the snapshot"
+
+
+if __name__ == "__main__":
+    test_fifo_layers()
+    test_fifo_matches_brute_force_on_random_ledger()
@@ -0,0 +1,180 @@
+"""FIFO cost of stock, computed over the whole ledger at once.
+
+Each item's receipts (positive ledger rows) form FIFO layers. Let C(x) be the
+cumulative cost of the first x units received: a piecewise-linear curve
+through (units received so far, cost received so far) after each receipt. The
+n-th unit to leave an item then costs C(n) - C(n - 1), so the cost of an
+outgoing row that moves the item's cumulative outflow from a to b is
+C(b) - C(a). The value of what is left is C(received) - C(issued). Laying
+every item's curve side by side on one axis turns this into a single
+np.interp call over the whole ledger, with no Python loop per row or per
+item.
+
+Month-end valuations are cached as StockSnapshot rows dated the first instant
+of the next month, together with the FIFO layers still on hand so later
+valuations can carry on from them (see stock.position_as_of). They are written once the month is over (see
+closing_positions), so a historical balance sheet reads stored rows instead
+of replaying the ledger. pandas is only imported by the reports that need
+it, not at web worker boot.
+"""
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as db
+
+import stock
+from database import is_read_only
+from models import Inventory, StockTransaction, StockSnapshot, TransactionType
+
+LEDGER_COLUMNS = ['id', 'inventory_id', 'date_created', 'quantity', 'transaction_type', 'reference_type',
+                  'unit_cost']
+
+# Ledger rows that put sold stock back (invoice edited or deleted); they reduce cost of sales
+SALE_REVERSALS = ('INVOICE_EDIT_REVERT', 'invoice_deletion')
+
+
+def load_ledger(session, until, inventory_ids=None):
+    """Ledger rows dated before until as a DataFrame of LEDGER_COLUMNS"""
+    query = session.query(
+        StockTransaction.id, StockTransaction.inventory_id, StockTransaction.date_created,
+        StockTransaction.quantity, StockTransaction.transaction_type, StockTransaction.reference_type,
+        stock.ledger_unit_cost().label('unit_cost'),
+    ).outerjoin(Inventory, Inventory.id == StockTransaction.inventory_id).filter(
+        StockTransaction.inventory_id.isnot(None),
+        StockTransaction.date_created < until,
+    )
+    if inventory_ids is not None:
+        query = query.filter(StockTransaction.inventory_id.in_(inventory_ids))
+    return pd.DataFrame(query.all(), columns=LEDGER_COLUMNS)
+
+
+def fifo(ledger):
+    """FIFO-cost a ledger DataFrame.
+
+    Returns (rows, items): rows is the ledger in (item, date, id) order with a
+    'cost' column holding each row's change in stock value (receipts positive,
+    issues negative) and a 'left' column holding how many units of each
+    receipt are still on hand; items is indexed by inventory_id with the
+    closing 'quantity' and 'value'. Units issued beyond everything ever
+    received are costed at the item's last receipt cost.
+    """
+    rows = ledger.sort_values(['inventory_id', 'date_created', 'id'], kind='stable').reset_index(drop=True)
+    if rows.empty:
+        rows['cost'] = pd.Series(dtype=float)
+        rows['left'] = pd.Series(dtype=float)
+        return rows, pd.DataFrame({'quantity': pd.Series(dtype='int64'), 'value': pd.Series(dtype=float)})
+
+    quantity = rows['quantity'].to_numpy(dtype=float)
+    unit_cost = rows['unit_cost'].fillna(0.0).to_numpy(dtype=float)
+    received = np.where(quantity > 0, quantity, 0.0)
+    issued = np.where(quantity < 0, -quantity, 0.0)
+    received_cost = received * unit_cost
+
+    flows = pd.DataFrame({'received': received, 'issued': issued, 'cost': received_cost,
+                          'last_cost': np.where(received > 0, unit_cost, np.nan)})
+    by_item = flows.groupby(rows['inventory_id'])
+    cumulative = by_item[['received', 'issued', 'cost']].cumsum()
+    cum_received = cumulative['received'].to_numpy()
+    cum_issued = cumulative['issued'].to_numpy()
+    cum_cost = cumulative['cost'].to_numpy()
+
+    items = by_item[['received', 'issued', 'cost']].sum()
+    items['last_cost'] = by_item['last_cost'].last().fillna(0.0)
+    # Each item's curve gets its own stretch of the x axis, long enough for all
+    # of its receipts and issues, with a one-unit gap before the next item
+    items['span'] = np.maximum(items['received'], items['issued']) + 1
+    items['offset'] = (items['span'] + 1).cumsum() - (items['span'] + 1)
+
+    offset = items['offset'].reindex(rows['inventory_id']).to_numpy()
+    is_receipt = received > 0
+    x = np.concatenate([items['offset'].to_numpy(),                       # (0, 0) for each item
+                        offset[is_receipt] + cum_received[is_receipt],    # after each receipt
+                        (items['offset'] + items['span']).to_numpy()])    # past the last receipt
+    y = np.concatenate([np.zeros(len(items)),
+                        cum_cost[is_receipt],
+                        (items['cost'] + (items['span'] - items['received']) * items['last_cost']).to_numpy()])
+    order = np.argsort(x, kind='stable')
+    x, y = x[order], y[order]
+
+    def curve(units):
+        return np.interp(units, x, y)
+
+    issue_cost = curve(offset + cum_issued) - curve(offset + cum_issued - issued)
+    rows['cost'] = np.where(is_receipt, received_cost, -issue_cost)
+    # A receipt covers units (cum_received - received, cum_received]; the first `issued` units are gone
+    total_issued = items['issued'].reindex(rows['inventory_id']).to_numpy()
+    rows['left'] = np.clip(cum_received - np.maximum(cum_received - received, total_issued), 0.0, received)
+
+    closing = pd.DataFrame(index=items.index)
+    closing['quantity'] = rows.groupby('inventory_id')['quantity'].sum().astype('int64')
+    closing['value'] = items['cost'] - curve((items['offset'] + items['issued']).to_numpy())
+    return rows, closing
+
+
+def layers(rows):
+    """{inventory_id: [[quantity, unit_cost], ...]} of the receipts still on hand, from fifo()'s rows"""
+    held = rows[rows['left'] > 0]
+    unit_cost = held['unit_cost'].fillna(0.0)
+    return {int(inventory_id): [[int(q), float(c)] for q, c in zip(group['left'], unit_cost[group.index])]
+            for inventory_id, group in held.groupby('inventory_id')}
+
+
+def opening_rows(snapshot):
+    """LEDGER_COLUMNS rows that stand for a snapshot's stock, to be costed ahead of the rows after it"""
+    if snapshot.layers is not None:
+        held = json.loads(snapshot.layers)
+    elif snapshot.quantity > 0:
+        held = [[snapshot.quantity, snapshot.value / snapshot.quantity]]  # no layers: one at the average cost
+    else:
+        held = []
+    if snapshot.quantity < 0:
+        held = [[snapshot.quantity, 0.0]]  # issued ahead of receipts; the next receipts cover it
+    # Negative ids, oldest layer lowest, sort them before any real row dated at the snapshot instant
+    return [(i - len(held), snapshot.inventory_id, snapshot.as_of, quantity,
+             TransactionType.STOCK_IN if quantity > 0 else TransactionType.STOCK_OUT, 'snapshot', unit_cost)
+            for i, (quantity, unit_cost) in enumerate(held)]
+
+
+def positions(session, as_of, inventory_ids=None):
+    """{inventory_id: stock.Position(quantity, value)} just before as_of, FIFO valued from the full ledger"""
+    _, closing = fifo(load_ledger(session, as_of, inventory_ids))
+    return {int(inventory_id): stock.Position(int(row.quantity), float(row.value))
+            for inventory_id, row in closing.iterrows()}
+
+
+def closing_positions(session, year, month):
+    """Positions at the end of a month; stored as snapshots the first time a finished month is asked for"""
+    from reports import month_range
+    _, end = month_range(year, month)
+    if end > datetime.utcnow():
+        return positions(session, datetime.utcnow())
+    cached = session.query(StockSnapshot).filter(StockSnapshot.as_of == end).all()
+    if not cached and is_read_only(session):
+        return positions(session, end)
+    if not cached:
+        stock.take_snapshots(session, end)
+        cached = session.query(StockSnapshot).filter(StockSnapshot.as_of == end).all()
+    return {s.inventory_id: stock.Position(s.quantity, s.value) for s in cached}
+
+
+def closing_value(session, year, month):
+    """Total FIFO value of stock on hand at the end of a month"""
+    return round(sum(position.value for position in closing_positions(session, year, month).values()), 2)
+
+
+def cost_of_sales(session, start, end):
+    """FIFO cost of stock issued in [start, end), net of sales put back into stock"""
+    touched = db.select(StockTransaction.inventory_id).where(
+        StockTransaction.date_created >= start,
+        StockTransaction.date_created < end,
+    ).distinct()
+    ids = [inventory_id for (inventory_id,) in session.execute(touched) if inventory_id is not None]
+    if not ids:
+        return 0.0
+    rows, _ = fifo(load_ledger(session, end, ids))
+    in_period = rows[rows['date_created'] >= start]
+    issued = in_period['transaction_type'] == TransactionType.STOCK_OUT
+    reversed_sales = in_period['reference_type'].isin(SALE_REVERSALS)
+    return round(float(-in_period.loc[issued, 'cost'].sum() - in_period.loc[reversed_sales, 'cost'].sum()), 2)